@@ -1,9 +1,10 @@
 """
 Database configuration and session management.
 """
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
 from pathlib import Path
 import re
 
@@ -14,30 +15,51 @@ DATABASE_DIR.mkdir(exist_ok=True)
 DATABASE_URL = f"sqlite:///{DATABASE_DIR}/hpes.db"
 
 # Create engine
+# Connections are long-lived and reused, so the PRAGMA setup below runs once
+# per pooled connection instead of re-opening hpes.db (and its -wal/-shm files)
+# for every request or batch task.
 engine = create_engine(
     DATABASE_URL,
     connect_args={"check_same_thread": False},  # Needed for SQLite
+    poolclass=QueuePool,
+    pool_size=5,
+    max_overflow=10,
+    insertmanyvalues_page_size=1000,  # Rows per multi-row INSERT ... RETURNING batch
     echo=False  # Set to True for SQL debugging
 )
 
+# SQLite REGEXP implementation
+def regexp(expr, item):
+    reg = re.compile(expr)
+    return reg.search(item) is not None
+
+
+@event.listens_for(engine, "connect")
+def _sqlite_pragmas(dbapi_conn, _):
+    """Tune every new SQLite connection and register REGEXP on it."""
+    cursor = dbapi_conn.cursor()
+    # WAL lets readers proceed while a batch writer commits;
+    # synchronous=NORMAL skips the per-commit fsync that WAL makes safe to drop.
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA cache_size=-64000")  # 64MB page cache
+    cursor.execute("PRAGMA busy_timeout=5000")
+    cursor.execute("PRAGMA mmap_size=268435456")  # 256MB
+    cursor.close()
+    dbapi_conn.create_function("REGEXP", 2, regexp)
+
+
 # Session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 # Base class for models
 Base = declarative_base()
 
-# SQLite REGEXP implementation
-def regexp(expr, item):
-    reg = re.compile(expr)
-    return reg.search(item) is not None
-
 def get_db():
     """Dependency for FastAPI routes to get database session."""
     db = SessionLocal()
     try:
-        # Register REGEXP function for SQLite
-        if "sqlite" in str(engine.url):
-            engine.raw_connection().create_function("REGEXP", 2, regexp)
         yield db
     finally:
         db.close()
@@ -3,28 +3,197 @@ Batch Processing Engine
 Handles parallel processing of multiple files with progress tracking
 """
 import asyncio
-from typing import List, Dict
-from datetime import datetime
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, asdict
+from functools import partial
+from typing import Iterator, List, Dict, Callable, Optional
+from datetime import datetime, timedelta
 import os
+import uuid
+from sqlalchemy import and_, or_, update
 from sqlalchemy.orm import Session
 
+from app.database import SessionLocal
+
 # Importlar projenizin yapısına göre ayarlandı
 from app.models import FileMetadata, ExtractedBlock
 from app.engine.normalizer import FileNormalizer
-from app.engine.segmenter import Segmenter
+from app.engine.segmenter import Segmenter, CandidateBlock
 from app.engine.validator import Validator
 from app.engine.filter import PrecisionFilter
 from app.services.secret_scanner import SecretScanner
+from app.services.stats_service import StatsService
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on files processed at once within a batch
+MAX_CONCURRENCY = min(32, os.cpu_count() or 1)
+
+# A 'processing' file whose owner has not reported progress for this long is
+# assumed to belong to a dead process and may be claimed again
+PROCESSING_STALE_AFTER = timedelta(minutes=15)
+
+
+@dataclass(slots=True)
+class SegmentRow:
+    """Accepted block buffered for bulk insert into extracted_blocks."""
+    file_id: int
+    session_id: Optional[int]
+    content: str
+    language: Optional[str]
+    block_type: str
+    confidence_score: float
+    validation_method: str
+    start_line: int
+    end_line: int
+    has_secrets: bool = False
+    secret_type: Optional[str] = None
+
+
+# CPU-bound normalize + segment work runs in worker processes so it is not
+# serialized on the GIL. Created lazily, shut down from the app lifespan.
+_cpu_pool: Optional[ProcessPoolExecutor] = None
+
+# Per-worker-process engine instances (tree-sitter parsers are not picklable,
+# so each worker builds its own on first use)
+_worker_normalizer: Optional[FileNormalizer] = None
+_worker_segmenter: Optional[Segmenter] = None
+_worker_validator: Optional[Validator] = None
+
+# Below this many candidate blocks, pickling them to the pool costs more
+# than validating in-process
+PARALLEL_VALIDATION_MIN_BLOCKS = 64
+VALIDATION_CHUNK_SIZE = 16
+
+
+def get_cpu_pool() -> ProcessPoolExecutor:
+    """Return the shared process pool, creating it on first use."""
+    global _cpu_pool
+    if _cpu_pool is None:
+        _cpu_pool = ProcessPoolExecutor(max_workers=os.cpu_count())
+    return _cpu_pool
+
+
+def _discard_cpu_pool(pool: ProcessPoolExecutor) -> None:
+    """
+    Drop a pool that lost a worker (OOM kill, crash in a grammar); the next
+    get_cpu_pool() starts a fresh one. No-op if it was already replaced.
+    """
+    global _cpu_pool
+    if _cpu_pool is pool:
+        _cpu_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+async def run_in_cpu_pool(fn: Callable, *args):
+    """
+    Run fn(*args) on the shared process pool. If the pool is broken, it is
+    replaced and the call retried once; a call that breaks the fresh pool too
+    raises BrokenProcessPool.
+    """
+    loop = asyncio.get_running_loop()
+    pool = get_cpu_pool()
+    try:
+        return await loop.run_in_executor(pool, fn, *args)
+    except BrokenProcessPool:
+        logger.warning("CPU pool broke; restarting it and retrying %s", fn.__name__)
+        _discard_cpu_pool(pool)
+    pool = get_cpu_pool()
+    try:
+        return await loop.run_in_executor(pool, fn, *args)
+    except BrokenProcessPool:
+        _discard_cpu_pool(pool)
+        raise
+
+
+def shutdown_cpu_pool() -> None:
+    """Shut down the shared process pool if it was started."""
+    global _cpu_pool
+    if _cpu_pool is not None:
+        _cpu_pool.shutdown(wait=False, cancel_futures=True)
+        _cpu_pool = None
+
+
+def _normalize_and_segment(file_path: str, language: str, filename: str) -> List[CandidateBlock]:
+    """Worker entry point: normalize a file and segment its text."""
+    global _worker_normalizer, _worker_segmenter
+    if _worker_normalizer is None:
+        _worker_normalizer = FileNormalizer()
+        _worker_segmenter = Segmenter()
+    
+    normalized_text = _worker_normalizer.normalize_file(file_path)['content']
+    return _worker_segmenter.segment(normalized_text, language=language, filename=filename)
+
+
+def _validate_one(block: CandidateBlock, filename: str) -> Dict:
+    """Worker entry point: validate one candidate block."""
+    global _worker_validator
+    if _worker_validator is None:
+        _worker_validator = Validator()
+    return _worker_validator.validate_block(block, filename=filename)
+
+
+def validate_blocks(blocks: List[CandidateBlock], filename: str, validator: Validator) -> Iterator[Dict]:
+    """
+    Validate candidate blocks lazily, fanning large sets out over the shared
+    process pool. Small sets use the caller's validator. Results keep the
+    order of blocks.
+    """
+    if len(blocks) < PARALLEL_VALIDATION_MIN_BLOCKS:
+        return validator.iter_validate(blocks, filename)
+    
+    return _validate_in_pool(blocks, filename, validator)
+
+
+def _validate_in_pool(blocks: List[CandidateBlock], filename: str, validator: Validator) -> Iterator[Dict]:
+    """Pool side of validate_blocks; if the pool breaks, the rest is validated in-process."""
+    pool = get_cpu_pool()
+    done = 0
+    try:
+        for result in pool.map(
+            partial(_validate_one, filename=filename),
+            blocks,
+            chunksize=VALIDATION_CHUNK_SIZE
+        ):
+            done += 1
+            yield result
+    except BrokenProcessPool:
+        logger.warning("CPU pool broke during validation; validating in-process")
+        _discard_cpu_pool(pool)
+        yield from validator.iter_validate(blocks[done:], filename)
+
+
+def resumable_files():
+    """Condition for file rows no live processor owns: pending, or 'processing' gone stale."""
+    return or_(
+        FileMetadata.processing_status == "pending",
+        and_(
+            FileMetadata.processing_status == "processing",
+            or_(
+                FileMetadata.processing_heartbeat.is_(None),
+                FileMetadata.processing_heartbeat < datetime.utcnow() - PROCESSING_STALE_AFTER
+            )
+        )
+    )
+
 
 class BatchProcessor:
     """Process multiple files in parallel with progress tracking"""
     
-    def __init__(self, db: Session):
-        self.db = db
-        self.normalizer = FileNormalizer()
-        self.segmenter = Segmenter()
-        self.validator = Validator()
-        self.filter = PrecisionFilter()
+    # Stateless pipeline stages, shared by every batch (one processor is
+    # created per batch)
+    validator = Validator()
+    filter = PrecisionFilter()
+    
+    def __init__(self, session_factory: Callable[[], Session] = SessionLocal, owner: Optional[str] = None):
+        # Each file task opens its own Session; Sessions must not be shared
+        # across concurrent tasks/threads.
+        self.session_factory = session_factory
+        
+        # Recorded on the file rows this processor claims (see _claim)
+        self.owner = owner or uuid.uuid4().hex
         
         # Track batch progress
         self.batch_status: Dict[str, Dict] = {}
@@ -46,19 +215,85 @@ class BatchProcessor:
             "file_statuses": {}
         }
         
-        # Process files concurrently
-        tasks = [
-            self._process_single_file(batch_id, file_id, session_id)
-            for file_id in file_ids
-        ]
+        # Process files concurrently, at most MAX_CONCURRENCY at a time
+        semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
         
-        await asyncio.gather(*tasks, return_exceptions=True)
+        async def _bounded(file_id: int) -> Dict:
+            async with semaphore:
+                return await self._process_single_file(batch_id, file_id, session_id)
         
-        # Update final status
-        self.batch_status[batch_id]["in_progress"] = False
-        self.batch_status[batch_id]["end_time"] = datetime.utcnow()
+        handed_off = False
+        try:
+            for task in asyncio.as_completed([_bounded(file_id) for file_id in file_ids]):
+                result = await task
+                handed_off |= result["status"] == "handed_off"
+        finally:
+            # Update final status, even if a file task raised
+            self.batch_status[batch_id]["in_progress"] = False
+            self.batch_status[batch_id]["end_time"] = datetime.utcnow()
         
-        return self.batch_status[batch_id]
+        status = self.batch_status[batch_id]
+        if handed_off:
+            # Another process owns part of the batch; only the database has
+            # the whole picture, so status polling falls back to it
+            del self.batch_status[batch_id]
+        return status
+    
+    def _claim(self, db: Session, file_id: int) -> bool:
+        """
+        Mark the file as being processed by this processor, in one UPDATE.
+        Files owned by a live processor elsewhere are left alone; failed
+        files may be retried. Returns whether the claim succeeded.
+        """
+        claimed = db.execute(
+            update(FileMetadata)
+            .where(
+                FileMetadata.id == file_id,
+                or_(
+                    resumable_files(),
+                    FileMetadata.processing_status == "error",
+                    FileMetadata.processing_owner == self.owner
+                )
+            )
+            .values(
+                processing_status="processing",
+                processing_owner=self.owner,
+                processing_heartbeat=datetime.utcnow()
+            )
+        ).rowcount
+        db.commit()
+        return claimed == 1
+    
+    def _owned(self):
+        """Condition for the processing rows this processor still owns."""
+        return and_(
+            FileMetadata.processing_status == "processing",
+            FileMetadata.processing_owner == self.owner
+        )
+    
+    def _release(self, batch_id: str, file_id: int, db: Session) -> Dict:
+        """
+        Record a file this processor does not (or no longer) own: already
+        complete, or being processed by another process.
+        """
+        db.rollback()
+        row = db.query(FileMetadata.processing_status).filter(FileMetadata.id == file_id).first()
+        if row is None:
+            raise Exception(f"File {file_id} not found")
+        
+        file_status = self.batch_status[batch_id]["file_statuses"][file_id]
+        if row.processing_status == "complete":
+            # Duplicate of a file that was already extracted
+            self.batch_status[batch_id]["completed_files"] += 1
+            file_status.update({
+                "status": "complete",
+                "end_time": datetime.utcnow(),
+                "blocks_extracted": db.query(ExtractedBlock).filter(ExtractedBlock.file_id == file_id).count()
+            })
+            return {"file_id": file_id, "status": "success", "blocks_count": file_status["blocks_extracted"]}
+        
+        file_status["status"] = row.processing_status
+        return {"file_id": file_id, "status": "handed_off"}
     
     async def _process_single_file(
         self,
@@ -68,6 +303,7 @@ class BatchProcessor:
     ) -> Dict:
         """Process a single file within a batch"""
         file = None
+        db = None
         try:
             # Update file status initial
             self.batch_status[batch_id]["file_statuses"][file_id] = {
@@ -77,17 +313,22 @@ class BatchProcessor:
                 "error": None
             }
             
+            db = self.session_factory()
+            
+            # Claim the file so no other process extracts it concurrently
+            if not self._claim(db, file_id):
+                return self._release(batch_id, file_id, db)
+            
             # Get file from database
-            file = self.db.query(FileMetadata).filter(
+            file = db.query(FileMetadata).filter(
                 FileMetadata.id == file_id
             ).first()
             
             if not file:
                 raise Exception(f"File {file_id} not found")
             
-            # Update DB status
-            file.processing_status = "processing"
-            self.db.commit()
+            # In-flight progress lives in batch_status; the DB row only
+            # records the claim, heartbeats and the terminal state
             
             # Determine file path
             if file.original_path and os.path.isabs(file.original_path) and os.path.exists(file.original_path):
@@ -96,88 +337,62 @@ class BatchProcessor:
                 # Fallback path logic
                 file_path = os.path.join("data", "uploads", file.filename)
             
-            # 1. Normalize
-            if file.file_type == "pdf":
-                normalized_result = await asyncio.to_thread(self.normalizer.normalize_file, file_path)
-                normalized_text = normalized_result['content']
-            elif file.file_type == "docx":
-                normalized_result = await asyncio.to_thread(self.normalizer.normalize_file, file_path)
-                normalized_text = normalized_result['content']
-            else:
-                # Text based files
-                normalized_result = await asyncio.to_thread(self.normalizer.normalize_file, file_path)
-                normalized_text = normalized_result['content']
-            
-            # 2. Segment
+            # 1. Normalize + 2. Segment in a worker process
+            # (the normalizer dispatches on file type itself)
             # Returns List[CandidateBlock] objects
-            segments = await asyncio.to_thread(
-                self.segmenter.segment, 
-                normalized_text,
-                language=file.file_type,
-                filename=file.filename
+            segments = await run_in_cpu_pool(
+                _normalize_and_segment,
+                file_path,
+                file.file_type,
+                file.filename
             )
             
-            extracted_blocks = []
-            for segment in segments:
-                # 3. Validate
-                # Validator takes the whole CandidateBlock object, not just content string
-                result = self.validator.validate_block(segment, filename=file.filename)
-                
-                if result['valid']:
-                    # 4. Filter
-                    # PrecisionFilter uses 'should_accept_block' method and takes the validation result dict
-                    filter_result = self.filter.should_accept_block(result)
-                    
-                    if filter_result['accept']:
-                        # 5. Secret Detection (Scan before saving)
-                        has_secrets = SecretScanner.has_secrets(segment.content)
-                        secret_types = SecretScanner.get_secret_types(segment.content) if has_secrets else []
-                        secret_str = ",".join(secret_types) if secret_types else None
-
-                        # Save block
-                        block = ExtractedBlock(
-                            file_id=file_id,
-                            session_id=session_id,
-                            content=segment.content,
-                            language=result.get('language'),
-                            block_type=result.get('block_type', 'code'),
-                            # Use adjusted confidence if available, else validator confidence
-                            confidence_score=result.get('confidence_score', 0),
-                            validation_method=result.get('validation_method', 'unknown'),
-                            start_line=segment.start_line,
-                            end_line=segment.end_line,
-                            has_secrets=has_secrets,
-                            secret_type=secret_str
-                        )
-                        
-                        self.db.add(block)
-                        extracted_blocks.append(block)
+            # Segmentation is the long step; report progress so the claim
+            # doesn't go stale
+            if not db.execute(
+                update(FileMetadata)
+                .where(FileMetadata.id == file_id, self._owned())
+                .values(processing_heartbeat=datetime.utcnow())
+            ).rowcount:
+                return self._release(batch_id, file_id, db)
+            db.commit()
             
-            # Commit all blocks
-            self.db.commit()
+            # 3. Validate + 4. Filter + 5. Secret detection, off the event
+            # loop (waiting on pool results would block it)
+            rows = await asyncio.to_thread(self._build_rows, segments, file.filename, file_id, session_id)
             
-            # Update file status
-            file.processing_status = "complete"
-            self.db.commit()
+            # Mark the file complete and insert all blocks in a single
+            # transaction, unless the claim was lost to another process
+            if not db.execute(
+                update(FileMetadata)
+                .where(FileMetadata.id == file_id, self._owned())
+                .values(processing_status="complete", processing_heartbeat=None)
+            ).rowcount:
+                return self._release(batch_id, file_id, db)
+            if rows:
+                # Bulk inserts skip flush events; fold them into the analytics rows here
+                StatsService.record_blocks(db, file_id, [(row.language, row.confidence_score) for row in rows])
+                db.bulk_insert_mappings(ExtractedBlock, [asdict(row) for row in rows])
+            db.commit()
             
             # Update batch progress
             self.batch_status[batch_id]["completed_files"] += 1
             self.batch_status[batch_id]["file_statuses"][file_id].update({
                 "status": "complete",
                 "end_time": datetime.utcnow(),
-                "blocks_extracted": len(extracted_blocks),
+                "blocks_extracted": len(rows),
                 "error": None
             })
             
             return {
                 "file_id": file_id,
                 "status": "success",
-                "blocks_count": len(extracted_blocks)
+                "blocks_count": len(rows)
             }
             
         except Exception as e:
             # Handle error
-            print(f"Error processing file {file_id}: {str(e)}") # Log for debug
+            logger.exception("Error processing file %s", file_id)
             self.batch_status[batch_id]["failed_files"] += 1
             if file_id in self.batch_status[batch_id]["file_statuses"]:
                 self.batch_status[batch_id]["file_statuses"][file_id].update({
@@ -186,19 +401,59 @@ class BatchProcessor:
                     "error": str(e)
                 })
             
-            # Update file in database if possible
+            # Update file in database if possible (no row reload needed)
             if file:
                 try:
-                    file.processing_status = "error"
-                    self.db.commit()
-                except:
-                    self.db.rollback()
+                    db.rollback()
+                    db.execute(
+                        update(FileMetadata)
+                        .where(FileMetadata.id == file_id, self._owned())
+                        .values(processing_status="error", processing_heartbeat=None)
+                    )
+                    db.commit()
+                except Exception:
+                    db.rollback()
             
             return {
                 "file_id": file_id,
                 "status": "error",
                 "error": str(e)
             }
+        finally:
+            if db is not None:
+                db.close()
+    
+    def _build_rows(self, segments: List[CandidateBlock], filename: str,
+                    file_id: int, session_id: Optional[int]) -> List[SegmentRow]:
+        """Validate, filter and secret-scan a file's segments into insertable rows (blocking)."""
+        # One batched call each for validation and filtering
+        accepted = self.filter.iter_accepted(
+            result for result in validate_blocks(segments, filename, self.validator)
+            if result['valid']
+        )
+        # Buffer lightweight rows; inserted in one statement by the caller
+        rows = [
+            SegmentRow(
+                file_id,
+                session_id,
+                result['content'],
+                result.get('language'),
+                result.get('block_type', 'code'),
+                # Use adjusted confidence if available, else validator confidence
+                result.get('confidence_score', 0),
+                result.get('validation_method', 'unknown'),
+                result['start_line'],
+                result['end_line'],
+            )
+            for result in accepted
+        ]
+        
+        # One scan per accepted block, before saving
+        secret_results = SecretScanner.detect_batch([row.content for row in rows])
+        for row, secret_types in zip(rows, secret_results):
+            row.has_secrets = bool(secret_types)
+            row.secret_type = ",".join(secret_types) if secret_types else None
+        return rows
     
     def get_batch_status(self, batch_id: str) -> Dict:
         """Get current status of a batch"""
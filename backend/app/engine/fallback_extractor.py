@@ -4,14 +4,19 @@ Fallback extraction for unsupported languages using regex patterns.
 import re
 from typing import List, Dict
 
+
+# A run of consecutive lines that each contain a non-whitespace character
+_BLOCK_RE = re.compile(r'^[^\S\n]*\S[^\n]*(?:\n[^\S\n]*\S[^\n]*)*', re.MULTILINE)
+
+
 class FallbackExtractor:
     """Extract code blocks from unsupported languages using regex."""
     
-    # Common patterns across many languages
+    # Common patterns across many languages (compiled once at import)
     FUNCTION_PATTERNS = [
-        r'(?:function|def|fn|func|fun|func)\s+(\w+)\s*\([^)]*\)\s*(?:{|:)',  # Functions
-        r'(?:class|struct|type|interface)\s+(\w+)',  # Classes/Types
-        r'(?:const|let|var|val)\s+(\w+)\s*=',  # Variables
+        re.compile(r'(?:function|def|fn|func|fun|func)\s+(\w+)\s*\([^)]*\)\s*(?:{|:)'),  # Functions
+        re.compile(r'(?:class|struct|type|interface)\s+(\w+)'),  # Classes/Types
+        re.compile(r'(?:const|let|var|val)\s+(\w+)\s*='),  # Variables
     ]
     
     def extract(self, content: str, filename: str) -> List[Dict]:
@@ -21,34 +26,26 @@ class FallbackExtractor:
         Returns list of blocks with lower confidence.
         """
         blocks = []
-        lines = content.split('\n')
-        
-        # Split by empty lines for basic segmentation
-        current_block = []
-        for i, line in enumerate(lines):
-            if line.strip():
-                current_block.append(line)
-            elif current_block:
-                # End of block
-                blocks.append({
-                    'content': '\n'.join(current_block),
-                    'start_line': i - len(current_block) + 1,
-                    'end_line': i,
-                    'confidence': 0.6,  # Lower confidence for fallback
-                    'extraction_method': 'fallback_regex',
-                    'language': 'unknown' # Will be filled by caller
-                })
-                current_block = []
         
-        # Last block
-        if current_block:
+        # Split by empty lines for basic segmentation: each match is a
+        # maximal run of non-blank lines
+        line_no = 1
+        pos = 0
+        for match in _BLOCK_RE.finditer(content):
+            # Advance the 1-based line counter to the start of this block
+            line_no += content.count('\n', pos, match.start())
+            block = match.group()
+            end_line = line_no + block.count('\n')
+            
             blocks.append({
-                'content': '\n'.join(current_block),
-                'start_line': len(lines) - len(current_block) + 1,
-                'end_line': len(lines),
-                'confidence': 0.6,
+                'content': block,
+                'start_line': line_no,
+                'end_line': end_line,
+                'confidence': 0.6,  # Lower confidence for fallback
                 'extraction_method': 'fallback_regex',
-                'language': 'unknown'
+                'language': 'unknown' # Will be filled by caller
             })
+            line_no = end_line
+            pos = match.end()
         
         return blocks
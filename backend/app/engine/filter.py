@@ -3,7 +3,10 @@ Filter - Precision Filter for False Positive Prevention
 Filters out non-code blocks that passed initial segmentation.
 """
 import re
-from typing import Dict, List
+from typing import Dict, Iterable, Iterator, List
+
+_WORD_RE = re.compile(r'\b\w+\b')
+_SENTENCE_RE = re.compile(r'\.\s+[A-Z]')
 
 
 class PrecisionFilter:
@@ -16,6 +19,7 @@ class PrecisionFilter:
     
     # Inline variable pattern (short assignments without context)
     INLINE_VAR_PATTERN = r'^\s*\w+\s*=\s*.+$'
+    _INLINE_VAR_RE = re.compile(INLINE_VAR_PATTERN)
     
     # Natural language indicators (suggests prose, not code)
     PROSE_INDICATORS = {
@@ -128,13 +132,13 @@ class PrecisionFilter:
         
         # Single line variable assignments
         if len(lines) == 1:
-            return bool(re.match(self.INLINE_VAR_PATTERN, lines[0]))
+            return bool(self._INLINE_VAR_RE.match(lines[0]))
         
         # Multiple simple assignments without structure
         if len(lines) <= 3:
             assignment_count = sum(
                 1 for line in lines
-                if re.match(self.INLINE_VAR_PATTERN, line)
+                if self._INLINE_VAR_RE.match(line)
             )
             # If all lines are simple assignments, likely not real code
             if assignment_count == len(lines):
@@ -201,7 +205,7 @@ class PrecisionFilter:
     def _looks_like_python(self, content: str) -> bool:
         """Heuristic to check if content looks like Python."""
         keywords = {'def', 'class', 'import', 'from', 'if', 'elif', 'else', 'try', 'except'}
-        words = set(re.findall(r'\b\w+\b', content))
+        words = set(_WORD_RE.findall(content))
         return bool(words.intersection(keywords)) and ':' in content
     
     def _looks_like_prose(self, content: str) -> bool:
@@ -209,7 +213,7 @@ class PrecisionFilter:
         Detect if content is natural language prose rather than code.
         Uses word frequency analysis.
         """
-        words = re.findall(r'\b\w+\b', content.lower())
+        words = _WORD_RE.findall(content.lower())
         
         if not words:
             return False
@@ -223,8 +227,7 @@ class PrecisionFilter:
             return True
         
         # Check for sentence-like structures (capital letters after periods)
-        sentence_pattern = r'\.\s+[A-Z]'
-        sentence_count = len(re.findall(sentence_pattern, content))
+        sentence_count = len(_SENTENCE_RE.findall(content))
         
         # Multiple sentences suggest prose
         if sentence_count > 2:
@@ -266,19 +269,22 @@ class PrecisionFilter:
         Returns:
             Filtered list (only accepted blocks)
         """
-        accepted = []
-        
+        return list(self.iter_accepted(validation_results))
+    
+    def iter_accepted(self, validation_results: Iterable[Dict]) -> Iterator[Dict]:
+        """
+        Lazily filter validation results, yielding accepted ones.
+        Rejected results are annotated and dropped as soon as they are seen.
+        """
         for result in validation_results:
             filter_result = self.should_accept_block(result)
             
             if filter_result['accept']:
                 # Add filter metadata
                 result['filter_passed'] = True
-                accepted.append(result)
+                yield result
             else:
                 # Optionally log rejected blocks for debugging
                 result['filter_passed'] = False
                 result['rejection_reason'] = filter_result['reason']
                 result['filtered_by'] = filter_result['filtered_by']
-        
-        return accepted
@@ -4,13 +4,52 @@ Handles multiple file formats and normalizes text for processing.
 """
 import ftfy
 import hashlib
+import re
+import unicodedata
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, Optional
+from typing import Dict, Optional, Tuple
+import os
 import fitz  # PyMuPDF
 from docx import Document
 
 
+# Deletion table for str.translate: C0/C1 control codes (except tab,
+# newline, carriage return), zero-width characters and BOM
+_CTRL_DELETE = dict.fromkeys(
+    [c for c in range(0x20) if c not in (0x09, 0x0A, 0x0D)]
+    + list(range(0x7F, 0xA0))
+    + list(range(0x200B, 0x2010))
+    + [0xFEFF],
+    None
+)
+
+# Mojibake tell-tale: a UTF-8 lead byte followed by continuation bytes, as
+# they appear after a wrong latin-1/cp1252 decode (e.g. 'Ã©', 'â€™', 'ÅŸ')
+_CP1252_CONT = '\x80-\xbf\u0152\u0153\u0160\u0161\u0178\u017d\u017e\u0192\u02c6\u02dc\u2013\u2014\u2018-\u201a\u201c-\u201e\u2020-\u2022\u2026\u2030\u2039\u203a\u20ac\u2122'
+_MOJIBAKE_HINT_RE = re.compile(
+    f'[\xc2-\xdf][{_CP1252_CONT}]'
+    f'|[\xe0-\xef][{_CP1252_CONT}]{{2}}'
+    f'|[\xf0-\xf4][{_CP1252_CONT}]{{3}}'
+)
+
+# ANSI CSI sequences (colours, cursor moves) as left in terminal logs; the
+# same pattern ftfy's remove_terminal_escapes uses
+_ANSI_CSI_RE = re.compile(r'\x1b\[[0-9;]*[a-zA-Z]')
+
+# Trailing whitespace at the end of each line (same set as str.rstrip)
+_TRAIL_WS_RE = re.compile(r'[^\S\n]+(?=\n|\Z)')
+
+
+def content_hasher():
+    """
+    Hash object used for content deduplication (uploads, text inputs,
+    extraction fingerprints). BLAKE2b with a 32-byte digest: faster than
+    SHA-256 in software, same 64-char hex length.
+    """
+    return hashlib.blake2b(digest_size=32)
+
+
 class FileNormalizer:
     """Normalizes various file formats into clean text."""
     
@@ -36,29 +75,40 @@ class FileNormalizer:
         """
         path = Path(file_path)
         
-        if not path.exists():
+        # Single stat call, reused for metadata below
+        try:
+            st = path.stat()
+        except FileNotFoundError:
             raise FileNotFoundError(f"File not found: {file_path}")
         
-        if path.suffix.lower() not in self.SUPPORTED_FORMATS and path.suffix != '':
+        suffix = path.suffix.lower()
+        if suffix not in self.SUPPORTED_FORMATS and suffix != '':
             # Try to process as text for unknown extensions
             pass
         
         # Extract text based on format
-        if path.suffix.lower() == '.pdf':
+        raw = None
+        if suffix == '.pdf':
             content = self._extract_pdf(path)
-        elif path.suffix.lower() == '.docx':
+        elif suffix == '.docx':
             content = self._extract_docx(path)
         else:
-            content = self._extract_text(path)
+            # Text files are read once; the same bytes are hashed below
+            content, raw = self._extract_text(path)
         
         # Normalize text
         normalized_content = self._normalize_text(content)
         
         # Generate metadata
-        metadata = self._extract_metadata(path)
+        metadata = self._extract_metadata(path, st)
         
         # Generate file hash for deduplication
-        file_hash = self._generate_hash(path)
+        if raw is not None:
+            hasher = content_hasher()
+            hasher.update(raw)
+            file_hash = hasher.hexdigest()
+        else:
+            file_hash = self._generate_hash(path)
         
         return {
             'content': normalized_content,
@@ -70,17 +120,9 @@ class FileNormalizer:
     def _extract_pdf(self, path: Path) -> str:
         """Extract text from PDF using PyMuPDF."""
         try:
-            doc = fitz.open(path)
-            text_blocks = []
-            
-            for page_num in range(len(doc)):
-                page = doc[page_num]
-                # Extract text with layout preservation
-                text = page.get_text("text")
-                text_blocks.append(text)
-            
-            doc.close()
-            return "\n\n".join(text_blocks)
+            with fitz.open(path) as doc:
+                # Extract text with layout preservation, page by page
+                return "\n\n".join(page.get_text("text") for page in doc)
         
         except Exception as e:
             raise ValueError(f"Failed to extract PDF: {e}")
@@ -95,22 +137,29 @@ class FileNormalizer:
         except Exception as e:
             raise ValueError(f"Failed to extract DOCX: {e}")
     
-    def _extract_text(self, path: Path) -> str:
-        """Extract text from plain text files."""
+    def _extract_text(self, path: Path) -> Tuple[str, bytes]:
+        """Extract text from plain text files. Returns (text, raw bytes)."""
         try:
-            # Try multiple encodings
+            # Read once, then try multiple encodings on the bytes
+            with open(path, 'rb') as f:
+                raw = f.read()
+            
             encodings = ['utf-8', 'latin-1', 'cp1252']
             
             for encoding in encodings:
                 try:
-                    with open(path, 'r', encoding=encoding) as f:
-                        return f.read()
+                    text = raw.decode(encoding)
+                    break
                 except UnicodeDecodeError:
                     continue
+            else:
+                # If all fail, decode with errors='ignore'
+                text = raw.decode('utf-8', errors='ignore')
             
-            # If all fail, read as binary and decode with errors='ignore'
-            with open(path, 'rb') as f:
-                return f.read().decode('utf-8', errors='ignore')
+            # Universal newlines, as text-mode open() would do
+            if '\r' in text:
+                text = text.replace('\r\n', '\n').replace('\r', '\n')
+            return text, raw
         
         except Exception as e:
             raise ValueError(f"Failed to read text file: {e}")
@@ -119,40 +168,37 @@ class FileNormalizer:
         """
         Normalize text:
         - Fix Unicode errors
-        - Remove invisible control characters
+        - Remove terminal escapes and invisible control characters
         - Normalize whitespace
         """
-        # Fix Unicode encoding issues
-        text = ftfy.fix_text(text)
-        
-        # Normalize to NFC (canonical composition)
-        import unicodedata
-        text = unicodedata.normalize('NFC', text)
-        
-        # Remove zero-width characters and BOM
-        import re
-        text = re.sub(r'[\u200b-\u200f\ufeff]', '', text)
-        
-        # Remove invisible control characters (except newline, tab, carriage return)
-        allowed_chars = {'\n', '\t', '\r'}
-        text = ''.join(
-            char for char in text
-            if char in allowed_chars or not char.isprintable() is False
-        )
-        
-        # Normalize excessive whitespace (but preserve code indentation)
-        lines = text.split('\n')
-        normalized_lines = []
-        
-        for line in lines:
-            # Strip trailing whitespace, but keep leading (for indentation)
-            normalized_lines.append(line.rstrip())
-        
-        return '\n'.join(normalized_lines)
+        # Terminal escapes go whole; the control-character pass below would
+        # only drop the ESC and leave '[31m' residue
+        if '\x1b' in text:
+            text = _ANSI_CSI_RE.sub('', text)
+        
+        # Pure ASCII has no mojibake to fix and is already NFC
+        if not text.isascii():
+            # Fix Unicode encoding issues (only when mojibake is likely)
+            if _MOJIBAKE_HINT_RE.search(text):
+                text = ftfy.fix_text(text)
+            
+            # Normalize to NFC (canonical composition); skip the copy when
+            # the text is already NFC
+            if not unicodedata.is_normalized('NFC', text):
+                text = unicodedata.normalize('NFC', text)
+        
+        # Remove zero-width characters, BOM and invisible control
+        # characters (except newline, tab, carriage return) in one pass
+        text = text.translate(_CTRL_DELETE)
+        
+        # Normalize excessive whitespace (but preserve code indentation):
+        # strip trailing whitespace on every line, keep leading
+        return _TRAIL_WS_RE.sub('', text)
     
-    def _extract_metadata(self, path: Path) -> Dict:
+    def _extract_metadata(self, path: Path, stat: Optional[os.stat_result] = None) -> Dict:
         """Extract file metadata."""
-        stat = path.stat()
+        if stat is None:
+            stat = path.stat()
         
         return {
             'filename': path.name,
@@ -164,12 +210,15 @@ class FileNormalizer:
         }
     
     def _generate_hash(self, path: Path) -> str:
-        """Generate SHA-256 hash of file for deduplication."""
-        hasher = hashlib.sha256()
-        
+        """Generate the content hash of a file for deduplication."""
         with open(path, 'rb') as f:
-            # Read in chunks for large files
-            for chunk in iter(lambda: f.read(4096), b''):
+            if hasattr(hashlib, 'file_digest'):
+                # Python 3.11+: C-level loop over the file
+                return hashlib.file_digest(f, content_hasher).hexdigest()
+            
+            # Read in 1 MiB chunks for large files
+            hasher = content_hasher()
+            while chunk := f.read(1 << 20):
                 hasher.update(chunk)
         
         return hasher.hexdigest()
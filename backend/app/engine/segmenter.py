@@ -3,7 +3,10 @@ Segmenter - Text Segmentation into Candidate Blocks
 Identifies potential code/config blocks using multiple strategies.
 """
 import re
-from typing import List, Optional, Dict
+from bisect import bisect_right
+from itertools import accumulate
+from operator import attrgetter
+from typing import List, Optional, Dict, Tuple
 from dataclasses import dataclass
 from .tree_sitter_manager import TreeSitterManager
 from .fallback_extractor import FallbackExtractor
@@ -11,7 +14,72 @@ import logging
 
 logger = logging.getLogger(__name__)
 
-@dataclass
+# Precompiled patterns used in per-line / per-block loops
+_FENCE_RE = re.compile(r'^```(\w+)?')
+_COMPLEXITY_RE = re.compile(r'\b(def|class|if|for|while|return)\b')
+
+
+def _range_density(
+    tech_cum: List[int],
+    len_cum: List[int],
+    word_cum: List[int],
+    kw_cum: List[int],
+    start: int,
+    stop: int
+) -> float:
+    """
+    Density of lines[start:stop] from per-line prefix sums.
+    
+    Same value as Segmenter._calculate_technical_density('\n'.join(lines[start:stop])).
+    """
+    words = word_cum[stop] - word_cum[start]
+    if not words: return 0.0
+    length = len_cum[stop] - len_cum[start] + (stop - start - 1)
+    return ((tech_cum[stop] - tech_cum[start]) / length * 0.7) + ((kw_cum[stop] - kw_cum[start]) / words * 0.3)
+
+
+def _find_density_intervals(
+    tech_cum: List[int],
+    len_cum: List[int],
+    word_cum: List[int],
+    kw_cum: List[int],
+    marked: bytearray,
+    window: int,
+    min_block: int
+) -> List[Tuple[int, int, float]]:
+    """
+    Find dense line ranges from per-line prefix sums.
+    
+    Returns (start, end, window_density) triples, end exclusive, for ranges
+    of at least min_block lines. Purely numeric: no string work happens here.
+    """
+    n = len(tech_cum) - 1
+    
+    intervals = []
+    i = 0
+    while i < n - window:
+        if marked[i]:
+            i += 1
+            continue
+        
+        density = _range_density(tech_cum, len_cum, word_cum, kw_cum, i, i + window)
+        
+        if density > 0.15:
+            start = i
+            end = i + window
+            while end < n and not marked[end]:
+                if _range_density(tech_cum, len_cum, word_cum, kw_cum, end, end + 1) > 0.12: end += 1
+                else: break
+            
+            if end - start >= min_block:
+                intervals.append((start, end, density))
+            i = end
+        else:
+            i += 1
+    return intervals
+
+
+@dataclass(slots=True, frozen=True)
 class CandidateBlock:
     """Represents a candidate code block."""
     content: str
@@ -30,6 +98,28 @@ class Segmenter:
         'if', 'else', 'for', 'while', 'return', 'void', 'int', 'string',
         'public', 'private', 'static', 'async', 'await', 'try', 'catch'
     }
+    # Keywords that typically start a top-level block (see _extract_toplevel_blocks)
+    START_KEYWORDS = frozenset({
+        'import', 'from', 'package', 'namespace',
+        'def', 'class', 'func', 'function', # Python, Go, JS
+        'pub', 'fn', 'struct', 'enum', 'impl', # Rust
+        'interface', 'type', 'const', 'var', 'let', # TS/JS/Go
+        'public', 'private', 'protected', 'void', # Java/C#
+        '#include', '#define', 'using', 'typedef', # C/C++
+        'if', 'else', 'try', 'catch', 'finally', # Common Control Flow
+        '<?php', 'require', 'include', 'trait', 'abstract', 'final', # PHP
+        'module', 'require_relative', 'alias', # Ruby
+        'fun', 'val', 'data', 'object', # Kotlin
+        'export', 'echo', 'source', 'alias', '#', # Bash
+        '<!DOCTYPE', '<html', '<head', '<body', '<div', '<script', '<style', # HTML
+        '@media', '@import', # CSS
+        'SELECT', 'INSERT', 'UPDATE', 'DELETE', 'CREATE', 'DROP', 'ALTER' # SQL
+    })
+    # First characters that start a block on their own (JSON / Object, HTML / XML tags, PHP)
+    START_CHARS = frozenset('{[<')
+    # str.translate table that deletes technical chars; the length
+    # difference gives the technical char count in C
+    _TECH_DELETE = str.maketrans('', '', ''.join(TECHNICAL_CHARS))
     SECTION_PATTERN = re.compile(r'^[#/\*]+\s*-+\s*SECTION:\s*([A-Z_]+)\s*-+.*$', re.IGNORECASE)
     
     def __init__(self, min_block_lines: int = 3):
@@ -83,44 +173,53 @@ class Segmenter:
              if candidates:
                  return self._deduplicate_blocks(candidates)
 
+        # Split once; all extractors share the line list and stripped lines
+        lines = text.split('\n')
+        stripped = [line.strip() for line in lines]
+
         # 1. Custom Delimiters (Explicit)
-        delimited_blocks = self._extract_delimited_blocks(text)
+        delimited_blocks = self._extract_delimited_blocks(lines, stripped)
         candidates.extend(delimited_blocks)
 
-        marked_lines = set()
+        # Bitmap of lines already claimed by a block (1 = marked)
+        marked_lines = bytearray(len(lines))
         for block in delimited_blocks:
-            marked_lines.update(range(block.start_line, block.end_line + 1))
+            self._mark_lines(marked_lines, block)
 
         # 2. Markdown Fences
-        markdown_blocks = self._extract_markdown_blocks(text)
+        markdown_blocks = self._extract_markdown_blocks(lines, stripped)
         for block in markdown_blocks:
-             if not any(i in marked_lines for i in range(block.start_line, block.end_line + 1)):
+             if not any(marked_lines[block.start_line:block.end_line + 1]):
                  candidates.append(block)
-                 marked_lines.update(range(block.start_line, block.end_line + 1))
+                 self._mark_lines(marked_lines, block)
         
         # 3. Indentation
-        indent_blocks = self._extract_indented_blocks(text, marked_lines)
+        indent_blocks = self._extract_indented_blocks(lines, stripped, marked_lines)
         candidates.extend(indent_blocks)
         for block in indent_blocks:
-            marked_lines.update(range(block.start_line, block.end_line + 1))
+            self._mark_lines(marked_lines, block)
         
         # 4. Top-Level Keywords (New Strategy for standard files)
-        keyword_blocks = self._extract_toplevel_blocks(text, marked_lines)
+        keyword_blocks = self._extract_toplevel_blocks(lines, stripped, marked_lines)
         candidates.extend(keyword_blocks)
         for block in keyword_blocks:
-            marked_lines.update(range(block.start_line, block.end_line + 1))
+            self._mark_lines(marked_lines, block)
+
+        # Per-line counts as prefix sums, shared by the density scan and the
+        # whole-file fallback below
+        line_counts = self._line_prefix_sums(lines)
 
         # 5. Density
-        density_blocks = self._extract_density_blocks(text, marked_lines)
+        density_blocks = self._extract_density_blocks(lines, line_counts, marked_lines)
         candidates.extend(density_blocks)
         
         # 6. FALLBACK: If NO blocks detected, treat entire file as one block
         # This ensures pure source code files (e.g., a single .py file) are not ignored
         if len(candidates) == 0:
-            lines = text.split('\n')
             if len(lines) >= self.min_block_lines:
-                # Check if file has ANY technical content (not just prose)
-                density = self._calculate_density(text)
+                # Check if file has ANY technical content (not just prose);
+                # whole-text density straight from the prefix sums
+                density = _range_density(*line_counts, 0, len(lines))
                 if density > 0.05:  # At least 5% technical chars
                     candidates.append(
                         CandidateBlock(
@@ -135,54 +234,39 @@ class Segmenter:
         
         return self._deduplicate_blocks(candidates)
 
-    def _extract_toplevel_blocks(self, text: str, marked_lines: set) -> List[CandidateBlock]:
+    @staticmethod
+    def _mark_lines(marked_lines: bytearray, block: CandidateBlock) -> None:
+        """Mark lines block.start_line..block.end_line (inclusive) in the bitmap."""
+        start = max(block.start_line, 0)
+        end = min(block.end_line, len(marked_lines) - 1)
+        if end >= start:
+            marked_lines[start:end + 1] = b'\x01' * (end + 1 - start)
+
+    def _extract_toplevel_blocks(self, lines: List[str], stripped: List[str], marked_lines: bytearray) -> List[CandidateBlock]:
         """
         Extract blocks starting with top-level keywords (def, class, import, etc.)
         Useful for standard code files without indentation.
         """
         blocks = []
-        lines = text.split('\n')
         
-        # Keywords that typically start a top-level block
-        START_KEYWORDS = {
-            'import', 'from', 'package', 'namespace',
-            'def', 'class', 'func', 'function', # Python, Go, JS
-            'pub', 'fn', 'struct', 'enum', 'impl', # Rust
-            'interface', 'type', 'const', 'var', 'let', # TS/JS/Go
-            'public', 'private', 'protected', 'void', # Java/C#
-            '#include', '#define', 'using', 'typedef', # C/C++
-            'if', 'else', 'try', 'catch', 'finally', # Common Control Flow
-            '<?php', 'require', 'include', 'trait', 'abstract', 'final', # PHP
-            'module', 'require_relative', 'alias', # Ruby
-            'fun', 'val', 'data', 'object', # Kotlin
-            'export', 'echo', 'source', 'alias', '#', # Bash
-            '<!DOCTYPE', '<html', '<head', '<body', '<div', '<script', '<style', # HTML
-            '@media', '@import', # CSS
-            'SELECT', 'INSERT', 'UPDATE', 'DELETE', 'CREATE', 'DROP', 'ALTER' # SQL
-        }
+        # First space-separated token of every stripped line ('' for blank lines)
+        first_words = [line_stripped.partition(' ')[0] for line_stripped in stripped]
         
         i = 0
         while i < len(lines):
-            if i in marked_lines:
+            if marked_lines[i]:
                 i += 1
                 continue
             
-            line = lines[i]
-            first_word = line.strip().split(' ')[0] if line.strip() else ''
-            
-            # Check if line starts with a keyword or shebang
-            is_start = False
+            first_word = first_words[i]
             
-            if first_word in START_KEYWORDS:
-                is_start = True
-            elif first_word.startswith('#!') or first_word.startswith('<?'): # Shebang or PHP
-                is_start = True
-            elif first_word.startswith('{') or first_word.startswith('['): # JSON / Object
-                is_start = True
-            elif first_word.startswith('<'): # HTML / XML tags
-                is_start = True
-            elif first_word.endswith(':') and len(first_word) > 2: # Python definition end
-                is_start = True
+            # Check if line starts with a keyword, block char or shebang
+            is_start = (
+                first_word in self.START_KEYWORDS
+                or first_word[:1] in self.START_CHARS
+                or first_word.startswith('#!') # Shebang
+                or (len(first_word) > 2 and first_word[-1] == ':') # Python definition end
+            )
                 
             if is_start:
                 start = i
@@ -195,12 +279,12 @@ class Segmenter:
                 
                 j = i + 1
                 while j < len(lines):
-                    if j in marked_lines:
+                    if marked_lines[j]:
                         break
                         
                     next_line = lines[j]
                     
-                    if not next_line.strip():
+                    if not stripped[j]:
                         gap_count += 1
                         if gap_count > max_gap:
                             break
@@ -211,8 +295,7 @@ class Segmenter:
                     
                     # If line is not indented, check if it's a NEW top-level block
                     if not next_line.startswith(' ') and not next_line.startswith('\t'):
-                        next_first = next_line.strip().split(' ')[0]
-                        if next_first in START_KEYWORDS:
+                        if first_words[j] in self.START_KEYWORDS:
                              # It's a new block start, so end current one here
                              break
                     
@@ -231,14 +314,13 @@ class Segmenter:
                 
         return blocks
 
-    def _extract_delimited_blocks(self, text: str) -> List[CandidateBlock]:
+    def _extract_delimited_blocks(self, lines: List[str], stripped: List[str]) -> List[CandidateBlock]:
         blocks = []
-        lines = text.split('\n')
         current_start = -1
         current_lang = None
         
-        for i, line in enumerate(lines):
-            match = self.SECTION_PATTERN.match(line.strip())
+        for i, line_stripped in enumerate(stripped):
+            match = self.SECTION_PATTERN.match(line_stripped)
             if match:
                 if current_start != -1:
                     end_line = i - 1
@@ -254,47 +336,40 @@ class Segmenter:
                 blocks.append(CandidateBlock(content, current_start + 1, len(lines)-1, 'delimiter', 0.99, current_lang))
         return blocks
     
-    def _extract_markdown_blocks(self, text: str) -> List[CandidateBlock]:
+    def _extract_markdown_blocks(self, lines: List[str], stripped: List[str]) -> List[CandidateBlock]:
         blocks = []
-        lines = text.split('\n')
         in_block = False
         block_start = 0
-        block_lines = []
         language_hint = None
         
-        for i, line in enumerate(lines):
-            fence_match = re.match(r'^```(\w+)?', line.strip())
+        for i, line_stripped in enumerate(stripped):
+            fence_match = _FENCE_RE.match(line_stripped)
             if fence_match and not in_block:
                 in_block = True
                 block_start = i
                 language_hint = fence_match.group(1)
-                block_lines = []
-            elif line.strip().startswith('```') and in_block:
-                if len(block_lines) >= self.min_block_lines:
-                    blocks.append(CandidateBlock('\n'.join(block_lines), block_start + 1, i - 1, 'markdown', 0.95, language_hint))
+            elif line_stripped.startswith('```') and in_block:
+                # Fence body is lines[block_start+1:i]; slice it once at close
+                if i - block_start - 1 >= self.min_block_lines:
+                    blocks.append(CandidateBlock('\n'.join(lines[block_start + 1:i]), block_start + 1, i - 1, 'markdown', 0.95, language_hint))
                 in_block = False
-                block_lines = []
                 language_hint = None
-            elif in_block:
-                block_lines.append(line)
         return blocks
     
-    def _extract_indented_blocks(self, text: str, marked_lines: set) -> List[CandidateBlock]:
+    def _extract_indented_blocks(self, lines: List[str], stripped: List[str], marked_lines: bytearray) -> List[CandidateBlock]:
         blocks = []
-        lines = text.split('\n')
         current_block = []
         block_start = None
         
         for i, line in enumerate(lines):
-            if i in marked_lines:
+            if marked_lines[i]:
                 if current_block and len(current_block) >= self.min_block_lines:
                     blocks.append(CandidateBlock('\n'.join(current_block), block_start, i - 1, 'indentation', 0.75))
                 current_block = []
                 block_start = None
                 continue
             
-            indent = len(line) - len(line.lstrip())
-            if line.strip() and (indent >= 4 or line.startswith('\t')):
+            if stripped[i] and (line.startswith('\t') or len(line) - len(line.lstrip()) >= 4):
                 if not current_block: block_start = i
                 current_block.append(line)
             else:
@@ -306,55 +381,67 @@ class Segmenter:
                 block_start = None
         return blocks
     
-    def _extract_density_blocks(self, text: str, marked_lines: set) -> List[CandidateBlock]:
+    def _line_prefix_sums(self, lines: List[str]) -> Tuple[List[int], List[int], List[int], List[int]]:
+        """
+        Prefix sums of per-line technical-char, length, word and keyword counts,
+        so the density of any line range is O(1) instead of re-scanning it.
+        """
+        line_words = [line.lower().split() for line in lines]
+        tech_cum = list(accumulate((len(line) - len(line.translate(self._TECH_DELETE)) for line in lines), initial=0))
+        len_cum = list(accumulate((len(line) for line in lines), initial=0))
+        word_cum = list(accumulate((len(words) for words in line_words), initial=0))
+        kw_cum = list(accumulate((sum(map(self.KEYWORDS.__contains__, words)) for words in line_words), initial=0))
+        return tech_cum, len_cum, word_cum, kw_cum
+    
+    def _extract_density_blocks(
+        self,
+        lines: List[str],
+        line_counts: Tuple[List[int], List[int], List[int], List[int]],
+        marked_lines: bytearray
+    ) -> List[CandidateBlock]:
         blocks = []
-        lines = text.split('\n')
         window_size = 5
-        i = 0
-        while i < len(lines) - window_size:
-            if i in marked_lines:
-                i += 1
-                continue
-            
-            window_text = '\n'.join(lines[i:i+window_size])
-            density = self._calculate_technical_density(window_text)
-            
-            if density > 0.15:
-                start = i
-                end = i + window_size
-                while end < len(lines) and end not in marked_lines:
-                    if self._calculate_technical_density(lines[end]) > 0.12: end += 1
-                    else: break
-                
-                if end - start >= self.min_block_lines:
-                    content = '\n'.join(lines[start:end])
-                    if density > 0.30 or self._calculate_block_complexity(content) >= 3:
-                        blocks.append(CandidateBlock(content, start, end - 1, 'density', min(0.60, density)))
-                i = end
-            else:
-                i += 1
+        if len(lines) <= window_size:
+            return blocks
+        
+        for start, end, density in _find_density_intervals(
+            *line_counts, marked_lines, window_size, self.min_block_lines
+        ):
+            content = '\n'.join(lines[start:end])
+            if density > 0.30 or self._calculate_block_complexity(content) >= 3:
+                blocks.append(CandidateBlock(content, start, end - 1, 'density', min(0.60, density)))
         return blocks
     
     def _calculate_technical_density(self, text: str) -> float:
         if not text.strip(): return 0.0
-        tech_count = sum(1 for char in text if char in self.TECHNICAL_CHARS)
-        words = text.split()
-        keyword_count = sum(1 for word in words if word.lower() in self.KEYWORDS)
+        tech_count = len(text) - len(text.translate(self._TECH_DELETE))
+        words = text.lower().split()
+        keyword_count = sum(map(self.KEYWORDS.__contains__, words))
         return (tech_count / max(len(text), 1) * 0.7) + (keyword_count / max(len(words), 1) * 0.3)
     
     def _calculate_block_complexity(self, block: str) -> int:
-        score = len(re.findall(r'\b(def|class|if|for|while|return)\b', block))
+        score = len(_COMPLEXITY_RE.findall(block))
         if '{' in block and '}' in block: score += 1
         return score
 
     def _deduplicate_blocks(self, blocks: List[CandidateBlock]) -> List[CandidateBlock]:
         if not blocks: return []
-        sorted_blocks = sorted(blocks, key=lambda b: b.confidence, reverse=True)
+        sorted_blocks = sorted(blocks, key=attrgetter('confidence'), reverse=True)
         kept = []
-        used = set()
+        # Kept line ranges as parallel lists sorted by start; they never
+        # overlap, so the ends are sorted too
+        used_starts = []
+        used_ends = []
         for b in sorted_blocks:
-            b_lines = set(range(b.start_line, b.end_line + 1))
-            if not b_lines.intersection(used):
+            if b.end_line < b.start_line:
+                # Empty range overlaps nothing
                 kept.append(b)
-                used.update(b_lines)
-        return sorted(kept, key=lambda b: b.start_line)
\ No newline at end of file
+                continue
+            # Only the last kept range starting at or before b.end_line can overlap
+            idx = bisect_right(used_starts, b.end_line)
+            if idx and used_ends[idx - 1] >= b.start_line:
+                continue
+            kept.append(b)
+            used_starts.insert(idx, b.start_line)
+            used_ends.insert(idx, b.end_line)
+        return sorted(kept, key=attrgetter('start_line'))
\ No newline at end of file
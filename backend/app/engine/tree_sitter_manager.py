@@ -2,9 +2,20 @@
 Tree-sitter Manager - Language Grammar Loader
 Manages Tree-sitter language parsers for AST validation.
 """
+import hashlib
+import re
+import threading
+from collections import OrderedDict, defaultdict
 from pathlib import Path
-from typing import Dict, Optional
-from tree_sitter import Language, Parser
+from typing import Dict, Optional, Tuple, Union, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    # Imported lazily at runtime (load_language / get_parser) to keep app
+    # startup from pulling in the native tree-sitter bindings
+    from tree_sitter import Language, Parser
+
+
+_BRACKET_RE = re.compile(r'[()\[\]{}]')
 
 
 class TreeSitterManager:
@@ -37,6 +48,9 @@ class TreeSitterManager:
         'tsx': 'tsx'
     }
     
+    # Max entries in the validate_syntax result cache
+    SYNTAX_CACHE_SIZE = 512
+    
     def __new__(cls):
         """Singleton pattern."""
         if cls._instance is None:
@@ -50,11 +64,22 @@ class TreeSitterManager:
             return
         
         self.grammar_dir = Path(__file__).parent.parent.parent / "grammars"
-        self.languages: Dict[str, Language] = {}
-        self.parsers: Dict[str, Parser] = {}
+        self.languages: Dict[str, "Language"] = {}
+        self.parsers: Dict[str, "Parser"] = {}
+        # LRU of validate_syntax results keyed on (language, content digest, count_nodes)
+        self._syntax_cache: "OrderedDict[Tuple[str, bytes, bool], Dict]" = OrderedDict()
+        self._syntax_cache_lock = threading.Lock()
+        # Per-language locks so concurrent first uses load a grammar once
+        self._lang_locks: Dict[str, threading.Lock] = defaultdict(threading.Lock)
+        self._table_lock = threading.Lock()
         self._initialized = True
     
-    def load_language(self, language: str) -> Optional[Language]:
+    def _language_lock(self, language: str) -> threading.Lock:
+        """Return the load lock for a language."""
+        with self._table_lock:
+            return self._lang_locks[language]
+    
+    def load_language(self, language: str) -> Optional["Language"]:
         """
         Load a language grammar (lazy loading).
         
@@ -67,59 +92,66 @@ class TreeSitterManager:
         if language not in self.SUPPORTED_LANGUAGES:
             return None
         
-        # Return cached if already loaded
+        # Return cached if already loaded (lock-free fast path)
         if language in self.languages:
             return self.languages[language]
         
-        try:
-            import ctypes
-            grammar_path = self.grammar_dir / f"{language}.so"
-            
-            if not grammar_path.exists():
-                print(f"Warning: Grammar not found for {language} at {grammar_path}")
-                return None
-            
-            # Load library
-            lib = ctypes.cdll.LoadLibrary(str(grammar_path))
-            
-            # Get language function
-            # Convention: tree_sitter_{language}
-            func_name = f"tree_sitter_{language}"
-            
-            # Special handling for C#
-            if language == 'c_sharp':
-                func_name = "tree_sitter_c_sharp"
-            elif language == 'tsx':
-                 # TSX is compiled into typescript.so but has a different entry point
-                 grammar_path = self.grammar_dir / "typescript.so"
-                 func_name = "tree_sitter_tsx"
+        # Only one thread loads a given grammar; others wait and reuse it
+        with self._language_lock(language):
+            if language in self.languages:
+                return self.languages[language]
             
             try:
-                func = getattr(lib, func_name)
-            except AttributeError:
-                # Fallback for some languages that might use diff naming
-                print(f"Warning: Function {func_name} not found in {grammar_path}")
-                return None
-            
-            # Get pointer
-            func.restype = ctypes.c_void_p
-            ptr = func()
-            
-            try:
-                lang = Language(ptr, language)
-            except TypeError:
-                # Fallback for older tree-sitter versions
-                lang = Language(ptr)
+                import ctypes
+                from tree_sitter import Language
+                
+                grammar_path = self.grammar_dir / f"{language}.so"
+                
+                if not grammar_path.exists():
+                    print(f"Warning: Grammar not found for {language} at {grammar_path}")
+                    return None
+                
+                # Load library
+                lib = ctypes.cdll.LoadLibrary(str(grammar_path))
+                
+                # Get language function
+                # Convention: tree_sitter_{language}
+                func_name = f"tree_sitter_{language}"
+                
+                # Special handling for C#
+                if language == 'c_sharp':
+                    func_name = "tree_sitter_c_sharp"
+                elif language == 'tsx':
+                     # TSX is compiled into typescript.so but has a different entry point
+                     grammar_path = self.grammar_dir / "typescript.so"
+                     func_name = "tree_sitter_tsx"
+                
+                try:
+                    func = getattr(lib, func_name)
+                except AttributeError:
+                    # Fallback for some languages that might use diff naming
+                    print(f"Warning: Function {func_name} not found in {grammar_path}")
+                    return None
+                
+                # Get pointer
+                func.restype = ctypes.c_void_p
+                ptr = func()
+                
+                try:
+                    lang = Language(ptr, language)
+                except TypeError:
+                    # Fallback for older tree-sitter versions
+                    lang = Language(ptr)
+                    
+                self.languages[language] = lang
                 
-            self.languages[language] = lang
+                return lang
             
-            return lang
-        
-        except Exception as e:
-            print(f"Error loading {language} grammar: {e}")
-            return None
+            except Exception as e:
+                print(f"Error loading {language} grammar: {e}")
+                return None
     
-    def get_parser(self, language: str) -> Optional[Parser]:
+    def get_parser(self, language: str) -> Optional["Parser"]:
         """
         Get a parser for a language (lazy loading).
         
@@ -132,7 +164,7 @@ class TreeSitterManager:
         if language not in self.SUPPORTED_LANGUAGES:
             return None
         
-        # Return cached parser
+        # Return cached parser (lock-free fast path)
         if language in self.parsers:
             return self.parsers[language]
         
@@ -141,39 +173,57 @@ class TreeSitterManager:
         if not lang:
             return None
         
-        try:
-            parser = Parser(lang)
-            self.parsers[language] = parser
+        with self._language_lock(language):
+            if language in self.parsers:
+                return self.parsers[language]
             
-            return parser
-        
-        except Exception as e:
-            print(f"Error creating parser for {language}: {e}")
-            return None
+            try:
+                from tree_sitter import Parser
+                
+                parser = Parser(lang)
+                self.parsers[language] = parser
+                
+                return parser
+            
+            except Exception as e:
+                print(f"Error creating parser for {language}: {e}")
+                return None
     
-    def validate_syntax(self, code: str, language: str) -> Dict:
+    def validate_syntax(self, code: Union[str, bytes], language: str, count_nodes: bool = False) -> Dict:
         """
         Validate code syntax using Tree-sitter AST.
         
         Args:
-            code: Source code string
+            code: Source code string (or its UTF-8 bytes, to skip re-encoding)
             language: Programming language
+            count_nodes: Also walk the tree to fill 'node_count'
             
         Returns:
-            Dict with 'valid', 'tree', 'errors'
+            Dict with 'valid', 'errors' (and 'node_count' if requested);
+            use parse() for the tree itself
         """
         parser = self.get_parser(language)
         
         if not parser:
             return {
                 'valid': False,
-                'tree': None,
                 'errors': [f'Parser not available for {language}']
             }
         
+        code_bytes = code.encode('utf-8') if isinstance(code, str) else code
+        key = (language, hashlib.blake2b(code_bytes, digest_size=16).digest(), count_nodes)
+        
+        # Same source validated again (re-extract, language detection) -> cached.
+        # Only the summary is kept (no trees), and every caller gets its own copy
+        with self._syntax_cache_lock:
+            cached = self._syntax_cache.get(key)
+            if cached is not None:
+                self._syntax_cache.move_to_end(key)
+                return {**cached, 'errors': [dict(error) for error in cached['errors']]}
+        
         try:
             # Parse the code
-            tree = parser.parse(bytes(code, 'utf-8'))
+            tree = parser.parse(code_bytes)
             root = tree.root_node
             
             # Check for syntax errors
@@ -184,43 +234,58 @@ class TreeSitterManager:
             if has_errors:
                 errors = self._extract_errors(root)
             
-            return {
+            result = {
                 'valid': not has_errors,
-                'tree': tree,
-                'root_node': root,
-                'errors': errors,
-                'node_count': self._count_nodes(root)
+                'errors': errors
             }
+            if count_nodes:
+                result['node_count'] = self._count_nodes(root)
+            
+            with self._syntax_cache_lock:
+                self._syntax_cache[key] = {**result, 'errors': tuple(dict(error) for error in errors)}
+                if len(self._syntax_cache) > self.SYNTAX_CACHE_SIZE:
+                    self._syntax_cache.popitem(last=False)
+            
+            return result
         
         except Exception as e:
             return {
                 'valid': False,
-                'tree': None,
                 'errors': [str(e)]
             }
     
     def _extract_errors(self, node) -> list:
-        """Recursively extract error nodes."""
+        """Extract error nodes (pre-order walk with a tree cursor)."""
         errors = []
+        cursor = node.walk()
         
-        if node.type == 'ERROR' or node.is_missing:
-            errors.append({
-                'type': node.type,
-                'start': node.start_point,
-                'end': node.end_point
-            })
-        
-        for child in node.children:
-            errors.extend(self._extract_errors(child))
-        
-        return errors
+        while True:
+            current = cursor.node
+            if current.type == 'ERROR' or current.is_missing:
+                errors.append({
+                    'type': current.type,
+                    'start': current.start_point,
+                    'end': current.end_point
+                })
+            
+            if cursor.goto_first_child():
+                continue
+            while not cursor.goto_next_sibling():
+                if not cursor.goto_parent():
+                    return errors
     
     def _count_nodes(self, node) -> int:
-        """Count total nodes in AST."""
-        count = 1
-        for child in node.children:
-            count += self._count_nodes(child)
-        return count
+        """Count total nodes in AST (iterative tree cursor walk)."""
+        count = 0
+        cursor = node.walk()
+        
+        while True:
+            count += 1
+            if cursor.goto_first_child():
+                continue
+            while not cursor.goto_next_sibling():
+                if not cursor.goto_parent():
+                    return count
     
     def check_balanced_brackets(self, code: str) -> bool:
         """
@@ -232,10 +297,17 @@ class TreeSitterManager:
         Returns:
             True if balanced
         """
+        # Quick reject: unequal open/close counts can never balance
+        if (code.count('(') != code.count(')')
+                or code.count('[') != code.count(']')
+                or code.count('{') != code.count('}')):
+            return False
+        
+        # Counts match; only the bracket characters matter for nesting order
         stack = []
         pairs = {'(': ')', '[': ']', '{': '}'}
         
-        for char in code:
+        for char in _BRACKET_RE.findall(code):
             if char in pairs:
                 stack.append(char)
             elif char in pairs.values():
@@ -246,14 +318,14 @@ class TreeSitterManager:
         
         return len(stack) == 0
 
-    def parse(self, code: str, language: str):
+    def parse(self, code: Union[str, bytes], language: str):
         """
-        Parse code and return AST tree.
+        Parse code (str or UTF-8 bytes) and return AST tree.
         """
         parser = self.get_parser(language)
         if not parser:
             return None
-        return parser.parse(bytes(code, 'utf-8'))
+        return parser.parse(code.encode('utf-8') if isinstance(code, str) else code)
 
     def get_language_from_extension(self, ext: str) -> Optional[str]:
         """Convert file extension (without dot) to supported language name."""
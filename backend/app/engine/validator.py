@@ -6,7 +6,7 @@ import re
 import json
 import yaml
 import xml.etree.ElementTree as ET
-from typing import Dict, Optional
+from typing import Dict, Iterable, Iterator, List, Optional
 from app.engine.tree_sitter_manager import TreeSitterManager
 from app.engine.segmenter import CandidateBlock
 
@@ -35,6 +35,22 @@ class Validator:
         'ip_address': r'\b(?:\d{1,3}\.){3}\d{1,3}\b',
     }
     
+    # Language implied by a file extension
+    EXTENSION_HINTS = {
+        'py': 'python', 'js': 'javascript', 'jsx': 'javascript', 
+        'ts': 'typescript', 'tsx': 'tsx',
+        'java': 'java', 'c': 'c', 'cpp': 'cpp', 'cc': 'cpp',
+        'go': 'go', 'rs': 'rust', 'php': 'php', 'rb': 'ruby',
+        'cs': 'c_sharp', 'sh': 'bash', 'bash': 'bash', 'zsh': 'bash',
+        'kt': 'kotlin', 'json': 'json', 'xml': 'xml', 'yaml': 'yaml', 'yml': 'yaml',
+        'md': 'markdown'
+    }
+    
+    # Compiled once per process; matched against every candidate block
+    _CISCO_RES = tuple(re.compile(p, re.M | re.I) for p in CISCO_PATTERNS.values())
+    _NGINX_RES = tuple(re.compile(p, re.M) for p in NGINX_PATTERNS.values())
+    _LOG_RES = {k: re.compile(p, re.M | re.I) for k, p in LOG_PATTERNS.items()}
+    
     def __init__(self):
         """Initialize validator."""
         self.ts_manager = TreeSitterManager()
@@ -44,6 +60,28 @@ class Validator:
         """
         Validate and classify a candidate block.
         """
+        return self._validate(block, self._extension_hint(filename))
+    
+    def validate_blocks(self, blocks: Iterable[CandidateBlock], filename: str = None) -> List[Dict]:
+        """
+        Validate and classify the candidate blocks of one file, in order.
+        The filename-derived language hint is resolved once for all of them.
+        """
+        return list(self.iter_validate(blocks, filename))
+    
+    def iter_validate(self, blocks: Iterable[CandidateBlock], filename: str = None) -> Iterator[Dict]:
+        """Lazy validate_blocks: each result is produced as it is consumed."""
+        extension_hint = self._extension_hint(filename)
+        for block in blocks:
+            yield self._validate(block, extension_hint)
+    
+    def _extension_hint(self, filename: Optional[str]) -> Optional[str]:
+        """Language implied by the file extension, if any."""
+        if not filename or '.' not in filename:
+            return None
+        return self.EXTENSION_HINTS.get(filename.rsplit('.', 1)[-1].lower())
+    
+    def _validate(self, block: CandidateBlock, extension_hint: Optional[str]) -> Dict:
         result = {
             'content': block.content,
             'start_line': block.start_line,
@@ -56,22 +94,6 @@ class Validator:
             'valid': False
         }
         
-        # Determine language hint from extension
-        extension_hint = None
-        if filename:
-            ext = filename.split('.')[-1].lower() if '.' in filename else ''
-            ext_map = {
-                'py': 'python', 'js': 'javascript', 'jsx': 'javascript', 
-                'ts': 'typescript', 'tsx': 'tsx',
-                'java': 'java', 'c': 'c', 'cpp': 'cpp', 'cc': 'cpp',
-                'go': 'go', 'rs': 'rust', 'php': 'php', 'rb': 'ruby',
-                'cs': 'c_sharp', 'sh': 'bash', 'bash': 'bash', 'zsh': 'bash',
-                'kt': 'kotlin', 'json': 'json', 'xml': 'xml', 'yaml': 'yaml', 'yml': 'yaml',
-                'md': 'markdown'
-            }
-            extension_hint = ext_map.get(ext)
-
-        
         # 1. Try explicit language hint from block (Markdown fence)
         if block.language_hint:
             lang_result = self._validate_programming_language(
@@ -86,9 +108,9 @@ class Validator:
         
         # 2. PRIORITY: Content-based automatic detection (overrides extension)
         # This catches cases like HTML in a .txt file
-        lang_result = self._detect_programming_language(block.content)
-        if lang_result['valid'] and lang_result.get('confidence_score', 0) > 0.75:
-            result.update(lang_result)
+        auto_result = self._detect_programming_language(block.content)
+        if auto_result['valid'] and auto_result.get('confidence_score', 0) > 0.75:
+            result.update(auto_result)
             result['block_type'] = 'code'
             result['validation_method'] = 'tree-sitter-auto-priority'
             return result
@@ -119,11 +141,9 @@ class Validator:
                     result['confidence_score'] = min(0.99, result['confidence_score'] + 0.15)
                     return result
 
-        # 4. Fallback: Try auto-detection again with lower threshold
-        if not lang_result.get('valid'):
-            lang_result = self._detect_programming_language(block.content)
-        if lang_result['valid']:
-            result.update(lang_result)
+        # 4. Fallback: accept the auto-detection result with a lower threshold
+        if auto_result['valid']:
+            result.update(auto_result)
             result['block_type'] = 'code'
             result['validation_method'] = 'tree-sitter-auto'
             return result
@@ -153,8 +173,8 @@ class Validator:
         result['confidence_score'] = block.confidence * 0.5
         return result
     
-    def _validate_programming_language(self, code: str, language: str) -> Dict:
-        """Validate code using Tree-sitter."""
+    def _validate_programming_language(self, code: str, language: str, code_bytes: Optional[bytes] = None) -> Dict:
+        """Validate code using Tree-sitter. code_bytes: code already UTF-8 encoded."""
         lang_map = {
             'py': 'python', 'js': 'javascript', 'ts': 'typescript',
             'c++': 'cpp', 'cs': 'c_sharp', 'rb': 'ruby',
@@ -162,7 +182,9 @@ class Validator:
         }
         language = lang_map.get(language.lower(), language.lower())
         
-        ts_result = self.ts_manager.validate_syntax(code, language)
+        ts_result = self.ts_manager.validate_syntax(
+            code_bytes if code_bytes is not None else code, language, count_nodes=True
+        )
         
         if ts_result['valid']:
             node_count = ts_result.get('node_count', 0)
@@ -184,9 +206,11 @@ class Validator:
     def _detect_programming_language(self, code: str) -> Dict:
         candidate_langs = ['python', 'javascript', 'java', 'go', 'bash', 'php', 'ruby']
         best_result = {'valid': False, 'confidence_score': 0.0}
+        # Encode once for all candidate parsers
+        code_bytes = code.encode('utf-8')
         
         for lang in candidate_langs:
-            result = self._validate_programming_language(code, lang)
+            result = self._validate_programming_language(code, lang, code_bytes)
             if lang == 'bash' and code.startswith('#!'):
                  result['valid'] = True
                  result['language'] = 'bash'
@@ -216,17 +240,17 @@ class Validator:
         return {'valid': False}
 
     def _validate_config(self, content: str) -> Dict:
-        cisco_matches = sum(1 for p in self.CISCO_PATTERNS.values() if re.search(p, content, re.M | re.I))
+        cisco_matches = sum(1 for p in self._CISCO_RES if p.search(content))
         if cisco_matches >= 2:
             return {'valid': True, 'language': 'cisco_ios', 'confidence_score': 0.85, 'validation_method': 'pattern'}
             
-        nginx_matches = sum(1 for p in self.NGINX_PATTERNS.values() if re.search(p, content, re.M))
+        nginx_matches = sum(1 for p in self._NGINX_RES if p.search(content))
         if nginx_matches >= 2:
             return {'valid': True, 'language': 'nginx', 'confidence_score': 0.85, 'validation_method': 'pattern'}
         return {'valid': False}
 
     def _validate_log(self, content: str) -> Dict:
-        matches = {k: len(re.findall(p, content, re.M | re.I)) for k, p in self.LOG_PATTERNS.items()}
+        matches = {k: len(p.findall(content)) for k, p in self._LOG_RES.items()}
         if matches['timestamp'] > 0 and matches['severity'] > 0:
             return {'valid': True, 'language': 'log', 'confidence_score': 0.80, 'validation_method': 'pattern'}
         return {'valid': False}
\ No newline at end of file
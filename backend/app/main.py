@@ -4,11 +4,14 @@ HPES FastAPI Application
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.templating import Jinja2Templates
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, ORJSONResponse
 from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
 import os
 
-from app.database import init_db
+from app.database import init_db, SessionLocal
+from app.engine.batch_processor import MAX_CONCURRENCY, shutdown_cpu_pool
 from app.routes import upload, extract, feedback, export as export_route
 from app.routes import sessions, text_input, batch, analytics, search, git, system  # v2.0 routes
 
@@ -30,10 +33,20 @@ async def lifespan(app: FastAPI):
     # Startup
     print("Initializing database...")
     init_db()
+    # Pick up batches interrupted by the previous shutdown
+    with SessionLocal() as db:
+        resumed = batch.resume_unfinished_batches(db)
+    if resumed:
+        print(f"Resumed {resumed} unfinished batch(es)")
+    # Size the to_thread executor to match batch concurrency
+    executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENCY)
+    asyncio.get_running_loop().set_default_executor(executor)
     print("HPES Backend started")
     yield
     # Shutdown
     print("HPES Backend shutting down")
+    executor.shutdown(wait=False)
+    shutdown_cpu_pool()
 
 
 # Create FastAPI app
@@ -41,7 +54,9 @@ app = FastAPI(
     title="HPES API",
     description="Hybrid-Professional Extraction System API",
     version="2.0.0",  # Updated to v2.0
-    lifespan=lifespan
+    lifespan=lifespan,
+    # orjson encodes large block/search payloads much faster than stdlib json
+    default_response_class=ORJSONResponse
 )
 
 # Global Exception Handler (Mask 500 Errors)
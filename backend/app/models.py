@@ -1,7 +1,8 @@
 """
 Database models for HPES.
 """
-from sqlalchemy import Column, Integer, String, Float, DateTime, Text, ForeignKey, Enum, Boolean
+from sqlalchemy import Column, Integer, String, Float, DateTime, Text, ForeignKey, Boolean, Index, CheckConstraint
+from sqlalchemy import DDL, column, event, func, table
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import enum
@@ -33,16 +34,29 @@ class FileMetadata(Base):
     original_filename = Column(String, nullable=False)
     file_type = Column(String, nullable=False)  # pdf, docx, txt, etc.
     file_size = Column(Integer, nullable=False)  # bytes
-    file_hash = Column(String, unique=True, index=True)  # SHA-256 for deduplication
-    upload_date = Column(DateTime, default=datetime.utcnow)
+    file_hash = Column(String, unique=True, index=True)  # BLAKE2b-256 for deduplication
+    # server_default covers rows inserted outside the ORM; the Python default stays
+    # because databases created before it have no column default
+    upload_date = Column(DateTime, default=datetime.utcnow, server_default=func.now(), index=True)
     
     # v2.0: Batch processing support
     batch_id = Column(String, nullable=True, index=True)
     processing_status = Column(String, default="pending")  # pending, processing, complete, error
+    # Batch processor that claimed the file, and when it last reported progress;
+    # a 'processing' row with an old heartbeat belongs to a dead process
+    processing_owner = Column(String, nullable=True)
+    processing_heartbeat = Column(DateTime, nullable=True)
     
     # Store absolute path for Git/Local files
     original_path = Column(String, nullable=True) 
     
+    # BLAKE2b-256 of the file contents the stored blocks were extracted from,
+    # and the size/mtime seen when it was computed (the file is only rehashed
+    # once these change)
+    content_hash = Column(String(64), nullable=True)
+    content_size = Column(Integer, nullable=True)
+    content_mtime_ns = Column(Integer, nullable=True)
+    
     # Relationships
     blocks = relationship("ExtractedBlock", back_populates="file")
     sessions = relationship("SessionFile", back_populates="file")
@@ -53,7 +67,7 @@ class ExtractedBlock(Base):
     __tablename__ = "extracted_blocks"
     
     id = Column(Integer, primary_key=True, index=True)
-    file_id = Column(Integer, ForeignKey("file_metadata.id"), nullable=False)
+    file_id = Column(Integer, ForeignKey("file_metadata.id"), nullable=False, index=True)
     
     # v2.0: Session support
     session_id = Column(Integer, ForeignKey("sessions.id"), nullable=True, index=True)
@@ -76,12 +90,67 @@ class ExtractedBlock(Base):
     end_line = Column(Integer, nullable=True)
     
     # Status
-    status = Column(Enum(BlockStatus), default=BlockStatus.PENDING)
+    status = Column(String(16), default=BlockStatus.PENDING.value)  # BlockStatus value
     created_at = Column(DateTime, default=datetime.utcnow)
     
     # Relationships
     file = relationship("FileMetadata", back_populates="blocks")
     feedbacks = relationship("UserFeedback", back_populates="block")
+    
+    __table_args__ = (
+        # Covers language GROUP BY + confidence AVG without touching table rows
+        Index("ix_eb_lang_conf", "language", "confidence_score"),
+        # Search walks blocks in its (confidence, id) order and seeks to keyset
+        # cursors instead of sorting every match
+        Index("ix_eb_conf_id", confidence_score.desc(), id.desc()),
+        CheckConstraint(
+            "status IN ('pending', 'accepted', 'rejected', 'modified')",
+            name="ck_eb_status"
+        ),
+    )
+
+
+# Full-text index over block content and filename (rowid = extracted_blocks.id).
+# The trigram tokenizer matches substrings case-insensitively, like the ILIKE
+# search it replaces, but from the index instead of a table scan. Triggers
+# keep it in sync with every insert path, including bulk inserts.
+blocks_fts = table("blocks_fts", column("rowid", Integer), column("content"), column("filename"))
+
+BLOCKS_FTS_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS blocks_fts USING fts5(content, filename, tokenize='trigram')",
+    """
+    CREATE TRIGGER IF NOT EXISTS extracted_blocks_fts_ai AFTER INSERT ON extracted_blocks BEGIN
+        INSERT INTO blocks_fts(rowid, content, filename)
+        VALUES (new.id, new.content, (SELECT filename FROM file_metadata WHERE id = new.file_id));
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS extracted_blocks_fts_ad AFTER DELETE ON extracted_blocks BEGIN
+        DELETE FROM blocks_fts WHERE rowid = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS extracted_blocks_fts_au AFTER UPDATE OF content, file_id ON extracted_blocks BEGIN
+        UPDATE blocks_fts
+        SET content = new.content,
+            filename = (SELECT filename FROM file_metadata WHERE id = new.file_id)
+        WHERE rowid = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS file_metadata_fts_au AFTER UPDATE OF filename ON file_metadata BEGIN
+        UPDATE blocks_fts SET filename = new.filename
+        WHERE rowid IN (SELECT id FROM extracted_blocks WHERE file_id = new.id);
+    END
+    """,
+)
+
+for _statement in BLOCKS_FTS_DDL:
+    event.listen(Base.metadata, "after_create", DDL(_statement).execute_if(dialect="sqlite"))
+event.listen(
+    Base.metadata, "before_drop",
+    DDL("DROP TABLE IF EXISTS blocks_fts").execute_if(dialect="sqlite")
+)
 
 
 class UserFeedback(Base):
@@ -91,7 +160,7 @@ class UserFeedback(Base):
     id = Column(Integer, primary_key=True, index=True)
     block_id = Column(Integer, ForeignKey("extracted_blocks.id"), nullable=False)
     
-    action = Column(Enum(FeedbackAction), nullable=False)
+    action = Column(String(16), nullable=False)  # FeedbackAction value
     corrected_language = Column(String, nullable=True)  # If user changed language
     corrected_type = Column(String, nullable=True)  # If user changed type
     
@@ -99,6 +168,10 @@ class UserFeedback(Base):
     
     # Relationships
     block = relationship("ExtractedBlock", back_populates="feedbacks")
+    
+    __table_args__ = (
+        CheckConstraint("action IN ('accept', 'reject', 'modify')", name="ck_feedback_action"),
+    )
 
 
 # ============================================================================
@@ -152,5 +225,5 @@ class TextInput(Base):
     id = Column(Integer, primary_key=True, index=True)
     content = Column(Text, nullable=False)
     source_type = Column(String, default="paste")  # 'paste' or 'markdown'
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)  # History is listed newest first
     file_hash = Column(String, unique=True, index=True)  # For deduplication
@@ -1,12 +1,20 @@
 """
 Analytics Routes - Statistics and Dashboard Data
 """
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import func, desc
-from typing import List, Dict
-from datetime import datetime, timedelta, date
+from sqlalchemy import func, desc, select, bindparam
+from typing import List, Dict, Any, Callable, Optional, Tuple
+from datetime import datetime, timedelta, time
+from collections import OrderedDict
+from functools import wraps
+from time import monotonic
+import hashlib
+import inspect
 import json
+import threading
 
 from app.database import get_db
 from app.models import FileMetadata, ExtractedBlock, ExtractionStats
@@ -17,133 +25,216 @@ from app.schemas.v2_schemas import (
     DailyStats,
     FileStats
 )
+from app.services.stats_service import StatsService
 
 router = APIRouter(prefix="/api/analytics", tags=["analytics"])
 
+# Hot dashboard queries are built once at import with bind parameters, so each
+# request only binds values and hits SQLAlchemy's compiled-statement cache.
 
-@router.get("/overview", response_model=AnalyticsOverview)
-def get_analytics_overview(db: Session = Depends(get_db)):
-    """Get overall system statistics (real-time)."""
-    
-    # 1. Total files
-    total_files = db.query(func.count(FileMetadata.id)).scalar() or 0
-    
-    # 2. Total blocks
-    total_blocks = db.query(func.count(ExtractedBlock.id)).scalar() or 0
-    
-    # 3. Average confidence
-    avg_conf = db.query(func.avg(ExtractedBlock.confidence_score)).scalar() or 0.0
-    
-    # 4. Language distribution (Top 5)
-    # Group by language and count
-    lang_counts = (
-        db.query(
-            ExtractedBlock.language, 
-            func.count(ExtractedBlock.id)
-        )
-        .filter(ExtractedBlock.language.isnot(None))
-        .group_by(ExtractedBlock.language)
-        .order_by(desc(func.count(ExtractedBlock.id)))
-        .all()
+# Main language (simple heuristic: first block's language), fetched in the same query
+_main_lang = (
+    select(ExtractedBlock.language)
+    .where(ExtractedBlock.file_id == FileMetadata.id)
+    .order_by(ExtractedBlock.id)
+    .limit(1)
+    .correlate(FileMetadata)
+    .scalar_subquery()
+)
+
+# Files with block counts
+TOP_FILES_STMT = (
+    select(
+        FileMetadata.id,
+        FileMetadata.filename,
+        func.count(ExtractedBlock.id).label("count"),
+        _main_lang.label("main_lang")
     )
+    .join(ExtractedBlock)
+    .group_by(FileMetadata.id)
+    .order_by(desc("count"))
+    .limit(bindparam("limit"))
+)
+
+DAILY_STATS_STMT = (
+    select(ExtractionStats)
+    .where(ExtractionStats.date >= bindparam("start"), ExtractionStats.date <= bindparam("end"))
+)
+
+# Per-day files, blocks and confidence in one grouped pass
+DAILY_TOTALS_STMT = (
+    select(
+        func.date(FileMetadata.upload_date).label("date"),
+        func.count(func.distinct(FileMetadata.id)),
+        func.count(ExtractedBlock.id),
+        func.avg(ExtractedBlock.confidence_score)
+    )
+    .select_from(FileMetadata)
+    .outerjoin(ExtractedBlock)
+    .where(FileMetadata.upload_date >= bindparam("start"))
+    .group_by("date")
+)
+
+# Dashboards poll these endpoints every few seconds; identical requests within
+# the TTL are answered from memory with the already-encoded JSON body. Keys
+# include StatsService.epoch, so writes committed in this process show up
+# immediately. Each body carries an ETag so pollers revalidate with 304s.
+RESPONSE_CACHE_TTL = 5.0
+RESPONSE_CACHE_SIZE = 64
+CACHE_CONTROL = f"public, max-age={int(RESPONSE_CACHE_TTL)}, stale-while-revalidate=30"
+_response_cache: "OrderedDict[tuple, Tuple[float, bytes, str]]" = OrderedDict()
+_response_cache_lock = threading.Lock()
+
+
+def clear_response_cache():
+    """Drop all cached analytics responses."""
+    with _response_cache_lock:
+        _response_cache.clear()
+
+
+def _encode(result: Any) -> Tuple[bytes, str]:
+    """JSON body of an endpoint result and its ETag."""
+    body = ORJSONResponse(content=jsonable_encoder(result)).body
+    return body, '"' + hashlib.blake2b(body, digest_size=8).hexdigest() + '"'
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+
+def _ttl_cached(endpoint: Callable) -> Callable:
+    """
+    Cache an endpoint's encoded response by its query parameters for
+    RESPONSE_CACHE_TTL seconds, answering matching If-None-Match with 304.
+    """
+    @wraps(endpoint)
+    def wrapper(request: Request, **kwargs):
+        if kwargs.get("exact"):
+            # Forced recount; never served from cache
+            return endpoint(**kwargs)
+        
+        params = tuple(sorted((k, v) for k, v in kwargs.items() if k != "db"))
+        key = (endpoint.__name__, StatsService.epoch, params)
+        now = monotonic()
+        with _response_cache_lock:
+            hit = _response_cache.get(key)
+        if hit is not None and now - hit[0] < RESPONSE_CACHE_TTL:
+            _, body, etag = hit
+        else:
+            body, etag = _encode(endpoint(**kwargs))
+            with _response_cache_lock:
+                _response_cache[key] = (now, body, etag)
+                _response_cache.move_to_end(key)
+                while len(_response_cache) > RESPONSE_CACHE_SIZE:
+                    _response_cache.popitem(last=False)
+        
+        headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+        if _etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, media_type="application/json", headers=headers)
     
-    # Calculate percentages
-    total_lang_blocks = sum(count for _, count in lang_counts) or 1
-    
-    language_stats = []
-    for lang, count in lang_counts:
-        language_stats.append(LanguageStats(
-            language=lang or "Unknown",
-            count=count,
-            percentage=round((count / total_lang_blocks) * 100, 1)
-        ))
+    # FastAPI reads the endpoint's parameters from the signature; add the request
+    signature = inspect.signature(endpoint)
+    wrapper.__signature__ = signature.replace(parameters=[
+        inspect.Parameter("request", inspect.Parameter.KEYWORD_ONLY, annotation=Request),
+        *(p.replace(kind=inspect.Parameter.KEYWORD_ONLY) for p in signature.parameters.values())
+    ])
+    return wrapper
+
+
+@router.get("/overview", response_model=AnalyticsOverview)
+@_ttl_cached
+def get_analytics_overview(exact: bool = False, db: Session = Depends(get_db)):
+    """
+    Get overall system statistics from the pre-aggregated stats row.
+    exact=true recounts from the tables instead of trusting the stored totals.
+    """
+    if exact:
+        stats = StatsService.rebuild_global_stats(db)
+    else:
+        # One row fetch; rebuilt from live aggregates only when stale
+        stats = StatsService.get_global_stats(db)
     
     return AnalyticsOverview(
-        total_files=total_files,
-        total_blocks=total_blocks,
-        avg_confidence=round(avg_conf, 2),
-        language_distribution=language_stats
+        total_files=stats.total_files or 0,
+        total_blocks=stats.total_blocks or 0,
+        avg_confidence=round(stats.avg_confidence or 0.0, 2),
+        language_distribution=_language_stats(stats)
     )
 
 
 @router.get("/languages", response_model=List[LanguageStats])
+@_ttl_cached
 def get_language_breakdown(
     limit: int = 10,
     db: Session = Depends(get_db)
 ):
     """Get detailed language distribution."""
-    lang_counts = (
-        db.query(
-            ExtractedBlock.language, 
-            func.count(ExtractedBlock.id)
-        )
-        .filter(ExtractedBlock.language.isnot(None))
-        .group_by(ExtractedBlock.language)
-        .order_by(desc(func.count(ExtractedBlock.id)))
-        .limit(limit)
-        .all()
-    )
-    
-    total_blocks = db.query(func.count(ExtractedBlock.id)).filter(ExtractedBlock.language.isnot(None)).scalar() or 1
+    stats = StatsService.get_global_stats(db)
+    return _language_stats(stats)[:limit]
+
+
+def _language_stats(stats: ExtractionStats) -> List[LanguageStats]:
+    """Language counts of a stats row, most frequent first, with percentages."""
+    lang_counts = json.loads(stats.language_stats) if stats.language_stats else {}
+    total_lang_blocks = sum(lang_counts.values()) or 1
     
-    stats = []
-    for lang, count in lang_counts:
-        stats.append(LanguageStats(
+    return [
+        LanguageStats(
             language=lang,
             count=count,
-            percentage=round((count / total_blocks) * 100, 1)
-        ))
-        
-    return stats
+            percentage=round((count / total_lang_blocks) * 100, 1)
+        )
+        for lang, count in sorted(lang_counts.items(), key=lambda item: item[1], reverse=True)
+    ]
 
 
 @router.get("/trends", response_model=AnalyticsTrends)
+@_ttl_cached
 def get_analytics_trends(
     days: int = 7,
     db: Session = Depends(get_db)
 ):
     """
     Get extraction trends for the last N days.
-    Usually this would pull from a pre-calculated ExtractionStats table,
-    but here we analyze upload_date for simplicity or use existing stats.
+    Reads the per-day ExtractionStats rows; days without a calculated row
+    are aggregated live from FileMetadata and their blocks.
     """
     end_date = datetime.utcnow().date()
     start_date = end_date - timedelta(days=days-1)
     
-    # Get daily stats from FileMetadata (based on upload_date)
-    # Note: This correlates uploads with extractions
+    # 1. Pre-calculated days (single range scan on the indexed date column)
+    stat_rows = db.execute(DAILY_STATS_STMT, {
+        "start": datetime.combine(start_date, time.min),
+        "end": datetime.combine(end_date, time.min)
+    }).scalars().all()
+    stats_map = {row.date.date().isoformat(): row for row in stat_rows}
     
-    # 1. Daily Files
-    files_per_day = (
-        db.query(
-            func.date(FileMetadata.upload_date).label("date"),
-            func.count(FileMetadata.id)
-        )
-        .filter(FileMetadata.upload_date >= start_date)
-        .group_by("date")
-        .all()
-    )
-    files_map = {str(d): c for d, c in files_per_day}
-    
-    # 2. Daily Blocks (simulated by using blocks linked to those files)
-    # A more precise way would be to timestamp blocks, but currently they inherit file time
-    # Optimization: Use ExtractionStats table if populated
+    # 2. Live per-day totals, only if some days were never calculated
+    live_map = {}
+    if len(stats_map) < days:
+        live_rows = db.execute(DAILY_TOTALS_STMT, {"start": datetime.combine(start_date, time.min)}).all()
+        live_map = {str(d): (files, blocks, conf) for d, files, blocks, conf in live_rows}
     
     daily_stats = []
     for i in range(days):
         current_date = start_date + timedelta(days=i)
         date_str = current_date.isoformat()
         
-        file_count = files_map.get(date_str, 0)
-        
-        # Simple simulation for blocks if not strictly tracked by day in DB yet
-        # Ideally we would query joined FileMetadata -> ExtractedBlock
+        row = stats_map.get(date_str)
+        if row is not None:
+            total_files, total_blocks, avg_conf = row.total_files, row.total_blocks, row.avg_confidence
+        else:
+            total_files, total_blocks, avg_conf = live_map.get(date_str, (0, 0, 0.0))
         
         daily_stats.append(DailyStats(
             date=date_str,
-            total_files=file_count,
-            total_blocks=file_count * 5,  # Estimate or Placeholder until stricter tracking
-            avg_confidence=0.85
+            total_files=total_files or 0,
+            total_blocks=total_blocks or 0,
+            avg_confidence=round(avg_conf or 0.0, 2)
         ))
         
     return AnalyticsTrends(
@@ -153,87 +244,31 @@ def get_analytics_trends(
 
 
 @router.get("/top-files", response_model=List[FileStats])
+@_ttl_cached
 def get_top_files(limit: int = 5, db: Session = Depends(get_db)):
     """Get top 5 files by extracted block count."""
     
-    # Query files with block counts
-    results = (
-        db.query(
-            FileMetadata,
-            func.count(ExtractedBlock.id).label("count")
-        )
-        .join(ExtractedBlock)
-        .group_by(FileMetadata.id)
-        .order_by(desc("count"))
-        .limit(limit)
-        .all()
-    )
+    results = db.execute(TOP_FILES_STMT, {"limit": limit}).all()
     
-    top_files = []
-    for file, count in results:
-        # Determine main language (simple heuristic: first block's language)
-        main_lang = file.blocks[0].language if file.blocks else "Unknown"
-        
-        top_files.append(FileStats(
-            file_id=file.id,
-            filename=file.filename,
+    return [
+        FileStats(
+            file_id=file_id,
+            filename=filename,
             block_count=count,
-            language=main_lang
-        ))
-        
-    return top_files
+            language=lang or "Unknown"
+        )
+        for file_id, filename, count, lang in results
+    ]
 
 
 @router.post("/calculate-daily")
 def trigger_daily_calculation(db: Session = Depends(get_db)):
     """
     Manually trigger daily stats calculation.
-    Populates ExtractionStats table.
+    Today's and the cumulative ExtractionStats rows are maintained on insert;
+    this recomputes both from scratch.
     """
     today = datetime.utcnow().date()
-    
-    # Calculate stats for today
-    files_today = db.query(func.count(FileMetadata.id)).filter(
-        func.date(FileMetadata.upload_date) == today
-    ).scalar()
-    
-    # Blocks linked to files uploaded today
-    blocks_today = (
-        db.query(func.count(ExtractedBlock.id))
-        .join(FileMetadata)
-        .filter(func.date(FileMetadata.upload_date) == today)
-        .scalar()
-    )
-    
-    avg_conf = (
-        db.query(func.avg(ExtractedBlock.confidence_score))
-        .join(FileMetadata)
-        .filter(func.date(FileMetadata.upload_date) == today)
-        .scalar()
-    ) or 0.0
-    
-    # Lang stats
-    lang_counts = (
-        db.query(ExtractedBlock.language, func.count(ExtractedBlock.id))
-        .join(FileMetadata)
-        .filter(func.date(FileMetadata.upload_date) == today)
-        .group_by(ExtractedBlock.language)
-        .all()
-    )
-    
-    lang_json = {lang: count for lang, count in lang_counts if lang}
-    
-    # Save to ExtractionStats
-    stat_entry = db.query(ExtractionStats).filter(ExtractionStats.date == today).first()
-    if not stat_entry:
-        stat_entry = ExtractionStats(date=today)
-        db.add(stat_entry)
-    
-    stat_entry.total_files = files_today or 0
-    stat_entry.total_blocks = blocks_today or 0
-    stat_entry.avg_confidence = avg_conf
-    stat_entry.language_stats = json.dumps(lang_json)  # Serialize to string for Text column
-    
-    db.commit()
+    StatsService.calculate_daily_stats(db, today)
     
     return {"message": "Daily stats calculated", "date": str(today)}
@@ -4,22 +4,117 @@ Upload and process multiple files simultaneously
 """
 from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, BackgroundTasks
 from sqlalchemy.orm import Session
-from typing import List
+from sqlalchemy import func, update
+from typing import List, Optional, Tuple
+import asyncio
 import uuid
+from collections import defaultdict
 import os
-import hashlib
 from datetime import datetime
 
 from app.database import get_db
-from app.models import FileMetadata
+from app.models import FileMetadata, ExtractedBlock
 from app.schemas.v2_schemas import BatchUploadResponse, BatchStatusResponse, BatchFileStatus
-from app.engine.batch_processor import BatchProcessor
+from app.engine.batch_processor import BatchProcessor, resumable_files
+from app.engine.normalizer import content_hasher
+from app.routes.upload import UPLOAD_OPEN_FLAGS, UPLOAD_FILE_MODE
 
 router = APIRouter(prefix="/api/batch", tags=["batch-processing"])
 
 # Global batch processor instances (keyed by batch_id)
 batch_processors = {}
 
+# Uploads are read and hashed in chunks of this size
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+ALLOWED_EXTENSIONS = frozenset({'pdf', 'docx', 'txt', 'md', 'log', 'conf', 'json', 'yaml', 'xml'})
+
+# Declared types accepted besides text/*; octet-stream is what browsers send
+# for extensions they don't know (.log, .conf, .yaml)
+ALLOWED_CONTENT_TYPES = frozenset({
+    'application/pdf',
+    'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+    'application/json',
+    'application/xml',
+    'application/yaml',
+    'application/x-yaml',
+    'application/octet-stream',
+})
+
+
+def _allowed_content_type(content_type: Optional[str]) -> bool:
+    """A missing content type is allowed; the extension check already passed."""
+    if not content_type:
+        return True
+    media_type = content_type.partition(';')[0].strip().lower()
+    return media_type.startswith('text/') or media_type in ALLOWED_CONTENT_TYPES
+
+# Running batch tasks; referenced here so the event loop can't drop them mid-run
+_batch_tasks = set()
+
+
+def start_batch(batch_id: str, file_ids: List[int], session_id: Optional[int] = None,
+                owner: Optional[str] = None) -> BatchProcessor:
+    """
+    Register a processor for the batch and run it as a background task.
+    owner is the claim token already recorded on the files, if any.
+    """
+    processor = BatchProcessor(owner=owner)
+    batch_processors[batch_id] = processor  # Register for status polling
+    
+    task = asyncio.create_task(processor.process_batch(batch_id, file_ids, session_id))
+    _batch_tasks.add(task)
+    task.add_done_callback(_batch_tasks.discard)
+    return processor
+
+
+def resume_unfinished_batches(db: Session) -> int:
+    """
+    Restart batches with files no live process owns: still pending, or
+    'processing' with a stale heartbeat (the owner died). Files are claimed
+    for a new owner in one UPDATE, so concurrent startups and running workers
+    don't process them twice. Returns the number of batches resumed.
+    """
+    owner = uuid.uuid4().hex
+    claimed = db.execute(
+        update(FileMetadata)
+        .where(FileMetadata.batch_id.isnot(None), resumable_files())
+        .values(
+            processing_status="processing",
+            processing_owner=owner,
+            processing_heartbeat=datetime.utcnow()
+        )
+        .returning(FileMetadata.batch_id, FileMetadata.id)
+    ).all()
+    db.commit()
+    
+    pending = defaultdict(list)
+    for batch_id, file_id in claimed:
+        pending[batch_id].append(file_id)
+    for batch_id, file_ids in pending.items():
+        start_batch(batch_id, sorted(file_ids), owner=owner)
+    return len(pending)
+
+
+def _stage_upload(src, tmp_path: str) -> Tuple[int, str]:
+    """Copy an upload to tmp_path, hashing it in the same pass. Returns (size, content hash hex)."""
+    hasher = content_hasher()
+    file_size = 0
+    with os.fdopen(os.open(tmp_path, UPLOAD_OPEN_FLAGS, UPLOAD_FILE_MODE), 'wb') as f:
+        while chunk := src.read(UPLOAD_CHUNK_SIZE):
+            hasher.update(chunk)
+            f.write(chunk)
+            file_size += len(chunk)
+    return file_size, hasher.hexdigest()
+
+
+def _place_staged(discarded: List[str], moves: List[Tuple[str, str]]):
+    """Delete staged duplicates and move new files to their final names."""
+    for tmp_path in discarded:
+        os.remove(tmp_path)
+    for tmp_path, file_path in moves:
+        os.replace(tmp_path, file_path)
+
 
 @router.post("/upload", response_model=BatchUploadResponse, status_code=status.HTTP_201_CREATED)
 async def upload_batch(
@@ -53,30 +148,45 @@ async def upload_batch(
     
     # Upload directory
     upload_dir = "data/uploads"
-    os.makedirs(upload_dir, exist_ok=True)
-    
-    file_ids = []
+    await asyncio.to_thread(os.makedirs, upload_dir, exist_ok=True)
     
-    # Save each file
+    # 1. Stream each file to a temporary file, hashing in the same pass.
+    # Files are staged in parallel threads; hashing and disk I/O release the GIL.
+    accepted = []
     for file in files:
-        # Validate file type
-        file_extension = file.filename.split('.')[-1].lower()
-        if file_extension not in ['pdf', 'docx', 'txt', 'md', 'log', 'conf', 'json', 'yaml', 'xml']:
+        # Validate file type (extension, then declared content type) before staging
+        file_extension = file.filename.rpartition('.')[2].lower()
+        if file_extension not in ALLOWED_EXTENSIONS or not _allowed_content_type(file.content_type):
             continue  # Skip unsupported files
-        
-        # Read file content
-        content = await file.read()
-        
-        # Calculate hash
-        file_hash = hashlib.sha256(content).hexdigest()
-        
-        # Check for duplicates
-        existing_file = db.query(FileMetadata).filter(
-            FileMetadata.file_hash == file_hash
-        ).first()
-        
-        if existing_file:
-            file_ids.append(existing_file.id)
+        tmp_path = os.path.join(upload_dir, f".{batch_id}.{len(accepted)}.part")
+        accepted.append((file, file_extension, tmp_path))
+    
+    results = await asyncio.gather(*(
+        asyncio.to_thread(_stage_upload, file.file, tmp_path)
+        for file, _, tmp_path in accepted
+    ))
+    staged = [
+        (file, file_extension, tmp_path, file_size, file_hash)
+        for (file, file_extension, tmp_path), (file_size, file_hash) in zip(accepted, results)
+    ]
+    
+    # 2. Check for duplicates of the whole batch in one query
+    known_hashes = dict(
+        db.query(FileMetadata.file_hash, FileMetadata.id)
+        .filter(FileMetadata.file_hash.in_([entry[4] for entry in staged]))
+        .all()
+    )
+    
+    # 3. Save each new file; rows are inserted together below
+    new_rows = {}
+    batch_files = []
+    discarded = []
+    moves = []
+    for file, file_extension, tmp_path, file_size, file_hash in staged:
+        if file_hash in known_hashes or file_hash in new_rows:
+            # Duplicate of an existing file, or repeated within this batch
+            discarded.append(tmp_path)
+            batch_files.append(file_hash)
             continue
         
         # Generate unique filename
@@ -84,36 +194,35 @@ async def upload_batch(
         unique_filename = f"{timestamp}_{file.filename}"
         file_path = os.path.join(upload_dir, unique_filename)
         
-        # Save file
-        with open(file_path, 'wb') as f:
-            f.write(content)
+        # Move the streamed file into place
+        moves.append((tmp_path, file_path))
         
         # Create database record
-        file_metadata = FileMetadata(
+        new_rows[file_hash] = FileMetadata(
             filename=unique_filename,
             original_filename=file.filename,
             file_type=file_extension,
-            file_size=len(content),
+            file_size=file_size,
             file_hash=file_hash,
             batch_id=batch_id,
             processing_status="pending"
         )
-        
-        db.add(file_metadata)
+        batch_files.append(file_hash)
+    
+    # File system updates off the event loop, in one thread hop
+    await asyncio.to_thread(_place_staged, discarded, moves)
+    
+    # 4. One INSERT round and one commit for the whole batch
+    if new_rows:
+        db.add_all(new_rows.values())
+        db.flush()
+        known_hashes.update((file_hash, row.id) for file_hash, row in new_rows.items())
         db.commit()
-        db.refresh(file_metadata)
-        
-        file_ids.append(file_metadata.id)
     
-    # Initialize batch processor
-    processor = BatchProcessor(db)
-    batch_processors[batch_id] = processor
+    file_ids = [known_hashes[file_hash] for file_hash in batch_files]
     
     # Start async processing in background
-    import asyncio
-    asyncio.create_task(
-        processor.process_batch(batch_id, file_ids, session_id)
-    )
+    start_batch(batch_id, file_ids, session_id)
     
     return BatchUploadResponse(
         batch_id=batch_id,
@@ -128,33 +237,34 @@ def get_batch_status(
     db: Session = Depends(get_db)
 ):
     """Get current processing status of a batch"""
-    # Check if batch exists
+    # Live status from this process's processor, if it owns the batch
     processor = batch_processors.get(batch_id)
-    
-    if not processor:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Batch not found"
-        )
-    
-    # Get status
-    status_data = processor.get_batch_status(batch_id)
+    status_data = processor.get_batch_status(batch_id) if processor else None
     
     if not status_data:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Batch status not available"
-        )
+        # Batch owned by another worker (or a restarted process): rebuild from the database
+        db_status = _batch_status_from_db(batch_id, db)
+        if db_status is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Batch not found"
+            )
+        return db_status
+    
+    # Get filenames from database in one query
+    file_ids = list(status_data["file_statuses"].keys())
+    name_map = dict(
+        db.query(FileMetadata.id, FileMetadata.original_filename)
+        .filter(FileMetadata.id.in_(file_ids))
+        .all()
+    )
     
     # Build file statuses
     file_statuses = []
     for file_id, file_status in status_data["file_statuses"].items():
-        # Get filename from database
-        file = db.query(FileMetadata).filter(FileMetadata.id == file_id).first()
-        
         file_statuses.append(BatchFileStatus(
             file_id=file_id,
-            filename=file.original_filename if file else "unknown",
+            filename=name_map.get(file_id, "unknown"),
             status=file_status["status"],
             blocks_extracted=file_status.get("blocks_extracted", 0),
             error_message=file_status.get("error")
@@ -178,6 +288,53 @@ def get_batch_status(
     )
 
 
+def _batch_status_from_db(batch_id: str, db: Session) -> Optional[BatchStatusResponse]:
+    """Batch status from persisted FileMetadata rows; None if the batch is unknown."""
+    rows = (
+        db.query(
+            FileMetadata.id,
+            FileMetadata.original_filename,
+            FileMetadata.processing_status,
+            func.count(ExtractedBlock.id)
+        )
+        .outerjoin(ExtractedBlock)
+        .filter(FileMetadata.batch_id == batch_id)
+        .group_by(FileMetadata.id)
+        .all()
+    )
+    if not rows:
+        return None
+    
+    file_statuses = [
+        BatchFileStatus(
+            file_id=file_id,
+            filename=filename,
+            status=file_status,
+            blocks_extracted=block_count
+        )
+        for file_id, filename, file_status, block_count in rows
+    ]
+    completed_files = sum(1 for f in file_statuses if f.status == "complete")
+    failed_files = sum(1 for f in file_statuses if f.status == "error")
+    
+    # Determine overall status
+    if completed_files + failed_files < len(file_statuses):
+        overall_status = "in_progress"
+    elif failed_files > 0:
+        overall_status = "partial_failure"
+    else:
+        overall_status = "complete"
+    
+    return BatchStatusResponse(
+        batch_id=batch_id,
+        total_files=len(file_statuses),
+        completed_files=completed_files,
+        failed_files=failed_files,
+        overall_status=overall_status,
+        files=file_statuses
+    )
+
+
 @router.get("/{batch_id}/export")
 def export_batch(
     batch_id: str,
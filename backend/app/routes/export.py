@@ -2,8 +2,9 @@
 Export Route - Generate ZIP Archive with Categorized Files
 """
 from fastapi import APIRouter, Depends, HTTPException
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse
 from sqlalchemy.orm import Session
+from sqlalchemy import select
 from pathlib import Path
 import zipfile
 import json
@@ -21,6 +22,25 @@ EXPORT_DIR.mkdir(parents=True, exist_ok=True)
 export_service = ExportService(EXPORT_DIR)
 
 
+# Only the columns the export formats use
+EXPORT_BLOCKS_STMT = select(
+    ExtractedBlock.id,
+    ExtractedBlock.content,
+    ExtractedBlock.language,
+    ExtractedBlock.block_type,
+    ExtractedBlock.confidence_score,
+    ExtractedBlock.start_line,
+    ExtractedBlock.end_line,
+    ExtractedBlock.validation_method
+).order_by(ExtractedBlock.id)
+
+
+def _stream_blocks(db: Session, criteria):
+    """Yield matching block rows, fetched from the cursor in batches."""
+    result = db.execute(EXPORT_BLOCKS_STMT.where(*criteria).execution_options(yield_per=1000))
+    yield from result
+
+
 @router.get("/export/{file_id}")
 def export_blocks(
     file_id: int, 
@@ -39,13 +59,14 @@ def export_blocks(
     if not file_meta:
         raise HTTPException(status_code=404, detail="File not found")
     
-    # Get accepted blocks
-    blocks = db.query(ExtractedBlock).filter(
+    # Accepted blocks, as plain rows of the exported columns (no ORM instances)
+    accepted = (
         ExtractedBlock.file_id == file_id,
         ExtractedBlock.status == BlockStatus.ACCEPTED
-    ).all()
+    )
+    has_blocks = db.query(select(ExtractedBlock.id).where(*accepted).exists()).scalar()
     
-    if not blocks:
+    if not has_blocks:
         raise HTTPException(
             status_code=404,
             detail="No accepted blocks found. Please review and accept blocks first."
@@ -53,15 +74,22 @@ def export_blocks(
     
     try:
         if format == "zip":
-            file_path = export_service.generate_zip(file_meta, blocks)
-            media_type = "application/zip"
-            filename = file_path.name
+            # Streamed straight to the client; nothing is written to EXPORT_DIR.
+            # Rows are fetched up front since streaming outlives this request's session.
+            blocks = db.execute(EXPORT_BLOCKS_STMT.where(*accepted)).all()
+            return StreamingResponse(
+                export_service.stream_zip(file_meta, blocks),
+                media_type="application/zip",
+                headers={
+                    "Content-Disposition": f'attachment; filename="{export_service.zip_filename(file_meta)}"'
+                }
+            )
         elif format == "jsonl":
-            file_path = export_service.generate_jsonl(file_meta, blocks)
+            file_path = export_service.generate_jsonl(file_meta, _stream_blocks(db, accepted))
             media_type = "application/x-jsonlines"
             filename = file_path.name
         elif format == "parquet":
-            file_path = export_service.generate_parquet(file_meta, blocks)
+            file_path = export_service.generate_parquet(file_meta, _stream_blocks(db, accepted))
             media_type = "application/vnd.apache.parquet"
             filename = file_path.name
         else:
@@ -2,25 +2,60 @@
 Extract Route - Trigger Extraction Process
 """
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
 from pathlib import Path
+from typing import Iterator
+import codecs
+import io
+import json
+import os
 import time
 
 from app.database import get_db
-from app.models import FileMetadata, ExtractedBlock, BlockStatus
+from app.models import FileMetadata, ExtractedBlock, UserFeedback, BlockStatus
 from app.schemas.schemas import ExtractionResponse, ExtractedBlockSchema, BatchDeleteRequest, UpdateBlockRequest
-from app.engine.normalizer import FileNormalizer
+from app.engine.normalizer import FileNormalizer, content_hasher
 from app.engine.segmenter import Segmenter
 from app.engine.validator import Validator
 from app.engine.filter import PrecisionFilter
+from app.engine.batch_processor import validate_blocks
+from app.services.stats_service import StatsService
 
 router = APIRouter(prefix="/api", tags=["extract"])
 
 UPLOAD_DIR = Path(__file__).parent.parent.parent.parent / "data" / "uploads"
+# Resolved once; containment checks compare against it
+_UPLOAD_DIR_RESOLVED = UPLOAD_DIR.resolve()
+
+# Pipeline components are built once and shared by all requests. They keep no
+# per-call state; tree-sitter grammars and parsers live in the process-wide
+# TreeSitterManager either way.
+_normalizer = FileNormalizer()
+_segmenter = Segmenter()
+_validator = Validator()
+_precision_filter = PrecisionFilter()
+
+# Raw file content is read and sent in chunks of this size
+CONTENT_CHUNK_SIZE = 64 * 1024
+
+# ExtractedBlock columns needed to build an ExtractedBlockSchema
+BLOCK_SCHEMA_COLUMNS = (
+    ExtractedBlock.id,
+    ExtractedBlock.content,
+    ExtractedBlock.language,
+    ExtractedBlock.block_type,
+    ExtractedBlock.confidence_score,
+    ExtractedBlock.validation_method,
+    ExtractedBlock.start_line,
+    ExtractedBlock.end_line,
+    ExtractedBlock.status
+)
 
 
 @router.post("/extract/{file_id}", response_model=ExtractionResponse)
-def extract_file(file_id: int, db: Session = Depends(get_db)):
+def extract_file(file_id: int, reextract: bool = False, db: Session = Depends(get_db)):
     """
     Extract code blocks from uploaded file.
     
@@ -30,6 +65,10 @@ def extract_file(file_id: int, db: Session = Depends(get_db)):
     3. Validate with hybrid engine
     4. Filter false positives
     5. Store results
+    
+    Stored blocks are returned as they are, flagged with content_changed if
+    the file changed since. With reextract, blocks nobody reviewed are
+    replaced by a fresh extraction; reviewed blocks and their feedback stay.
     """
     start_time = time.time()
     
@@ -38,118 +77,126 @@ def extract_file(file_id: int, db: Session = Depends(get_db)):
     if not file_meta:
         raise HTTPException(status_code=404, detail="File not found")
     
-    # Check if blocks already exist (avoid duplicate extraction)
-    existing_blocks_count = db.query(ExtractedBlock).filter(ExtractedBlock.file_id == file_id).count()
-    if existing_blocks_count > 0:
-        db_blocks = db.query(ExtractedBlock).filter(ExtractedBlock.file_id == file_id).all()
-        block_schemas = [
-            ExtractedBlockSchema(
-                id=block.id,
-                content=block.content,
-                language=block.language,
-                block_type=block.block_type,
-                confidence_score=block.confidence_score,
-                validation_method=block.validation_method,
-                start_line=block.start_line,
-                end_line=block.end_line,
-                status=block.status.value
-            )
-            for block in db_blocks
-        ]
-        return ExtractionResponse(
-            file_id=file_id,
-            filename=file_meta.original_filename,
-            total_blocks=len(block_schemas),
-            blocks=block_schemas,
-            processing_time=0.0
-        )
-
     # Determine file path (handled correctly for Git repos)
     if file_meta.original_path:
         file_path = Path(file_meta.original_path)
     else:
         file_path = UPLOAD_DIR / file_meta.filename
+    
+    try:
+        file_stat = file_path.stat()
+    except OSError:
+        file_stat = None  # Gone from disk
+    
+    # Blocks already extracted? Return them (one query, only the response columns;
+    # values come from typed columns, so schemas are built without validation)
+    existing_blocks = db.query(*BLOCK_SCHEMA_COLUMNS).filter(ExtractedBlock.file_id == file_id).all()
+    kept_blocks = []
+    if existing_blocks:
+        changed = file_stat is not None and _content_changed(file_meta, file_path, file_stat)
+        if not changed or not reextract:
+            if db.is_modified(file_meta):
+                db.commit()  # Hash/stat recorded by _content_changed
+            block_schemas = [ExtractedBlockSchema.model_construct(**row._mapping) for row in existing_blocks]
+            return ExtractionResponse(
+                file_id=file_id,
+                filename=file_meta.original_filename,
+                total_blocks=len(block_schemas),
+                blocks=block_schemas,
+                processing_time=0.0,
+                content_changed=changed
+            )
         
-    if not file_path.exists():
-        raise HTTPException(status_code=404, detail="File not found on disk")
+        # Re-extracting a changed file: only blocks nobody reviewed (still
+        # pending, no feedback) are replaced, in the same transaction below
+        reviewed_ids = {
+            block_id for (block_id,) in db.query(UserFeedback.block_id)
+            .filter(UserFeedback.block_id.in_([row.id for row in existing_blocks]))
+        }
+        stale_ids = []
+        for row in existing_blocks:
+            if row.status == BlockStatus.PENDING.value and row.id not in reviewed_ids:
+                stale_ids.append(row.id)
+            else:
+                kept_blocks.append(ExtractedBlockSchema.model_construct(**row._mapping))
+        db.query(ExtractedBlock).filter(ExtractedBlock.id.in_(stale_ids)).delete(synchronize_session=False)
     
-    # Initialize components
-    normalizer = FileNormalizer()
-    segmenter = Segmenter()
-    validator = Validator()
-    precision_filter = PrecisionFilter()
+    if file_stat is None:
+        raise HTTPException(status_code=404, detail="File not found on disk")
+    # Record what this extraction runs on
+    _record_content(file_meta, _file_hash(file_path), file_stat)
     
     # Step 1: Normalize
     try:
-        normalized_data = normalizer.normalize_file(str(file_path))
+        normalized_data = _normalizer.normalize_file(str(file_path))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Normalization failed: {e}")
     
     # Step 2: Segment
-    candidate_blocks = segmenter.segment(
+    candidate_blocks = _segmenter.segment(
         normalized_data['content'], 
         language=file_meta.file_type,
         filename=file_meta.original_filename
     )
     
-    # Step 3: Validate
-    validation_results = []
-    for block in candidate_blocks:
-        result = validator.validate_block(block, filename=file_meta.original_filename)
-        validation_results.append(result)
-    
-    # Step 4: Filter
-    accepted_blocks = precision_filter.batch_filter(validation_results)
-    
-    # Step 5: Store in database
-    db_blocks = []
-    for block_data in accepted_blocks:
-        db_block = ExtractedBlock(
-            file_id=file_id,
-            content=block_data['content'],
-            language=block_data.get('language'),
-            block_type=block_data['block_type'],
-            confidence_score=block_data['confidence_score'],
-            validation_method=block_data.get('validation_method'),
-            start_line=block_data['start_line'],
-            end_line=block_data['end_line'],
-            status=BlockStatus.PENDING
-        )
-        db.add(db_block)
-        db_blocks.append(db_block)
+    # Steps 3-5 run as one pass: each block is validated, filtered and turned
+    # into a row before the next, so rejected results are never accumulated
+    validation_results = validate_blocks(candidate_blocks, file_meta.original_filename, _validator)
+    accepted_blocks = _precision_filter.iter_accepted(validation_results)
     
+    # Step 5: Store in database (one multi-row INSERT ... RETURNING id)
+    rows = [
+        {
+            "file_id": file_id,
+            "content": block_data['content'],
+            "language": block_data.get('language'),
+            "block_type": block_data['block_type'],
+            "confidence_score": block_data['confidence_score'],
+            "validation_method": block_data.get('validation_method'),
+            "start_line": block_data['start_line'],
+            "end_line": block_data['end_line'],
+            "status": BlockStatus.PENDING.value
+        }
+        for block_data in accepted_blocks
+    ]
+    block_ids = []
+    if rows:
+        # Bulk inserts skip flush events; fold them into the analytics rows here
+        StatsService.record_blocks(db, file_id, [(row["language"], row["confidence_score"]) for row in rows])
+        block_ids = db.scalars(
+            insert(ExtractedBlock).returning(ExtractedBlock.id, sort_by_parameter_order=True),
+            rows
+        ).all()
     db.commit()
     
-    # Refresh to get IDs
-    for block in db_blocks:
-        db.refresh(block)
-    
     processing_time = time.time() - start_time
     
-    # Prepare response
-    block_schemas = [
-        ExtractedBlockSchema(
-            id=block.id,
-            content=block.content,
-            language=block.language,
-            block_type=block.block_type,
-            confidence_score=block.confidence_score,
-            validation_method=block.validation_method,
-            start_line=block.start_line,
-            end_line=block.end_line,
-            status=block.status.value
+    # Prepare response straight from the inserted rows and returned ids;
+    # no ORM instances are built or refreshed. The rows were built above from
+    # typed pipeline output, so pydantic validation is skipped.
+    block_schemas = kept_blocks + [
+        ExtractedBlockSchema.model_construct(
+            id=block_id,
+            content=row["content"],
+            language=row["language"],
+            block_type=row["block_type"],
+            confidence_score=row["confidence_score"],
+            validation_method=row["validation_method"],
+            start_line=row["start_line"],
+            end_line=row["end_line"],
+            status=row["status"]
         )
-        for block in db_blocks
+        for block_id, row in zip(block_ids, rows)
     ]
     
     # Prepare stats
-    ast_count = sum(1 for b in db_blocks if b.validation_method != 'fallback_regex')
-    fallback_count = sum(1 for b in db_blocks if b.validation_method == 'fallback_regex')
+    ast_count = sum(1 for row in rows if row["validation_method"] != 'fallback_regex')
+    fallback_count = len(rows) - ast_count
     
     stats = {
         "ast_parsed": ast_count,
         "fallback_extracted": fallback_count,
-        "total_extracted": len(db_blocks)
+        "total_extracted": len(rows)
     }
 
     return ExtractionResponse(
@@ -178,12 +225,10 @@ def update_block(
         block.language = request.language
     
     # Update stats
-    block.status = BlockStatus.MODIFIED
-    
-    db.commit()
-    db.refresh(block)
+    block.status = BlockStatus.MODIFIED.value
     
-    return ExtractedBlockSchema(
+    # Built from the in-memory values; after the commit they would be reloaded
+    response = ExtractedBlockSchema(
         id=block.id,
         content=block.content,
         language=block.language,
@@ -192,8 +237,10 @@ def update_block(
         validation_method=block.validation_method,
         start_line=block.start_line,
         end_line=block.end_line,
-        status=block.status.value
+        status=block.status
     )
+    db.commit()
+    return response
 
 @router.delete("/blocks/{block_id}", status_code=204)
 def delete_block(block_id: int, db: Session = Depends(get_db)):
@@ -231,38 +278,74 @@ def get_file_content(file_id: int, db: Session = Depends(get_db)):
         
     # Check if absolute path is stored (git files) or construct from upload dir (uploaded files)
     if file_meta.original_path:
+        # Absolute path recorded by GitService itself; nothing to contain
         path = Path(file_meta.original_path)
     else:
         path = UPLOAD_DIR / file_meta.filename
         
-        
-    # SECURITY: Prevent Path Traversal
-    try:
-        # Resolve to absolute path to handle any '..'
-        resolved_path = path.resolve()
-        # Ensure path is strictly within UPLOAD_DIR (or temp dir for git repos)
-        # Note: Git repos use OS temp dir, so we check if it exists and is a file.
-        # Ideally we should validate it's inside allowed roots, but for now specific check:
-        # If it's a git file, it might be in /tmp. If it's an upload, it's in UPLOAD_DIR.
-        # We enforce that the file MUST exist and be a FILE (not directory).
-        
-        # Additional check: If it's supposed to be an uploaded file, force containment
-        if not file_meta.original_path and not resolved_path.is_relative_to(UPLOAD_DIR.resolve()):
-             print(f"Security Alert: Path traversal attempt blocked: {path}")
-             raise HTTPException(status_code=403, detail="Access denied")
-             
-    except ValueError:
-        # is_relative_to raises ValueError if not related
-        if not file_meta.original_path:
+        # SECURITY: Prevent Path Traversal
+        # Resolve to absolute path to handle any '..'; the stored filename must
+        # stay inside UPLOAD_DIR
+        if not path.resolve().is_relative_to(_UPLOAD_DIR_RESOLVED):
+            print(f"Security Alert: Path traversal attempt blocked: {path}")
             raise HTTPException(status_code=403, detail="Access denied")
 
-    if not path.exists() or not path.is_file():
+    # is_file() is False for missing paths too (one stat)
+    if not path.is_file():
         raise HTTPException(status_code=404, detail="File not found on disk")
         
-    try:
-        # Simple read, assuming text files for now given supported extensions
-        with open(path, 'r', encoding='utf-8', errors='replace') as f:
-            content = f.read()
-            return {"content": content}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to read file: {e}")
+    if not os.access(path, os.R_OK):
+        raise HTTPException(status_code=500, detail="Failed to read file: permission denied")
+    
+    # Same {"content": ...} body as before, encoded chunk by chunk
+    return StreamingResponse(_stream_content_json(path), media_type="application/json")
+
+
+def _content_changed(file_meta: FileMetadata, path: Path, file_stat: os.stat_result) -> bool:
+    """
+    Whether the file differs from the one its stored blocks were extracted
+    from. It is only rehashed when its size or mtime moved; a rehash that
+    matches (or a first one, for rows from before hashes were recorded) is
+    recorded on file_meta for the caller to commit.
+    """
+    if (file_meta.content_hash is not None
+            and file_meta.content_size == file_stat.st_size
+            and file_meta.content_mtime_ns == file_stat.st_mtime_ns):
+        return False
+    
+    content_hash = _file_hash(path)
+    if file_meta.content_hash not in (None, content_hash):
+        return True
+    _record_content(file_meta, content_hash, file_stat)
+    return False
+
+
+def _record_content(file_meta: FileMetadata, content_hash: str, file_stat: os.stat_result):
+    file_meta.content_hash = content_hash
+    file_meta.content_size = file_stat.st_size
+    file_meta.content_mtime_ns = file_stat.st_mtime_ns
+
+
+def _file_hash(path: Path) -> str:
+    """Content hash (hex) of a file, read in chunks."""
+    hasher = content_hasher()
+    with open(path, 'rb') as f:
+        while chunk := f.read(CONTENT_CHUNK_SIZE):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def _stream_content_json(path: Path) -> Iterator[str]:
+    """Yield {"content": "<file text>"} as JSON, reading and escaping one chunk at a time."""
+    # Incremental decoding keeps multi-byte characters and \r\n pairs split
+    # across chunks intact; newlines are translated to \n as text mode would.
+    # Opened here, so the file is only held while the response is sent.
+    decoder = io.IncrementalNewlineDecoder(
+        codecs.getincrementaldecoder('utf-8')(errors='replace'), translate=True
+    )
+    with open(path, 'rb') as f:
+        yield '{"content": "'
+        while chunk := f.read(CONTENT_CHUNK_SIZE):
+            yield json.dumps(decoder.decode(chunk))[1:-1]
+        yield json.dumps(decoder.decode(b'', final=True))[1:-1]
+        yield '"}'
@@ -63,13 +63,14 @@ def submit_feedback(
         # Reduce confidence
         block.confidence_score *= 0.80
     
+    # Read before the commit expires it (no reload SELECT)
+    updated_confidence = block.confidence_score
     db.commit()
-    db.refresh(block)
     
     return FeedbackResponse(
         success=True,
         message=f"Feedback recorded: {feedback.action}",
-        updated_confidence=block.confidence_score
+        updated_confidence=updated_confidence
     )
 
 
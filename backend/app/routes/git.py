@@ -1,7 +1,7 @@
 
 from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
-from datetime import datetime
 import os
 import uuid
 
@@ -9,6 +9,7 @@ from app.database import get_db
 from app.services.git_service import GitService
 from app.engine.batch_processor import BatchProcessor
 from app.models import FileMetadata
+from app.services.stats_service import StatsService
 from app.schemas.v2_schemas import GitAnalysisRequest, GitAnalysisResponse, GitEstimateRequest, GitEstimateResponse
 
 router = APIRouter(prefix="/api/git", tags=["git"])
@@ -61,51 +62,47 @@ def analyze_repo(
         # Use a temporary stat object or pass empty dict for now as stats aren't strictly needed for clone
         repo_path = git_service.clone_repository({}, request.repo_url, request.branch)
         
-        # 2. List Files
-        files = git_service.list_repo_files(repo_path)
-        
-        if not files:
-            git_service.cleanup_repo(repo_path)
-            raise HTTPException(status_code=400, detail="No supported files found in repository")
-            
-        # 3. Create Batch
+        # 2. List Files, building the File Records as the walk yields them
         batch_id = str(uuid.uuid4())
-        
-        # 4. Create File Records
-        file_ids = []
-        utc_now = datetime.utcnow()
         repo_name = request.repo_url.split('/')[-1].replace('.git', '')
         
-        
-        response_files_data = [] # Store for response
-        
-        for file_info in files:
-            file_meta = FileMetadata(
-                filename=f"{repo_name}/{file_info['relative_path']}", # Virtual path for display
-                original_filename=file_info['filename'],
-                file_type=file_info['extension'].lstrip('.'),
-                file_size=file_info['size'],
-                upload_date=utc_now,
-                batch_id=batch_id,
-                processing_status="pending",
+        rows = []
+        relative_paths = []
+        for file_info in git_service.iter_repo_files(repo_path):
+            rows.append({
+                "filename": f"{repo_name}/{file_info['relative_path']}", # Virtual path for display
+                "original_filename": file_info['filename'],
+                "file_type": file_info['extension'].lstrip('.'),
+                "file_size": file_info['size'],
+                "batch_id": batch_id,
+                "processing_status": "pending",
                 # STORE ABSOLUTE PATH so BatchProcessor can find it
-                original_path=file_info['absolute_path'] 
-            )
-            db.add(file_meta)
-            db.flush() # Get ID
-            file_ids.append(file_meta.id)
-            
-            response_files_data.append({
-                "path": file_info['relative_path'],
-                "id": file_meta.id
+                "original_path": file_info['absolute_path']
             })
+            relative_paths.append(file_info['relative_path'])
+        
+        if not rows:
+            git_service.cleanup_repo(repo_path)
+            raise HTTPException(status_code=400, detail="No supported files found in repository")
+        
+        # One multi-row INSERT ... RETURNING id; bulk inserts skip the stats flush hook
+        StatsService.record_files(db, len(rows))
+        file_ids = db.scalars(
+            insert(FileMetadata).returning(FileMetadata.id, sort_by_parameter_order=True),
+            rows
+        ).all()
+        
+        response_files_data = [
+            {"path": path, "id": file_id}
+            for path, file_id in zip(relative_paths, file_ids)
+        ]
             
         db.commit()
         
         from app.routes.batch import batch_processors
         
-        # 5. Start Batch Processing
-        processor = BatchProcessor(db)
+        # 3. Start Batch Processing
+        processor = BatchProcessor()
         batch_processors[batch_id] = processor  # Register for status polling
         
         # Run in background
@@ -120,7 +117,7 @@ def analyze_repo(
             batch_id=batch_id,
             message="Repository cloned and analysis started",
             repo_name=repo_name,
-            file_count=len(files),
+            file_count=len(rows),
             files=response_files_data
         )
         
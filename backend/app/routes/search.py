@@ -2,18 +2,38 @@
 Search Router - Advanced Search & Filtering
 """
 from fastapi import APIRouter, Depends, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import or_, and_, desc, asc
+from sqlalchemy.orm import Session, contains_eager
+from sqlalchemy import or_, and_, desc, asc, func, literal_column, select, tuple_
 from typing import List, Optional
 from datetime import datetime
 import re
 
 from app.database import get_db
-from app.models import ExtractedBlock, FileMetadata
+from app.models import ExtractedBlock, FileMetadata, blocks_fts
 from app.schemas.v2_schemas import SearchResponse, SearchResult
 
 router = APIRouter(prefix="/api/search", tags=["search"])
 
+# Trigram index: shorter queries can't be matched through it
+FTS_MIN_QUERY_LENGTH = 3
+
+_fts_table = literal_column("blocks_fts")
+
+
+def _term_pattern(q: str, use_regex: bool) -> re.Pattern:
+    """Case-insensitive pattern counting occurrences of q (literal unless a valid regex)."""
+    if use_regex:
+        try:
+            return re.compile(q, re.IGNORECASE)
+        except re.error:
+            pass
+    return re.compile(re.escape(q), re.IGNORECASE)
+
+
+def _fts_phrase(q: str) -> str:
+    """Quote q as one FTS5 phrase so its punctuation isn't parsed as query syntax."""
+    return '"' + q.replace('"', '""') + '"'
+
 
 @router.get("", response_model=SearchResponse)
 def search_blocks(
@@ -27,15 +47,27 @@ def search_blocks(
     use_regex: bool = False,
     page: int = 1,
     per_page: int = 20,
+    after_confidence: Optional[float] = None,
+    after_id: Optional[int] = None,
     db: Session = Depends(get_db)
 ):
     """
     Search extracted blocks with advanced filtering and secret detection.
+    
+    Deep pages: pass the last result's confidence_score and block_id as
+    after_confidence/after_id to continue after it (keyset pagination);
+    page is then ignored.
     """
-    # Base query joined with FileMetadata for filename and dates
-    query = db.query(ExtractedBlock).join(FileMetadata)
+    # Base query joined with FileMetadata for filename and dates; the joined
+    # columns populate block.file, so the result loop issues no lazy loads
+    query = (
+        db.query(ExtractedBlock)
+        .join(ExtractedBlock.file)
+        .options(contains_eager(ExtractedBlock.file))
+    )
     
-    # 1. Text Search (SQL LIKE or REGEXP)
+    # 1. Text Search (FTS5 MATCH, or REGEXP / LIKE)
+    ranked = False
     if q:
         if use_regex:
             # Use SQLite REGEXP function
@@ -49,7 +81,17 @@ def search_blocks(
                 # For now let's fallback to like to avoid crash
                 search_term = f"%{q}%"
                 query = query.filter(ExtractedBlock.content.ilike(search_term))
+        elif len(q) >= FTS_MIN_QUERY_LENGTH:
+            # Full-text index over content and filename, ranked by bm25
+            fts_match = (
+                select(blocks_fts.c.rowid, func.bm25(_fts_table).label("rank"))
+                .where(_fts_table.op("MATCH")(_fts_phrase(q)))
+                .subquery()
+            )
+            query = query.join(fts_match, fts_match.c.rowid == ExtractedBlock.id).add_columns(fts_match.c.rank)
+            ranked = True
         else:
+            # Too short for trigrams
             search_term = f"%{q}%"
             query = query.filter(
                 or_(
@@ -88,32 +130,45 @@ def search_blocks(
     total_results = query.count()
     
     # Ordering
-    # Prioritize confidence, then date
+    # Prioritize confidence, then newest block; the id tie-breaker makes the
+    # order total, so pages never overlap or skip rows
     query = query.order_by(
         desc(ExtractedBlock.confidence_score),
-        desc(FileMetadata.upload_date)
+        desc(ExtractedBlock.id)
     )
     
     # Pagination
-    offset = (page - 1) * per_page
-    blocks = query.offset(offset).limit(per_page).all()
+    if after_confidence is not None and after_id is not None:
+        # Seek past the cursor instead of counting off skipped rows
+        query = query.filter(
+            tuple_(ExtractedBlock.confidence_score, ExtractedBlock.id) < (after_confidence, after_id)
+        )
+        offset = 0
+    else:
+        offset = (page - 1) * per_page
+    rows = query.offset(offset).limit(per_page).all()
+    if not ranked:
+        rows = [(block, None) for block in rows]
     
     # Construct Results
     results = []
     
     from app.services.secret_scanner import SecretScanner
     
-    for block in blocks:
+    # Compiled once per request; counting matches doesn't copy each block's content
+    term_pattern = _term_pattern(q, use_regex) if q else None
+    q_lower = q.lower() if q else None
+    
+    for block, rank in rows:
         # Simple match score calculation if query exists
         match_score = 0.0
-        if q:
+        if rank is not None:
+            # bm25() is lower-is-better; it already weighs content and filename hits
+            match_score = -rank + (block.confidence_score * 0.4)
+        elif q:
             # Basic term frequency heuristic
-            try:
-                term_count = len(re.findall(q, block.content, re.IGNORECASE)) if use_regex else block.content.lower().count(q.lower())
-            except:
-                 term_count = block.content.lower().count(q.lower())
-                 
-            filename_match = 1.0 if (q.lower() in block.file.filename.lower()) else 0.0
+            term_count = sum(1 for _ in term_pattern.finditer(block.content))
+            filename_match = 1.0 if (q_lower in block.file.filename.lower()) else 0.0
             match_score = (term_count * 0.1) + (filename_match * 0.5) + (block.confidence_score * 0.4)
         else:
             match_score = block.confidence_score
@@ -127,9 +182,11 @@ def search_blocks(
         if not has_secrets: # Double check if we missed it or it's old data
             if SecretScanner.has_secrets(block.content):
                 has_secrets = True
-                secret_type = SecretScanner.get_secret_types(block.content)
+                # Stored comma-separated, as the secret_type filter expects
+                secret_type = ",".join(SecretScanner.get_secret_types(block.content))
             
-        results.append(SearchResult(
+        # Values come from typed columns; skip pydantic validation per row
+        results.append(SearchResult.model_construct(
             block_id=block.id,
             content=block.content,
             language=block.language,
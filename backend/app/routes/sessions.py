@@ -5,8 +5,8 @@ Handles session creation, updates, and restoration
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from sqlalchemy import func
-from typing import List
-import json
+from typing import Dict, List, Tuple
+import orjson
 
 from app.database import get_db
 from app.models import Session as SessionModel, SessionFile, ExtractedBlock, FileMetadata
@@ -27,18 +27,18 @@ def create_session(
 ):
     """Create a new session"""
     # Convert metadata dict to JSON string
-    metadata_json = json.dumps(session_data.metadata) if session_data.metadata else None
+    metadata_json = orjson.dumps(session_data.metadata).decode() if session_data.metadata else None
     
     new_session = SessionModel(
         name=session_data.name,
         session_metadata=metadata_json
     )
     
+    # Flushed for id/defaults; the response is built before the commit expires them
     db.add(new_session)
-    db.commit()
-    db.refresh(new_session)
+    db.flush()
     
-    return SessionResponse(
+    response = SessionResponse(
         id=new_session.id,
         name=new_session.name,
         created_at=new_session.created_at,
@@ -47,6 +47,8 @@ def create_session(
         file_count=0,
         block_count=0
     )
+    db.commit()
+    return response
 
 
 @router.get("/", response_model=List[SessionResponse])
@@ -60,20 +62,13 @@ def list_sessions(
         SessionModel.created_at.desc()
     ).offset(skip).limit(limit).all()
     
+    # Counts for the whole page in two grouped queries
+    file_counts, block_counts = _session_counts(db, [session.id for session in sessions])
+    
     response = []
     for session in sessions:
-        # Count files in session
-        file_count = db.query(SessionFile).filter(
-            SessionFile.session_id == session.id
-        ).count()
-        
-        # Count blocks in session
-        block_count = db.query(ExtractedBlock).filter(
-            ExtractedBlock.session_id == session.id
-        ).count()
-        
         # Parse metadata
-        metadata = json.loads(session.session_metadata) if session.session_metadata else None
+        metadata = orjson.loads(session.session_metadata) if session.session_metadata else None
         
         response.append(SessionResponse(
             id=session.id,
@@ -81,13 +76,33 @@ def list_sessions(
             created_at=session.created_at,
             updated_at=session.updated_at,
             metadata=metadata,
-            file_count=file_count,
-            block_count=block_count
+            file_count=file_counts.get(session.id, 0),
+            block_count=block_counts.get(session.id, 0)
         ))
     
     return response
 
 
+def _session_counts(db: Session, session_ids: List[int]) -> Tuple[Dict[int, int], Dict[int, int]]:
+    """File and block counts per session id."""
+    if not session_ids:
+        return {}, {}
+    
+    file_counts = dict(
+        db.query(SessionFile.session_id, func.count())
+        .filter(SessionFile.session_id.in_(session_ids))
+        .group_by(SessionFile.session_id)
+        .all()
+    )
+    block_counts = dict(
+        db.query(ExtractedBlock.session_id, func.count())
+        .filter(ExtractedBlock.session_id.in_(session_ids))
+        .group_by(ExtractedBlock.session_id)
+        .all()
+    )
+    return file_counts, block_counts
+
+
 @router.get("/{session_id}", response_model=SessionDetail)
 def get_session(
     session_id: int,
@@ -115,7 +130,7 @@ def get_session(
     ).count()
     
     # Parse metadata
-    metadata = json.loads(session.session_metadata) if session.session_metadata else None
+    metadata = orjson.loads(session.session_metadata) if session.session_metadata else None
     
     return SessionDetail(
         id=session.id,
@@ -149,31 +164,26 @@ def update_session(
         session.name = session_update.name
     
     if session_update.metadata is not None:
-        session.session_metadata = json.dumps(session_update.metadata)
+        session.session_metadata = orjson.dumps(session_update.metadata).decode()
     
-    db.commit()
-    db.refresh(session)
+    db.flush()  # Applies updated_at without ending the transaction
     
     # Get counts
-    file_count = db.query(SessionFile).filter(
-        SessionFile.session_id == session_id
-    ).count()
+    file_counts, block_counts = _session_counts(db, [session_id])
     
-    block_count = db.query(ExtractedBlock).filter(
-        ExtractedBlock.session_id == session_id
-    ).count()
-    
-    metadata = json.loads(session.session_metadata) if session.session_metadata else None
+    metadata = orjson.loads(session.session_metadata) if session.session_metadata else None
     
-    return SessionResponse(
+    response = SessionResponse(
         id=session.id,
         name=session.name,
         created_at=session.created_at,
         updated_at=session.updated_at,
         metadata=metadata,
-        file_count=file_count,
-        block_count=block_count
+        file_count=file_counts.get(session_id, 0),
+        block_count=block_counts.get(session_id, 0)
     )
+    db.commit()
+    return response
 
 
 @router.delete("/{session_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -237,9 +247,10 @@ def add_file_to_session(
     db.add(session_file)
     
     # Update all blocks from this file to link to session
+    # (one indexed UPDATE; no loaded blocks need syncing in this request)
     db.query(ExtractedBlock).filter(
         ExtractedBlock.file_id == file_id
-    ).update({ExtractedBlock.session_id: session_id})
+    ).update({ExtractedBlock.session_id: session_id}, synchronize_session=False)
     
     db.commit()
     
@@ -268,7 +279,7 @@ def remove_file_from_session(
     db.query(ExtractedBlock).filter(
         ExtractedBlock.file_id == file_id,
         ExtractedBlock.session_id == session_id
-    ).update({ExtractedBlock.session_id: None})
+    ).update({ExtractedBlock.session_id: None}, synchronize_session=False)
     
     db.delete(session_file)
     db.commit()
@@ -4,6 +4,8 @@ System Routes - Maintenance and Admin tasks
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from concurrent.futures import ThreadPoolExecutor
 import shutil
 import os
 from pathlib import Path
@@ -21,6 +23,63 @@ router = APIRouter(prefix="/api/system", tags=["system"])
 UPLOAD_DIR = Path(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))) / "data" / "uploads"
 GIT_TEMP_DIR = Path("/tmp/hpes_git_repos") # Default from GitService
 
+# Children before parents, for foreign keys
+RESET_TABLES = [
+    UserFeedback.__tablename__,
+    ExtractedBlock.__tablename__,
+    SessionFile.__tablename__,
+    Session.__tablename__,
+    FileMetadata.__tablename__,
+    ExtractionStats.__tablename__,
+    TextInput.__tablename__,
+]
+
+
+def _clear_database(db):
+    """Empty every table in one transaction without loading rows through the ORM."""
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(text(f"TRUNCATE {', '.join(RESET_TABLES)} RESTART IDENTITY CASCADE"))
+    else:
+        for table in RESET_TABLES:
+            db.execute(text(f"DELETE FROM {table}"))
+    # Raw statements bypass the stats hooks; drop cached analytics on commit
+    db.info["stats_changed"] = True
+    db.commit()
+
+
+def _vacuum(db):
+    """Give the emptied SQLite file's pages back to the OS (it is nearly empty, so this is quick)."""
+    bind = db.get_bind()
+    if bind.dialect.name != "sqlite" or not isinstance(bind, Engine):
+        return
+    try:
+        # VACUUM can't run inside a transaction
+        with bind.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.exec_driver_sql("VACUUM")
+    except Exception as e:
+        print(f"Warning: VACUUM after reset failed: {e}")
+
+
+def _clear_uploads():
+    """Delete upload directory contents but keep the directory."""
+    if not UPLOAD_DIR.exists():
+        return
+    for item in UPLOAD_DIR.iterdir():
+        try:
+            if item.is_file():
+                item.unlink()
+            elif item.is_dir():
+                shutil.rmtree(item)
+        except Exception as e:
+            print(f"Failed to delete {item}: {e}")
+
+
+def _clear_git_repos():
+    if GIT_TEMP_DIR.exists():
+        shutil.rmtree(GIT_TEMP_DIR)
+        GIT_TEMP_DIR.mkdir(exist_ok=True)
+
+
 @router.delete("/reset", status_code=status.HTTP_204_NO_CONTENT)
 def reset_system(db: Session = Depends(get_db)):
     """
@@ -31,33 +90,13 @@ def reset_system(db: Session = Depends(get_db)):
     """
     try:
         # 1. Database Cleanup
-        # Order matters for foreign keys
-        db.query(UserFeedback).delete()
-        db.query(ExtractedBlock).delete()
-        db.query(SessionFile).delete()
-        db.query(Session).delete()
-        db.query(FileMetadata).delete()
-        db.query(ExtractionStats).delete()
-        db.query(TextInput).delete()
-        
-        db.commit()
+        _clear_database(db)
+        _vacuum(db)
         
-        # 2. File Cleanup - Uploads
-        if UPLOAD_DIR.exists():
-            # Delete contents but keep directory
-            for item in UPLOAD_DIR.iterdir():
-                try:
-                    if item.is_file():
-                        item.unlink()
-                    elif item.is_dir():
-                        shutil.rmtree(item)
-                except Exception as e:
-                    print(f"Failed to delete {item}: {e}")
-                    
-        # 3. File Cleanup - Git Repos
-        if GIT_TEMP_DIR.exists():
-            shutil.rmtree(GIT_TEMP_DIR)
-            GIT_TEMP_DIR.mkdir(exist_ok=True)
+        # 2. + 3. File Cleanup - Uploads and Git Repos, concurrently
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            for future in [pool.submit(_clear_uploads), pool.submit(_clear_git_repos)]:
+                future.result()
             
         return None
         
@@ -3,21 +3,31 @@ Text Input API Routes
 Process pasted text and markdown directly without file upload
 """
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import insert, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import Session
-import hashlib
 
 from app.database import get_db
-from app.models import TextInput, ExtractedBlock
+from app.models import TextInput, ExtractedBlock, BlockStatus
 from app.schemas.v2_schemas import TextInputCreate, TextInputResponse
 from app.schemas.schemas import ExtractedBlockSchema
-from app.engine.normalizer import FileNormalizer
+from app.engine.normalizer import FileNormalizer, content_hasher
 from app.engine.segmenter import Segmenter
 from app.engine.validator import Validator
 from app.engine.filter import PrecisionFilter
+from app.engine.batch_processor import validate_blocks
+from app.services.stats_service import StatsService
+from app.routes.extract import BLOCK_SCHEMA_COLUMNS
 from typing import List
 
 router = APIRouter(prefix="/api/input", tags=["text-input"])
 
+# Pipeline components are shared by all requests (see routes/extract.py)
+_normalizer = FileNormalizer()
+_segmenter = Segmenter()
+_validator = Validator()
+_precision_filter = PrecisionFilter()
+
 
 @router.post("/text", response_model=dict)
 def process_text_input(
@@ -30,100 +40,100 @@ def process_text_input(
     Returns extracted blocks without saving to file_metadata table
     """
     # Calculate hash for deduplication
-    content_hash = hashlib.sha256(text_data.content.encode()).hexdigest()
+    hasher = content_hasher()
+    hasher.update(text_data.content.encode())
+    content_hash = hasher.hexdigest()
     
-    # Check if already processed
-    existing = db.query(TextInput).filter(TextInput.file_hash == content_hash).first()
+    # Claim the hash with one INSERT ... ON CONFLICT DO NOTHING RETURNING:
+    # no SELECT first for new content, and concurrent submissions of the same
+    # text can't both insert. Committed together with the blocks.
+    created = db.execute(
+        sqlite_insert(TextInput)
+        .values(
+            content=text_data.content,
+            source_type=text_data.source_type,
+            file_hash=content_hash
+        )
+        .on_conflict_do_nothing(index_elements=["file_hash"])
+        .returning(TextInput.id, TextInput.created_at)
+    ).first()
     
-    if existing:
-        # Return previously extracted blocks
-        blocks = db.query(ExtractedBlock).filter(
-            ExtractedBlock.file_id == existing.id  # Reusing file_id for text_input_id
-        ).all()
+    if created is None:
+        # Already processed: return previously extracted blocks
+        existing = db.execute(
+            select(TextInput.id, TextInput.source_type, TextInput.created_at)
+            .where(TextInput.file_hash == content_hash)
+        ).one()
         
         return {
             "text_input_id": existing.id,
             "source_type": existing.source_type,
             "created_at": existing.created_at,
-            "blocks": [ExtractedBlockSchema.model_validate(b.__dict__) for b in blocks],
+            "blocks": _stored_blocks(db, existing.id),
             "cached": True
         }
     
-    # Save text input
-    text_input = TextInput(
-        content=text_data.content,
-        source_type=text_data.source_type,
-        file_hash=content_hash
-    )
-    db.add(text_input)
-    db.commit()
-    db.refresh(text_input)
+    text_input_id, created_at = created
     
     # Process through extraction pipeline
     try:
         # 1. Normalization (minimal for text input)
-        normalizer = FileNormalizer()
-        normalized_text = normalizer._normalize_text(text_data.content)
+        normalized_text = _normalizer._normalize_text(text_data.content)
         
         # 2. Segmentation
-        segmenter = Segmenter()
-        segments = segmenter.segment(normalized_text)
-        
-        # 3. Validation
-        validator = Validator(db)
-        validated_blocks = []
-        
-        for segment in segments:
-            result = validator.validate_block(segment['content'])
-            if result['is_valid']:
-                validated_blocks.append({
-                    'content': segment['content'],
-                    'language': result.get('language'),
-                    'block_type': result.get('type', 'code'),
-                    'confidence_score': result.get('confidence', 0),
-                    'validation_method': result.get('method', 'unknown'),
-                    'start_line': segment.get('start_line'),
-                    'end_line': segment.get('end_line')
-                })
+        segments = _segmenter.segment(normalized_text)
         
-        # 4. Precision filtering
-        precision_filter = PrecisionFilter()
-        final_blocks = []
-        
-        for block_data in validated_blocks:
-            filter_result = precision_filter.filter_block(
-                content=block_data['content'],
-                language=block_data['language'],
-                confidence=block_data['confidence_score']
-            )
-            
-            if filter_result['should_keep']:
-                # Save to database
-                extracted_block = ExtractedBlock(
-                    file_id=text_input.id,  # Link to text_input
-                    session_id=session_id,
-                    content=block_data['content'],
-                    language=block_data['language'],
-                    block_type=block_data['block_type'],
-                    confidence_score=filter_result.get('adjusted_confidence', block_data['confidence_score']),
-                    validation_method=block_data['validation_method'],
-                    start_line=block_data.get('start_line'),
-                    end_line=block_data.get('end_line')
-                )
-                db.add(extracted_block)
-                final_blocks.append(extracted_block)
+        # 3. Validation + 4. Precision filtering, one block at a time
+        accepted_blocks = _precision_filter.iter_accepted(
+            result for result in validate_blocks(segments, "text_input", _validator)
+            if result['valid']
+        )
+        rows = [
+            {
+                "file_id": text_input_id,  # Link to text_input
+                "session_id": session_id,
+                "content": block_data['content'],
+                "language": block_data.get('language'),
+                "block_type": block_data.get('block_type') or 'code',
+                "confidence_score": block_data.get('confidence_score', 0),
+                "validation_method": block_data.get('validation_method') or 'unknown',
+                "start_line": block_data.get('start_line'),
+                "end_line": block_data.get('end_line'),
+                "status": BlockStatus.PENDING.value
+            }
+            for block_data in accepted_blocks
+        ]
         
+        # 5. Store all kept blocks with one INSERT ... RETURNING id
+        block_ids = []
+        if rows:
+            # Bulk inserts skip flush events; fold them into the analytics rows
+            # here. file_id holds the text input id, not a stored file's
+            StatsService.record_blocks(db, None, [(row["language"], row["confidence_score"]) for row in rows])
+            block_ids = db.scalars(
+                insert(ExtractedBlock).returning(ExtractedBlock.id, sort_by_parameter_order=True),
+                rows
+            ).all()
         db.commit()
         
-        #  Refresh to get IDs
-        for block in final_blocks:
-            db.refresh(block)
-        
         return {
-            "text_input_id": text_input.id,
-            "source_type": text_input.source_type,
-            "created_at": text_input.created_at,
-            "blocks": [ExtractedBlockSchema.model_validate(b.__dict__) for b in final_blocks],
+            "text_input_id": text_input_id,
+            "source_type": text_data.source_type,
+            "created_at": created_at,
+            "blocks": [
+                ExtractedBlockSchema.model_construct(
+                    id=block_id,
+                    content=row["content"],
+                    language=row["language"],
+                    block_type=row["block_type"],
+                    confidence_score=row["confidence_score"],
+                    validation_method=row["validation_method"],
+                    start_line=row["start_line"],
+                    end_line=row["end_line"],
+                    status=row["status"]
+                )
+                for block_id, row in zip(block_ids, rows)
+            ],
             "cached": False
         }
     
@@ -142,11 +152,15 @@ def get_text_input_history(
     db: Session = Depends(get_db)
 ):
     """Get history of text inputs"""
-    inputs = db.query(TextInput).order_by(
-        TextInput.created_at.desc()
-    ).offset(skip).limit(limit).all()
+    # Plain column rows: no ORM entities are built for a read-only listing
+    rows = db.execute(
+        select(TextInput.id, TextInput.source_type, TextInput.created_at, TextInput.file_hash)
+        .order_by(TextInput.created_at.desc())
+        .offset(skip)
+        .limit(limit)
+    ).all()
     
-    return [TextInputResponse.model_validate(inp.__dict__) for inp in inputs]
+    return [TextInputResponse.model_construct(**row._mapping) for row in rows]
 
 
 @router.get("/{text_input_id}/blocks", response_model=List[ExtractedBlockSchema])
@@ -155,19 +169,28 @@ def get_text_input_blocks(
     db: Session = Depends(get_db)
 ):
     """Get extracted blocks for a text input"""
-    text_input = db.query(TextInput).filter(TextInput.id == text_input_id).first()
+    exists = db.scalar(select(TextInput.id).where(TextInput.id == text_input_id))
     
-    if not text_input:
+    if exists is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Text input not found"
         )
     
-    blocks = db.query(ExtractedBlock).filter(
-        ExtractedBlock.file_id == text_input_id
+    return _stored_blocks(db, text_input_id)
+
+
+def _stored_blocks(db: Session, text_input_id: int) -> List[ExtractedBlockSchema]:
+    """
+    Blocks stored for a text input, read as plain column rows. Values come
+    from typed columns, so schemas are built without validation.
+    """
+    rows = db.execute(
+        select(*BLOCK_SCHEMA_COLUMNS).where(
+            ExtractedBlock.file_id == text_input_id  # Reusing file_id for text_input_id
+        )
     ).all()
-    
-    return [ExtractedBlockSchema.model_validate(b.__dict__) for b in blocks]
+    return [ExtractedBlockSchema.model_construct(**row._mapping) for row in rows]
 
 
 @router.delete("/{text_input_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -176,21 +199,22 @@ def delete_text_input(
     db: Session = Depends(get_db)
 ):
     """Delete a text input and its extracted blocks"""
-    text_input = db.query(TextInput).filter(TextInput.id == text_input_id).first()
+    # Delete by key instead of loading the row first; the rowcount says whether it existed
+    deleted = db.query(TextInput).filter(
+        TextInput.id == text_input_id
+    ).delete(synchronize_session=False)
     
-    if not text_input:
+    if not deleted:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Text input not found"
         )
     
-    # Delete associated blocks
+    # Delete associated blocks (file_id holds the text input id, so there is
+    # no foreign key a database-side cascade could hang off)
     db.query(ExtractedBlock).filter(
         ExtractedBlock.file_id == text_input_id
-    ).delete()
-    
-    # Delete text input
-    db.delete(text_input)
+    ).delete(synchronize_session=False)
     db.commit()
     
     return None
@@ -2,14 +2,18 @@
 Upload Route - File Upload Endpoint
 """
 from fastapi import APIRouter, UploadFile, File, Depends, HTTPException
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import Session
-import shutil
 from pathlib import Path
-import hashlib
+from typing import Tuple
+import asyncio
+import uuid
 
 from app.database import get_db
 from app.models import FileMetadata
 from app.schemas.schemas import FileUploadResponse
+from app.engine.normalizer import content_hasher
+from app.services.stats_service import StatsService
 
 router = APIRouter(prefix="/api", tags=["upload"])
 
@@ -17,22 +21,60 @@ router = APIRouter(prefix="/api", tags=["upload"])
 import os
 import re
 import unicodedata
+from functools import lru_cache
 
 UPLOAD_DIR = Path(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))) / "data" / "uploads"
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 
 MAX_FILE_SIZE = 50 * 1024 * 1024  # 50MB
 
+ALLOWED_EXTENSIONS = frozenset({
+    '.pdf', '.docx', '.txt', '.md', '.log', '.sh', '.bat',
+    '.config', '.ini', '.env', '.yaml', '.yml', '.json', '.xml',
+    '.html', '.htm', '.css', '.js', '.jsx', '.ts', '.tsx', '.csv', '.sql',
+    '.py', '.rb', '.php', '.java', '.c', '.cpp', '.h', '.hpp', '.go', '.rs',
+    '.kt', '.swift', '.m', '.dart', '.vue', '.scala', '.r'
+})
+_ALLOWED_EXTENSIONS_TEXT = ', '.join(sorted(ALLOWED_EXTENSIONS))
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Stored uploads are created 0644 (owner read/write, everyone read, NO EXECUTE);
+# the mode is set by open itself, so there is no window before a chmod
+UPLOAD_OPEN_FLAGS = os.O_WRONLY | os.O_CREAT | os.O_EXCL | os.O_CLOEXEC
+UPLOAD_FILE_MODE = 0o644
+
+_UNSAFE_FILENAME_RE = re.compile(r'[^\w.\-]')
+
+# Pure function of the name; the same names tend to be uploaded repeatedly
+@lru_cache(maxsize=1024)
 def secure_filename(filename: str) -> str:
     """
     Sanitize filename to prevent path traversal and unsafe characters.
     """
     filename = unicodedata.normalize('NFKD', filename).encode('ascii', 'ignore').decode('ascii')
-    filename = re.sub(r'[^\w\.\-]', '_', filename)
+    filename = _UNSAFE_FILENAME_RE.sub('_', filename)
     filename = filename.strip('._')
     return filename
 
 
+def _stream_to_disk(src, dest: Path, max_size: int) -> Tuple[int, str]:
+    """
+    Copy an upload to dest in chunks, hashing on the fly.
+    Returns (size, content hash hex); stops early once size exceeds max_size.
+    """
+    hasher = content_hasher()
+    size = 0
+    with os.fdopen(os.open(dest, UPLOAD_OPEN_FLAGS, UPLOAD_FILE_MODE), 'wb') as f:
+        while chunk := src.read(UPLOAD_CHUNK_SIZE):
+            size += len(chunk)
+            if size > max_size:
+                break
+            hasher.update(chunk)
+            f.write(chunk)
+    return size, hasher.hexdigest()
+
+
 @router.post("/upload", response_model=FileUploadResponse)
 async def upload_file(
     file: UploadFile = File(...),
@@ -44,43 +86,63 @@ async def upload_file(
     Supports: PDF, DOCX, TXT, MD, LOG, SH, BAT, CONFIG, INI, YAML, JSON, XML
     """
     # Validate file type
-    allowed_extensions = {
-        '.pdf', '.docx', '.txt', '.md', '.log', '.sh', '.bat',
-        '.config', '.ini', '.env', '.yaml', '.yml', '.json', '.xml',
-        '.html', '.htm', '.css', '.js', '.jsx', '.ts', '.tsx', '.csv', '.sql',
-        '.py', '.rb', '.php', '.java', '.c', '.cpp', '.h', '.hpp', '.go', '.rs',
-        '.kt', '.swift', '.m', '.dart', '.vue', '.scala', '.r'
-    }
-    
     file_ext = Path(file.filename).suffix.lower()
-    if file_ext not in allowed_extensions:
+    if file_ext not in ALLOWED_EXTENSIONS:
         raise HTTPException(
             status_code=400,
-            detail=f"Unsupported file type: {file_ext}. Allowed: {allowed_extensions}"
+            detail=f"Unsupported file type: {file_ext}. Allowed: {_ALLOWED_EXTENSIONS_TEXT}"
         )
     
-    # Read file content to check size and calculate hash
-    content = await file.read()
-    file_size = len(content)
-    
-    if file_size > MAX_FILE_SIZE:
+    # Size already known from the multipart parser: reject before copying anything
+    if file.size is not None and file.size > MAX_FILE_SIZE:
         raise HTTPException(
             status_code=413,
-            detail=f"File too large: {file_size} bytes > {MAX_FILE_SIZE} bytes (50MB)"
+            detail=f"File too large: {file.size} bytes > {MAX_FILE_SIZE} bytes (50MB)"
         )
     
-    if file_size == 0:
-        raise HTTPException(status_code=400, detail="Empty file")
+    # Stream to a temporary file, checking size and hashing in the same pass
+    tmp_path = UPLOAD_DIR / f".{uuid.uuid4().hex}.part"
+    file_size, file_hash = await asyncio.to_thread(_stream_to_disk, file.file, tmp_path, MAX_FILE_SIZE)
     
-    # Calculate file hash for deduplication
-    file_hash = hashlib.sha256(content).hexdigest()
+    if file_size > MAX_FILE_SIZE or file_size == 0:
+        await asyncio.to_thread(tmp_path.unlink, missing_ok=True)
+        if file_size == 0:
+            raise HTTPException(status_code=400, detail="Empty file")
+        raise HTTPException(
+            status_code=413,
+            detail=f"File too large: {file.size or file_size} bytes > {MAX_FILE_SIZE} bytes (50MB)"
+        )
     
-    # Check if file already exists
-    existing_file = db.query(FileMetadata).filter(
-        FileMetadata.file_hash == file_hash
-    ).first()
+    # Sanitize filename
+    safe_name = secure_filename(file.filename)
+    safe_filename = f"{file_hash[:16]}_{safe_name}"
+    file_type = file_ext.lstrip('.')  # Remove leading dot
     
-    if existing_file:
+    # Claim the hash with one INSERT ... ON CONFLICT DO NOTHING RETURNING id:
+    # no SELECT first for new content, and concurrent uploads of the same
+    # bytes can't both insert. Core inserts skip flush events, so the file is
+    # counted in the stats rows beforehand (undone by the rollback on conflict).
+    StatsService.record_files(db, 1)
+    file_id = db.scalar(
+        sqlite_insert(FileMetadata)
+        .values(
+            filename=safe_filename,
+            original_filename=safe_name,  # Store sanitized name
+            file_type=file_type,
+            file_size=file_size,
+            file_hash=file_hash
+        )
+        .on_conflict_do_nothing(index_elements=["file_hash"])
+        .returning(FileMetadata.id)
+    )
+    
+    if file_id is None:
+        # Duplicate: nothing was inserted
+        db.rollback()
+        await asyncio.to_thread(tmp_path.unlink, missing_ok=True)
+        existing_file = db.query(FileMetadata).filter(
+            FileMetadata.file_hash == file_hash
+        ).first()
         return FileUploadResponse(
             file_id=existing_file.id,
             filename=existing_file.filename,
@@ -90,40 +152,17 @@ async def upload_file(
             message="File already exists (duplicate detected)"
         )
     
-    # Save file to disk with Hardening
-    # 1. Sanitize filename
-    safe_name = secure_filename(file.filename)
-    safe_filename = f"{file_hash[:16]}_{safe_name}"
-    
+    # Move into place (already non-executable), off the event loop; the row
+    # is only committed once the file is there
     file_path = UPLOAD_DIR / safe_filename
+    await asyncio.to_thread(os.replace, tmp_path, file_path)
     
-    with open(file_path, 'wb') as f:
-        f.write(content)
-
-    # 3. Strip Executable Permissions (Prevent Code Execution)
-    # chmod 644: Owner read/write, Group read, Others read. NO EXECUTE.
-    try:
-        os.chmod(file_path, 0o644)
-    except Exception as e:
-        print(f"Warning: Failed to chmod file {file_path}: {e}")
+    db.commit()
     
-    # Save metadata to database
-    file_metadata = FileMetadata(
+    return FileUploadResponse(
+        file_id=file_id,
         filename=safe_filename,
-        original_filename=safe_name, # Store sanitized name
-        file_type=file_ext.lstrip('.'),  # Remove leading dot
+        file_type=file_type,
         file_size=file_size,
         file_hash=file_hash
     )
-    
-    db.add(file_metadata)
-    db.commit()
-    db.refresh(file_metadata)
-    
-    return FileUploadResponse(
-        file_id=file_metadata.id,
-        filename=file_metadata.filename,
-        file_type=file_metadata.file_type,
-        file_size=file_metadata.file_size,
-        file_hash=file_metadata.file_hash
-    )
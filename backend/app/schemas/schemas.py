@@ -27,6 +27,9 @@ class ExtractedBlockSchema(BaseModel):
     start_line: int
     end_line: int
     status: str = "pending"
+    
+    class Config:
+        from_attributes = True
 
 
 class ExtractionResponse(BaseModel):
@@ -37,6 +40,9 @@ class ExtractionResponse(BaseModel):
     blocks: List[ExtractedBlockSchema]
     processing_time: float
     stats: Optional[dict] = None
+    # The file changed since these blocks were extracted; POST again with
+    # reextract=true to refresh them
+    content_changed: bool = False
 
 
 class FeedbackRequest(BaseModel):
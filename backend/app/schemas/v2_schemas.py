@@ -172,11 +172,6 @@ class GitAnalysisRequest(BaseModel):
     branch: Optional[str] = None
 
 
-class GitAnalysisRequest(BaseModel):
-    repo_url: str
-    branch: Optional[str] = None
-
-
 class GitFile(BaseModel):
     path: str
     id: int
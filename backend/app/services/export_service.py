@@ -2,15 +2,130 @@
 Export Service - Logic for handling various export formats (ZIP, JSONL, Parquet)
 """
 import zipfile
-import json
 import io
-import pandas as pd
+import time
+import orjson
+import pyarrow as pa
+import pyarrow.parquet as pq
+from collections import Counter
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable, Iterator, Tuple, Union
 from sqlalchemy.orm import Session
 
 from app.models import ExtractedBlock, FileMetadata
 
+# Fastest deflate level; code/config text still compresses well
+ZIP_COMPRESSLEVEL = 1
+
+# Entries shorter than this are stored: deflate can't shrink them much, and
+# each deflated entry pays for a fresh compressor
+ZIP_MIN_DEFLATE_SIZE = 256
+
+# Streamed ZIP members larger than this are compressed and sent in pieces
+ZIP_STREAM_CHUNK = 64 * 1024
+
+# Write buffer for JSONL exports: one write syscall per ~1 MiB of rows
+JSONL_WRITE_BUFFER = 1 << 20
+
+# Block columns needed by every export format
+EXPORT_COLUMNS = [
+    "file_id", "filename", "file_hash", "upload_date", "block_id", "content",
+    "language", "block_type", "confidence_score", "start_line", "end_line",
+    "validation_method",
+]
+
+# Export columns read from the block, and the attribute each comes from
+BLOCK_COLUMNS = {
+    "block_id": "id",
+    "content": "content",
+    "language": "language",
+    "block_type": "block_type",
+    "confidence_score": "confidence_score",
+    "start_line": "start_line",
+    "end_line": "end_line",
+    "validation_method": "validation_method",
+}
+
+# Low-cardinality Parquet columns worth dictionary encoding; content is
+# nearly unique per row, so a dictionary only costs time there
+PARQUET_DICTIONARY_COLUMNS = [
+    "filename", "file_hash", "upload_date", "language", "block_type",
+    "validation_method",
+]
+
+# Parquet column types, in EXPORT_COLUMNS order
+PARQUET_SCHEMA = pa.schema([
+    ("file_id", pa.int64()),
+    ("filename", pa.string()),
+    ("file_hash", pa.string()),
+    ("upload_date", pa.string()),
+    ("block_id", pa.int64()),
+    ("content", pa.string()),
+    ("language", pa.string()),
+    ("block_type", pa.string()),
+    ("confidence_score", pa.float64()),
+    ("start_line", pa.int64()),
+    ("end_line", pa.int64()),
+    ("validation_method", pa.string()),
+])
+
+
+class _ZipStream(io.RawIOBase):
+    """Write-only, non-seekable sink that ZipFile writes into; drained per chunk."""
+
+    def __init__(self):
+        super().__init__()
+        self._buffer = bytearray()
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._buffer += data
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        return data
+
+
+def _write_entry(zipf: zipfile.ZipFile, arcname: str, content):
+    """Add one archive member, deflating it only when it is big enough to gain."""
+    if len(content) < ZIP_MIN_DEFLATE_SIZE:
+        zipf.writestr(arcname, content, compress_type=zipfile.ZIP_STORED)
+    else:
+        zipf.writestr(arcname, content)
+
+
+def _stream_entry(zipf: zipfile.ZipFile, arcname: str, content, stream: _ZipStream) -> Iterator[bytes]:
+    """
+    Add one archive member to a streamed ZIP, yielding its output every
+    ZIP_STREAM_CHUNK bytes of input so a large block is never buffered whole.
+    """
+    if isinstance(content, str):
+        content = content.encode()
+    if len(content) <= ZIP_STREAM_CHUNK:
+        _write_entry(zipf, arcname, content)
+        yield stream.drain()
+        return
+
+    # Same member attributes writestr would set
+    info = zipfile.ZipInfo(arcname, date_time=time.localtime(time.time())[:6])
+    info.compress_type = zipf.compression
+    info._compresslevel = zipf.compresslevel
+    info.external_attr = 0o600 << 16
+    info.file_size = len(content)
+
+    view = memoryview(content)
+    with zipf.open(info, 'w') as dest:
+        for start in range(0, len(view), ZIP_STREAM_CHUNK):
+            dest.write(view[start:start + ZIP_STREAM_CHUNK])
+            yield stream.drain()
+    # Data descriptor is written on close
+    yield stream.drain()
+
+
 class ExportService:
     def __init__(self, export_dir: Path):
         self.export_dir = export_dir
@@ -43,72 +158,84 @@ class ExportService:
         }
         return ext_map.get(config_type, '.conf')
 
-    def generate_zip(self, file_meta: FileMetadata, blocks: List[ExtractedBlock]) -> Path:
+    def zip_filename(self, file_meta: FileMetadata) -> str:
+        """Name of the ZIP export for a file."""
+        return f"hpes_export_{file_meta.id}_{file_meta.file_hash[:8]}.zip"
+
+    def generate_zip(self, file_meta: FileMetadata, blocks: Iterable[ExtractedBlock]) -> Path:
         """Generate a ZIP export."""
-        zip_filename = f"hpes_export_{file_meta.id}_{file_meta.file_hash[:8]}.zip"
-        zip_path = self.export_dir / zip_filename
+        zip_path = self.export_dir / self.zip_filename(file_meta)
         
-        categories = {}
+        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED, compresslevel=ZIP_COMPRESSLEVEL) as zipf:
+            for arcname, content in self._zip_entries(file_meta, blocks):
+                _write_entry(zipf, arcname, content)
         
-        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            # Add blocks organized by category
-            for idx, block in enumerate(blocks):
-                # Determine folder based on block type and language
-                if block.block_type == 'code':
-                    folder = f"{block.language}_codes"
-                    ext = self._get_extension(block.language)
-                    filename = f"block_{idx+1:03d}{ext}"
-                elif block.block_type == 'config':
-                    folder = "configs"
-                    ext = self._get_config_extension(block.language)
-                    filename = f"{block.language}_{idx+1:03d}{ext}"
-                elif block.block_type == 'log':
-                    folder = "logs"
-                    filename = f"log_{idx+1:03d}.log"
-                elif block.block_type == 'structured':
-                    folder = "structured"
-                    ext = self._get_extension(block.language)
-                    filename = f"data_{idx+1:03d}{ext}"
-                else:
-                    folder = "other"
-                    filename = f"block_{idx+1:03d}.txt"
-                
-                # Track categories
-                if folder not in categories:
-                    categories[folder] = 0
-                categories[folder] += 1
-                
-                # Add to ZIP
-                zip_path_in_archive = f"{folder}/{filename}"
-                zipf.writestr(zip_path_in_archive, block.content)
+        return zip_path
+
+    def stream_zip(self, file_meta: FileMetadata, blocks: Iterable[ExtractedBlock]) -> Iterator[bytes]:
+        """Generate a ZIP export as chunks, without writing it to disk."""
+        stream = _ZipStream()
+        with zipfile.ZipFile(stream, 'w', zipfile.ZIP_DEFLATED, compresslevel=ZIP_COMPRESSLEVEL) as zipf:
+            for arcname, content in self._zip_entries(file_meta, blocks):
+                yield from _stream_entry(zipf, arcname, content, stream)
+        # Central directory is written on close
+        yield stream.drain()
+
+    def _zip_entries(self, file_meta: FileMetadata, blocks: Iterable[ExtractedBlock]) -> Iterator[Tuple[str, Union[str, bytes]]]:
+        """Yield (path in archive, content) for every block, then metadata.json."""
+        categories = Counter()
+        block_meta = []
+        
+        # Add blocks organized by category (single pass, so blocks may be a row iterator)
+        for idx, block in enumerate(blocks):
+            # Determine folder based on block type and language
+            if block.block_type == 'code':
+                folder = f"{block.language}_codes"
+                ext = self._get_extension(block.language)
+                filename = f"block_{idx+1:03d}{ext}"
+            elif block.block_type == 'config':
+                folder = "configs"
+                ext = self._get_config_extension(block.language)
+                filename = f"{block.language}_{idx+1:03d}{ext}"
+            elif block.block_type == 'log':
+                folder = "logs"
+                filename = f"log_{idx+1:03d}.log"
+            elif block.block_type == 'structured':
+                folder = "structured"
+                ext = self._get_extension(block.language)
+                filename = f"data_{idx+1:03d}{ext}"
+            else:
+                folder = "other"
+                filename = f"block_{idx+1:03d}.txt"
             
-            # Add metadata file
-            metadata = {
-                "source_file": file_meta.original_filename,
-                "export_date": str(file_meta.upload_date),
-                "total_blocks": len(blocks),
-                "categories": categories,
-                "blocks": [
-                    {
-                        "id": block.id,
-                        "type": block.block_type,
-                        "language": block.language,
-                        "confidence": block.confidence_score,
-                        "lines": f"{block.start_line}-{block.end_line}"
-                    }
-                    for block in blocks
-                ]
-            }
+            # Track categories
+            categories[folder] += 1
+            
+            block_meta.append({
+                "id": block.id,
+                "type": block.block_type,
+                "language": block.language,
+                "confidence": block.confidence_score,
+                "lines": f"{block.start_line}-{block.end_line}"
+            })
             
-            zipf.writestr("metadata.json", json.dumps(metadata, indent=2))
+            yield f"{folder}/{filename}", block.content
         
-        return zip_path
+        # Add metadata file
+        metadata = {
+            "source_file": file_meta.original_filename,
+            "export_date": str(file_meta.upload_date),
+            "total_blocks": len(block_meta),
+            "categories": categories,
+            "blocks": block_meta
+        }
+        
+        yield "metadata.json", orjson.dumps(metadata, option=orjson.OPT_INDENT_2)
 
-    def _blocks_to_data(self, file_meta: FileMetadata, blocks: List[ExtractedBlock]) -> List[Dict[str, Any]]:
-        """Convert blocks to a list of dictionaries for data export."""
-        data = []
+    def _blocks_to_data(self, file_meta: FileMetadata, blocks: Iterable[ExtractedBlock]) -> Iterator[Dict[str, Any]]:
+        """Convert blocks (ORM objects or rows) to dictionaries for data export, one at a time."""
         for block in blocks:
-            item = {
+            yield {
                 "file_id": file_meta.id,
                 "filename": file_meta.original_filename,
                 "file_hash": file_meta.file_hash,
@@ -122,34 +249,44 @@ class ExportService:
                 "end_line": block.end_line,
                 "validation_method": block.validation_method,
             }
-            data.append(item)
-        return data
 
-    def generate_jsonl(self, file_meta: FileMetadata, blocks: List[ExtractedBlock]) -> Path:
+    def generate_jsonl(self, file_meta: FileMetadata, blocks: Iterable[ExtractedBlock]) -> Path:
         """Generate a JSONL export."""
         filename = f"hpes_export_{file_meta.id}_{file_meta.file_hash[:8]}.jsonl"
         path = self.export_dir / filename
         
-        data = self._blocks_to_data(file_meta, blocks)
-        
-        with open(path, 'w', encoding='utf-8') as f:
-            for item in data:
-                f.write(json.dumps(item) + '\n')
+        # Written row by row; blocks may be a streamed result. orjson emits
+        # UTF-8 bytes (no separate encode step) and the buffered file batches
+        # them into large writes
+        with open(path, 'wb', buffering=JSONL_WRITE_BUFFER) as f:
+            f.writelines(
+                orjson.dumps(item, option=orjson.OPT_APPEND_NEWLINE)
+                for item in self._blocks_to_data(file_meta, blocks)
+            )
                 
         return path
 
-    def generate_parquet(self, file_meta: FileMetadata, blocks: List[ExtractedBlock]) -> Path:
+    def generate_parquet(self, file_meta: FileMetadata, blocks: Iterable[ExtractedBlock]) -> Path:
         """Generate a Parquet export."""
         filename = f"hpes_export_{file_meta.id}_{file_meta.file_hash[:8]}.parquet"
         path = self.export_dir / filename
         
-        data = self._blocks_to_data(file_meta, blocks)
-        df = pd.DataFrame(data)
+        # Block attributes go straight into column lists and are handed to
+        # Arrow; no DataFrame and no per-row dict in between
+        columns = {name: [] for name in BLOCK_COLUMNS}
+        appenders = [(attr, columns[name].append) for name, attr in BLOCK_COLUMNS.items()]
+        for block in blocks:
+            for attr, append in appenders:
+                append(getattr(block, attr))
         
-        # Ensure correct data types for Parquet
-        # Parquet has strict typing, so we convert objects to strings where appropriate or letting pandas infer
-        # Timestamp needs to be handled if not string
+        # File columns are the same on every row
+        rows = len(columns["block_id"])
+        columns["file_id"] = [file_meta.id] * rows
+        columns["filename"] = [file_meta.original_filename] * rows
+        columns["file_hash"] = [file_meta.file_hash] * rows
+        columns["upload_date"] = [str(file_meta.upload_date)] * rows
         
-        df.to_parquet(path, index=False)
+        table = pa.table({name: columns[name] for name in EXPORT_COLUMNS}, schema=PARQUET_SCHEMA)
+        pq.write_table(table, path, compression="zstd", use_dictionary=PARQUET_DICTIONARY_COLUMNS)
         
         return path
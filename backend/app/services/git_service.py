@@ -1,29 +1,178 @@
 import os
 import shutil
+import subprocess
 import tempfile
 import uuid
 import re
 import socket
 import ipaddress
-from urllib.parse import urlparse
-from typing import List, Dict, Optional
-from pathlib import Path
-import git
+import threading
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from time import monotonic
+from urllib.parse import parse_qs, urlparse
+from typing import Any, Hashable, Iterator, List, Dict, Optional, Tuple
 import requests  # For GitHub API calls
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# GitHub API answers are reused for this long; estimates and repo lists are
+# requested repeatedly while a user browses, and the API is rate limited
+GITHUB_CACHE_TTL = 300.0
+GITHUB_CACHE_SIZE = 1024
+# Concurrent page requests; GitHub's secondary rate limits punish bursts
+GITHUB_PAGE_CONCURRENCY = 4
+GITHUB_PER_PAGE = 100  # Maximum allowed by GitHub API
+
+# Resolved addresses of clone hosts; batches of clones hit the same few hosts
+DNS_CACHE_TTL = 300.0
+DNS_CACHE_SIZE = 256
+
+# Prefix of every git command. Protocol v2 (default only since git 2.26)
+# advertises just the refs we ask for instead of every ref on the server.
+GIT_COMMAND = ('git', '-c', 'protocol.version=2')
+# Upper bound for one git command (clone, lazy blob fetch)
+GIT_TIMEOUT = 300
+
+# Repo files larger than this (minified bundles, lockfiles, dumps) aren't
+# indexed; data files are sniffed for NUL bytes in their first block
+MAX_REPO_FILE_SIZE = 1024 * 1024
+BINARY_SNIFF_BYTES = 4096
+
+# Shell metacharacters rejected in clone URLs
+_UNSAFE_URL_RE = re.compile(r'[;&|`$()<>]')
+
+# Characters with a meaning in sparse-checkout (gitignore) patterns
+_SPARSE_SPECIAL_RE = re.compile(r'[\\*?\[ !#]')
+
+
+class _TTLCache:
+    """Small thread-safe LRU whose entries expire after a fixed TTL."""
+    
+    def __init__(self, ttl: float, maxsize: int):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            hit = self._entries.get(key)
+            if hit is None or monotonic() - hit[0] >= self.ttl:
+                return None
+            self._entries.move_to_end(key)
+            return hit[1]
+    
+    def set(self, key: Hashable, value: Any):
+        with self._lock:
+            self._entries[key] = (monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+    
+    def get_stale(self, key: Hashable) -> Optional[Any]:
+        """Value of an entry even if it has expired (None once evicted)."""
+        with self._lock:
+            hit = self._entries.get(key)
+            return None if hit is None else hit[1]
+    
+    def discard(self, key: Hashable):
+        with self._lock:
+            self._entries.pop(key, None)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def _github_session() -> requests.Session:
+    """Keep-alive session for api.github.com; retries transient gateway errors."""
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=16,
+        max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=[502, 503, 504],
+                          allowed_methods=['GET'], raise_on_status=False)
+    )
+    session.mount('https://', adapter)
+    return session
+
+def _last_page(response: requests.Response) -> int:
+    """Page number of the Link rel="last" URL; 1 when there is no next page."""
+    last = response.links.get('last')
+    if not last:
+        return 1
+    try:
+        return int(parse_qs(urlparse(last['url']).query)['page'][0])
+    except (KeyError, IndexError, ValueError):
+        return 1
+
+
+def _remove_tree(path: str):
+    """rm -rf is much faster than shutil.rmtree's per-entry Python loop."""
+    if os.name == 'posix':
+        subprocess.run(['rm', '-rf', '--', path], capture_output=True)
+    else:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def _run_git(*args: str, cwd: Optional[str] = None, input: Optional[str] = None) -> str:
+    """Run a git command and return its stdout (raises CalledProcessError)."""
+    # surrogateescape round-trips paths that aren't valid UTF-8; private
+    # repos fail instead of waiting on a credential prompt
+    return subprocess.run(
+        [*GIT_COMMAND, *args], cwd=cwd, input=input, check=True, capture_output=True,
+        encoding='utf-8', errors='surrogateescape', timeout=GIT_TIMEOUT,
+        env={**os.environ, 'GIT_TERMINAL_PROMPT': '0'}
+    ).stdout
+
+
+def _looks_binary(path: str) -> bool:
+    """git's heuristic: a NUL byte in the first few KB means binary."""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return False
+    try:
+        return b'\0' in os.read(fd, BINARY_SNIFF_BYTES)
+    finally:
+        os.close(fd)
+
+
+def _add_counts(stats: Optional[Dict], counts: Counter):
+    if stats is not None:
+        for key, count in counts.items():
+            stats[key] = stats.get(key, 0) + count
+
 
 class GitService:
     """Service to handle Git repository operations."""
     
-    # Supported extensions to index
-    SUPPORTED_EXTENSIONS = {
+    # Supported extensions (lowercase) and exact filenames to index
+    SUPPORTED_EXTENSIONS = frozenset({
         '.py', '.js', '.jsx', '.ts', '.tsx', '.java', '.c', '.cpp', '.h', '.hpp', 
         '.go', '.rs', '.rb', '.php', '.cs', '.kt', '.sh', '.bash', 
         '.md', '.json', '.yaml', '.yml', '.xml', '.html', '.css', '.sql', '.txt',
-        '.dockerfile', 'Dockerfile', 'README', 'LICENSE', 'Makefile'
-    }
+        '.dockerfile'
+    })
+    SUPPORTED_FILENAMES = frozenset({'Dockerfile', 'README', 'LICENSE', 'Makefile'})
+    # Data-like extensions that are checked for binary content before indexing
+    SNIFF_EXTENSIONS = frozenset({'.json', '.txt', '.xml', '.sql'})
+    
+    # Shared by all instances in this worker (routes build a GitService per
+    # request); each uvicorn worker keeps its own copy, bounded by the TTL.
+    # Only successful API answers are cached; repo info is (etag, info).
+    _repo_info_cache = _TTLCache(GITHUB_CACHE_TTL, GITHUB_CACHE_SIZE)
+    _user_repos_cache = _TTLCache(GITHUB_CACHE_TTL, GITHUB_CACHE_SIZE)
+    _dns_cache = _TTLCache(DNS_CACHE_TTL, DNS_CACHE_SIZE)
+    # Pages 2..N and later API calls reuse the pooled TLS connections
+    _http = _github_session()
     
-    def __init__(self, base_temp_dir: str = "/tmp/hpes_git_repos"):
+    def __init__(self, base_temp_dir: str = "/tmp/hpes_git_repos", list_concurrency: int = 16,
+                 max_file_size: int = MAX_REPO_FILE_SIZE):
         self.base_temp_dir = base_temp_dir
+        self.max_file_size = max_file_size
+        self.list_concurrency = list_concurrency
         os.makedirs(self.base_temp_dir, exist_ok=True)
 
     def _validate_url(self, url: str):
@@ -33,11 +182,11 @@ class GitService:
         # 1. Injection Prevention (Strict Regex)
         # Allow only: alphanumeric, -, ., _, /, :, @ (for auth)
         # Reject: ;, &, |, $, `, (, ), <, >, etc.
-        if re.search(r'[;&|`$()<>]', url):
+        if _UNSAFE_URL_RE.search(url):
             raise ValueError("Invalid characters in URL. Potential detection of command injection.")
 
         # 2. Protocol Validation
-        if not (url.startswith("http://") or url.startswith("https://")):
+        if not url.startswith(("http://", "https://")):
             raise ValueError("Invalid protocol. Only HTTP and HTTPS are allowed.")
 
         # 3. SSRF Protection (IP Blocking)
@@ -47,17 +196,28 @@ class GitService:
             if not hostname:
                 raise ValueError("Invalid URL: No hostname found")
 
-            # Resolve DNS
-            ip = socket.gethostbyname(hostname)
-            ip_obj = ipaddress.ip_address(ip)
+            # Resolve DNS (every address the host maps to must be public)
+            for ip in self._resolve(hostname):
+                ip_obj = ipaddress.ip_address(ip)
 
-            # Block Private and Loopback ranges
-            if ip_obj.is_private or ip_obj.is_loopback:
-                raise ValueError(f"Access denied to private/local network: {hostname} ({ip})")
+                # Block Private and Loopback ranges
+                if ip_obj.is_private or ip_obj.is_loopback:
+                    raise ValueError(f"Access denied to private/local network: {hostname} ({ip})")
                 
         except Exception as e:
             raise ValueError(f"URL Validation failed: {str(e)}")
         
+    def _resolve(self, hostname: str) -> Tuple[str, ...]:
+        """Resolve a hostname to its addresses, cached for DNS_CACHE_TTL."""
+        key = hostname.lower()
+        addresses = self._dns_cache.get(key)
+        if addresses is None:
+            infos = socket.getaddrinfo(hostname, None, proto=socket.IPPROTO_TCP)
+            # Drop IPv6 scope ids ("fe80::1%eth0") before parsing
+            addresses = tuple(dict.fromkeys(info[4][0].split('%')[0] for info in infos))
+            self._dns_cache.set(key, addresses)
+        return addresses
+        
     def clone_repository(self, stats: Dict, repo_url: str, branch: str = None) -> str:
         """
         Clone a repository to a temporary directory.
@@ -77,31 +237,60 @@ class GitService:
         target_dir = os.path.join(self.base_temp_dir, clone_id)
         
         try:
-            # Clone options
-            options = ['--depth', '1']
+            # Clone options: blobless and without checkout, so only commits
+            # and trees are transferred; blobs of the files we index are
+            # fetched below
+            options = ['--depth', '1', '--filter=blob:none', '--no-checkout']
             if branch:
                 options.extend(['--branch', branch])
                 
             print(f"Cloning {repo_url} to {target_dir}...")
-            git.Repo.clone_from(repo_url, target_dir, depth=1, branch=branch if branch else None)
+            _run_git('clone', *options, '--', repo_url, target_dir)
+            self._checkout_supported_files(target_dir)
             
             # SECURITY: Remove execution permissions for ALL files
             # Directories get 755 (rwx-rx-rx) to be traversable
             # Files get 644 (rw-r--r--) to be non-executable
-            for root, dirs, files in os.walk(target_dir):
-                for d in dirs:
-                    os.chmod(os.path.join(root, d), 0o755)
-                for f in files:
-                    os.chmod(os.path.join(root, f), 0o644)
+            # find batches paths into few chmod calls ('+') and, unlike
+            # os.chmod, never follows symlinks out of the clone
+            for file_type, mode in (('d', '755'), ('f', '644')):
+                subprocess.run(
+                    ['find', target_dir, '-type', file_type, '-exec', 'chmod', mode, '{}', '+'],
+                    check=True, capture_output=True
+                )
             
             return target_dir
             
-        except git.GitCommandError as e:
+        except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
+            # The host may have moved; resolve it again next time
+            hostname = urlparse(repo_url).hostname
+            if hostname:
+                self._dns_cache.discard(hostname.lower())
             # Cleanup if failed
-            if os.path.exists(target_dir):
-                shutil.rmtree(target_dir)
-            raise ValueError(f"Git clone failed: {str(e)}")
+            self.cleanup_repo(target_dir)
+            detail = e.stderr.strip() if isinstance(e.stderr, str) and e.stderr.strip() else str(e)
+            raise ValueError(f"Git clone failed: {detail}")
             
+    def _checkout_supported_files(self, repo_dir: str):
+        """
+        Sparse-checkout only the files list_repo_files would pick up. In a
+        blobless clone the checkout fetches exactly these blobs, in one batch.
+        """
+        patterns = []
+        # --name-only: asking for sizes (-l) would make git lazily fetch every
+        # blob, one round trip each. Oversized files are skipped by the walker.
+        for path in _run_git('ls-tree', '-r', '-z', '--name-only', 'HEAD', cwd=repo_dir).split('\0'):
+            if not path or '\n' in path or self._supported_extension(os.path.basename(path)) is None:
+                continue
+            # Anchored, escaped gitignore-style pattern (one per line)
+            patterns.append('/' + _SPARSE_SPECIAL_RE.sub(r'\\\g<0>', path))
+        if not patterns:
+            return
+        
+        _run_git('sparse-checkout', 'set', '--no-cone', '--stdin', cwd=repo_dir,
+                 input='\n'.join(patterns) + '\n')
+        _run_git('checkout', cwd=repo_dir)
+    
     def get_repo_info(self, repo_url: str) -> Dict:
         """
         Fetch repository metadata from GitHub API.
@@ -117,60 +306,156 @@ class GitService:
             owner = parts[-2]
             repo = parts[-1].replace('.git', '')
             
+            # GitHub owner/repo names are case-insensitive
+            cache_key = (owner.lower(), repo.lower())
+            cached = self._repo_info_cache.get(cache_key)
+            if cached is not None:
+                return cached[1]
+            
             api_url = f"https://api.github.com/repos/{owner}/{repo}"
             
-            import requests
-            response = requests.get(api_url, timeout=5)
+            # Revalidate an expired entry; a 304 doesn't count against the rate limit
+            stale = self._repo_info_cache.get_stale(cache_key)
+            headers = {'If-None-Match': stale[0]} if stale is not None and stale[0] else None
+            response = self._http.get(api_url, headers=headers, timeout=5)
             
+            if response.status_code == 304 and stale is not None:
+                self._repo_info_cache.set(cache_key, stale)
+                return stale[1]
             if response.status_code == 200:
                 data = response.json()
-                return {
+                info = {
                     'size_kb': data.get('size', 0), # Size is in KB
                     'default_branch': data.get('default_branch', 'main')
                 }
+                self._repo_info_cache.set(cache_key, (response.headers.get('ETag'), info))
+                return info
             return {'size_kb': 0}
             
         except Exception as e:
             print(f"Error fetching repo info: {e}")
             return {'size_kb': 0}
 
-    def list_repo_files(self, repo_path: str) -> List[Dict]:
+    def list_repo_files(self, repo_path: str, stats: Optional[Dict] = None) -> List[Dict]:
         """
         Recursively list supported files in the repo.
         
+        Files over max_file_size, and data files that look binary, are
+        skipped; with a stats dict their counts are added under
+        'skipped_large' and 'skipped_binary'.
+        
         Returns:
-            List of dicts with 'path', 'filename', 'extension'
+            List of dicts with 'absolute_path', 'relative_path', 'filename',
+            'extension' and 'size'
         """
-        files_to_process = []
-        base_path = Path(repo_path)
+        return list(self.iter_repo_files(repo_path, stats))
+
+    def iter_repo_files(self, repo_path: str, stats: Optional[Dict] = None) -> Iterator[Dict]:
+        """
+        Yield supported files (same dicts as list_repo_files) as each
+        directory is read, so callers can start on them mid-walk.
         
-        for root, _, files in os.walk(repo_path):
-            # Skip .git directory
-            if '.git' in root:
-                continue
+        Directories are scanned on a thread pool (list_concurrency workers);
+        os.scandir releases the GIL, so on network/overlay mounts the
+        per-directory round trips overlap. With list_concurrency=1 the walk
+        is sequential, which is cheapest on fast local disks.
+        """
+        # Normalized once; entry paths are then plain string joins onto it
+        # (BatchProcessor only opens absolute original_paths)
+        repo_path = os.path.abspath(repo_path)
+        
+        if self.list_concurrency <= 1:
+            pending_dirs = [(repo_path, '')]
+            while pending_dirs:
+                dir_files, subdirs, skipped = self._scan_dir(*pending_dirs.pop())
+                _add_counts(stats, skipped)
+                yield from dir_files
+                pending_dirs.extend(subdirs)
+            return
+        
+        pool = ThreadPoolExecutor(max_workers=self.list_concurrency)
+        try:
+            pending = {pool.submit(self._scan_dir, repo_path, '')}
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    dir_files, subdirs, skipped = future.result()
+                    _add_counts(stats, skipped)
+                    pending.update(pool.submit(self._scan_dir, *subdir) for subdir in subdirs)
+                    yield from dir_files
+        finally:
+            # Consumer stopped early: drop queued scans
+            pool.shutdown(cancel_futures=True)
+
+    @classmethod
+    def _supported_extension(cls, filename: str) -> Optional[str]:
+        """
+        Lowercase extension of an indexable file ('' for exact names like
+        Dockerfile), or None if the file isn't indexed.
+        """
+        extension = os.path.splitext(filename)[1].lower()
+        if extension in cls.SUPPORTED_EXTENSIONS or filename in cls.SUPPORTED_FILENAMES:
+            return extension
+        return None
+
+    def _scan_dir(self, dir_path: str, rel_dir: str) -> Tuple[List[Dict], List[Tuple[str, str]], Counter]:
+        """
+        Read one directory with os.scandir; DirEntry carries the file type
+        (and on Linux the stat) from the directory read, so each file costs
+        no extra syscalls beyond its size lookup.
+        
+        Returns:
+            (supported files in this directory, (path, rel_dir) of
+            subdirectories, counts of skipped files)
+        """
+        files = []
+        subdirs = []
+        skipped = Counter()
+        with os.scandir(dir_path) as entries:
+            for entry in entries:
+                name = entry.name
+                if entry.is_dir(follow_symlinks=False):
+                    # Prune by exact name (.github etc. are still scanned)
+                    if name != '.git':
+                        subdirs.append((entry.path, f"{rel_dir}{name}/"))
+                    continue
+                if not entry.is_file():
+                    continue
                 
-            for file in files:
-                file_path = Path(root) / file
+                extension = self._supported_extension(name)
+                if extension is None:
+                    continue
+                size = entry.stat().st_size
+                if size > self.max_file_size:
+                    skipped['skipped_large'] += 1
+                    continue
+                if extension in self.SNIFF_EXTENSIONS and _looks_binary(entry.path):
+                    skipped['skipped_binary'] += 1
+                    continue
                 
-                # Check extension (or exact filename like Dockerfile)
-                if file_path.suffix.lower() in self.SUPPORTED_EXTENSIONS or file in self.SUPPORTED_EXTENSIONS:
-                    # Get relative path for display
-                    rel_path = file_path.relative_to(base_path)
-                    
-                    files_to_process.append({
-                        'absolute_path': str(file_path),
-                        'relative_path': str(rel_path),
-                        'filename': file,
-                        'extension': file_path.suffix.lower(),
-                        'size': file_path.stat().st_size
-                    })
-                    
-        return files_to_process
+                files.append({
+                    'absolute_path': entry.path,
+                    'relative_path': rel_dir + name,  # For display
+                    'filename': name,
+                    'extension': extension,
+                    'size': size
+                })
+        return files, subdirs, skipped
 
     def cleanup_repo(self, repo_path: str):
-        """Delete the cloned directory."""
-        if os.path.exists(repo_path):
-            shutil.rmtree(repo_path)
+        """
+        Delete the cloned directory. It is renamed out of the way at once
+        and removed on a background thread, so callers don't wait on it.
+        """
+        if not os.path.exists(repo_path):
+            return
+        trash_path = os.path.join(self.base_temp_dir, f".trash-{uuid.uuid4()}")
+        try:
+            os.rename(repo_path, trash_path)
+        except OSError:
+            # Different filesystem (or no permission to rename): delete in place
+            trash_path = repo_path
+        threading.Thread(target=_remove_tree, args=(trash_path,), daemon=True).start()
     
     def fetch_user_repos(self, username: str) -> List[Dict]:
         """
@@ -185,68 +470,73 @@ class GitService:
         Raises:
             ValueError: If username is invalid or API request fails
         """
-        base_url = "https://api.github.com/users/{}/repos"
-        all_repos = []
-        page = 1
-        per_page = 100  # Maximum allowed by GitHub API
-        
-        while True:
-            url = base_url.format(username)
-            params = {
-                'per_page': per_page,
-                'page': page,
-                'sort': 'updated',  # Most recently updated first
-                'direction': 'desc'
-            }
-            
-            headers = {
-                'Accept': 'application/vnd.github+json',
-                'User-Agent': 'SENTINEL-Code-Extraction-System'
+        cache_key = username.lower()
+        cached = self._user_repos_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        try:
+            # Page 1 tells us (Link: rel="last") how many pages follow;
+            # those are fetched concurrently and concatenated in order
+            first = self._get_repos_page(username, 1)
+            pages = [first.json()]
+            last_page = _last_page(first)
+            if last_page > 1:
+                with ThreadPoolExecutor(max_workers=GITHUB_PAGE_CONCURRENCY) as pool:
+                    responses = pool.map(
+                        lambda page: self._get_repos_page(username, page),
+                        range(2, last_page + 1)
+                    )
+                    pages.extend(response.json() for response in responses)
+        except requests.exceptions.RequestException as e:
+            raise ValueError(f"Failed to fetch repositories: {str(e)}")
+        
+        # Extract relevant metadata
+        all_repos = [
+            {
+                'name': repo['name'],
+                'full_name': repo['full_name'],
+                'description': repo.get('description', 'No description'),
+                'language': repo.get('language', 'Unknown'),
+                'stargazers_count': repo.get('stargazers_count', 0),
+                'watchers_count': repo.get('watchers_count', 0),
+                'size': repo.get('size', 0), # API returns KB. Frontend divides by 1024 to get MB.
+                'html_url': repo['html_url'],
+                'clone_url': repo['clone_url'],
+                'updated_at': repo['updated_at']
             }
-            
-            try:
-                response = requests.get(url, params=params, headers=headers, timeout=10)
-                
-                # Handle rate limiting
-                if response.status_code == 403 and 'X-RateLimit-Remaining' in response.headers:
-                    if response.headers.get('X-RateLimit-Remaining') == '0':
-                        raise ValueError("GitHub API rate limit exceeded. Please try again later.")
-                
-                # Handle 404 (user not found)
-                if response.status_code == 404:
-                    raise ValueError(f"GitHub user '{username}' not found")
-                
-                # Raise for other HTTP errors
-                response.raise_for_status()
-                
-                repos = response.json()
-                
-                # If no repos returned, we've reached the end
-                if not repos:
-                    break
-                    
-                # Extract relevant metadata
-                for repo in repos:
-                    all_repos.append({
-                        'name': repo['name'],
-                        'full_name': repo['full_name'],
-                        'description': repo.get('description', 'No description'),
-                        'language': repo.get('language', 'Unknown'),
-                        'stargazers_count': repo.get('stargazers_count', 0),
-                        'watchers_count': repo.get('watchers_count', 0),
-                        'size': repo.get('size', 0), # API returns KB. Frontend divides by 1024 to get MB.
-                        'html_url': repo['html_url'],
-                        'clone_url': repo['clone_url'],
-                        'updated_at': repo['updated_at']
-                    })
-                
-                # If we got less than per_page results, this is the last page
-                if len(repos) < per_page:
-                    break
-                    
-                page += 1
-                
-            except requests.exceptions.RequestException as e:
-                raise ValueError(f"Failed to fetch repositories: {str(e)}")
+            for repos in pages
+            for repo in repos
+        ]
         
+        self._user_repos_cache.set(cache_key, all_repos)
         return all_repos
+
+    def _get_repos_page(self, username: str, page: int) -> requests.Response:
+        """Fetch one page of a user's repo list, raising on API errors."""
+        url = "https://api.github.com/users/{}/repos".format(username)
+        params = {
+            'per_page': GITHUB_PER_PAGE,
+            'page': page,
+            'sort': 'updated',  # Most recently updated first
+            'direction': 'desc'
+        }
+        headers = {
+            'Accept': 'application/vnd.github+json',
+            'User-Agent': 'SENTINEL-Code-Extraction-System'
+        }
+        response = self._http.get(url, params=params, headers=headers, timeout=10)
+        
+        # Handle rate limiting
+        if response.status_code == 403 and 'X-RateLimit-Remaining' in response.headers:
+            if response.headers.get('X-RateLimit-Remaining') == '0':
+                raise ValueError("GitHub API rate limit exceeded. Please try again later.")
+        
+        # Handle 404 (user not found)
+        if response.status_code == 404:
+            raise ValueError(f"GitHub user '{username}' not found")
+        
+        # Raise for other HTTP errors
+        response.raise_for_status()
+        return response
+
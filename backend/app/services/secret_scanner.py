@@ -1,5 +1,32 @@
 import re
-from typing import List, Dict, Optional
+import threading
+from bisect import bisect_right
+from typing import List, Dict, Optional, Tuple
+
+try:
+    import hyperscan  # İsteğe bağlı: tüm desenleri tek DFA geçişinde tarar
+except ImportError:
+    hyperscan = None
+
+_NEWLINE = re.compile('\n')
+
+
+def _build_hyperscan_database(patterns: Dict[str, str]):
+    """Desenleri tek bir Hyperscan veritabanında derler (kimlik = PATTERNS sırası)."""
+    if hyperscan is None:
+        return None
+    database = hyperscan.Database(mode=hyperscan.HS_MODE_BLOCK)
+    try:
+        database.compile(
+            expressions=[pattern.encode() for pattern in patterns.values()],
+            ids=list(range(len(patterns))),
+            elements=len(patterns),
+            # Desen başına ilk eşleşme yeter; konumlar scan() içinde re ile bulunur
+            flags=[hyperscan.HS_FLAG_SINGLEMATCH] * len(patterns)
+        )
+    except hyperscan.HyperscanError:
+        return None
+    return database
 
 class SecretScanner:
     """
@@ -13,49 +40,142 @@ class SecretScanner:
         'AWS_SECRET_KEY': r'\b[0-9a-zA-Z/+]{40}\b',
         'GOOGLE_API_KEY': r'\bAIza[0-9A-Za-z\\-_]{35}\b',
         'SLACK_TOKEN': r'xox[baprs]-[0-9a-zA-Z]{10,48}',
-        'PRIVATE_KEY': r'-----BEGIN\s+([A-Z\s]+)\s+PRIVATE\s+KEY-----',
-        'GENERIC_PASSWORD': r'(?i)(password|passwd|pwd|secret|auth_token|api_key|bearer)\s*[:=]\s*["\']([^"\']{6,})["\']',
-        'DB_CONNECTION': r'(?i)(mysql|postgres|mongodb|redis).*?://.*?:(.*?)@',
+        'PRIVATE_KEY': r'-----BEGIN[ \t]+((?:[A-Z]+[ \t]+)*)PRIVATE[ \t]+KEY-----',
+        'GENERIC_PASSWORD': r'(?i:(password|passwd|pwd|secret|auth_token|api_key|bearer)[ \t]*[:=][ \t]*["\']([^"\'\n]{6,})["\'])',
+        'DB_CONNECTION': r'(?i:(mysql|postgres|mongodb|redis).*?://.*?:(.*?)@)',
         'STRIPE_KEY': r'\bsk_live_[0-9a-zA-Z]{24}\b',
         'GITHUB_TOKEN': r'\bgh[pousr]_[a-zA-Z0-9]{36}\b'
     }
 
+    # Desenler satır içinde eşleşir ('.', [ \t] ve [^"'\n] satır sonunu geçmez;
+    # GENERIC_PASSWORD bu yüzden \s yerine [ \t] kullanır): çok satırlı PEM bloğu
+    # başlık satırıyla bulunur. Ardışık tekrar grupları ayrık karakter sınıflarından
+    # oluşur, böylece eşleşmeyen girdide geri izleme doğrusal kalır.
+    # Desenler bir kez derlenir
+    COMPILED_PATTERNS = {name: re.compile(pattern) for name, pattern in PATTERNS.items()}
+
+    # Desenin eşleşebilmesi için içerikte geçmesi gereken alt dizgiler (herhangi biri).
+    # Hiçbiri yoksa desen hiç çalıştırılmaz: alt dizgi araması regex taramasından
+    # kat kat hızlıdır. AWS_SECRET_KEY'in sabit bir parçası yok, her zaman çalışır.
+    TRIGGERS = {
+        'AWS_ACCESS_KEY': ('AKIA',),
+        'GOOGLE_API_KEY': ('AIza',),
+        'SLACK_TOKEN': ('xox',),
+        'PRIVATE_KEY': ('-----BEGIN',),
+        'GENERIC_PASSWORD': ('password', 'passwd', 'pwd', 'secret', 'auth_token', 'api_key', 'bearer'),
+        'DB_CONNECTION': ('://',),
+        'STRIPE_KEY': ('sk_live_',),
+        'GITHUB_TOKEN': ('ghp_', 'gho_', 'ghu_', 'ghs_', 'ghr_'),
+    }
+
+    # Tetikleyicileri küçük harfe çevrilmiş içerikte aranan (büyük/küçük harf duyarsız) desenler
+    CASE_INSENSITIVE_TRIGGERS = frozenset({'GENERIC_PASSWORD'})
+
+    # Bu boyuttan büyük içerikler taranmaz
+    MAX_CONTENT_LENGTH = 100000
+
+    # Hyperscan kuruluysa var olma/tip kontrolleri tek geçişte yapılır.
+    # Yalnızca ASCII içerikte kullanılır: \b ve (?i) orada re ile birebir
+    # aynı davranır (Unicode kelime karakterleri ve harf katlamada farklıdır).
+    _HS_DATABASE = _build_hyperscan_database(PATTERNS)
+    _hs_local = threading.local()
+
     @classmethod
     def has_secrets(cls, content: str) -> bool:
         """Bir içerikte herhangi bir sır olup olmadığını hızlıca kontrol eder."""
-        if not content or len(content) > 100000: # Çok büyük dosyaları atla veya limit koy
+        if not content or len(content) > cls.MAX_CONTENT_LENGTH: # Çok büyük dosyaları atla veya limit koy
             return False
             
-        for pattern in cls.PATTERNS.values():
-            if re.search(pattern, content):
-                return True
-        return False
+        if cls._HS_DATABASE is not None and content.isascii():
+            return bool(cls._hs_matches(content, first_only=True))
+        return any(regex.search(content) for _, regex in cls._candidates(content))
 
     @classmethod
     def get_secret_types(cls, content: str) -> List[str]:
         """İçerikte bulunan sırların tiplerini döndürür (Örn: ['AWS_ACCESS_KEY'])."""
-        found_types = []
-        for name, pattern in cls.PATTERNS.items():
-            if re.search(pattern, content):
-                found_types.append(name)
-        return list(set(found_types))
+        if cls._HS_DATABASE is not None and content.isascii():
+            matched = cls._hs_matches(content)
+            return [name for index, name in enumerate(cls.PATTERNS) if index in matched]
+        return [name for name, regex in cls._candidates(content) if regex.search(content)]
+
+    @classmethod
+    def detect_batch(cls, contents: List[str]) -> List[List[str]]:
+        """
+        Her içerik için bulunan sır tiplerini tek geçişte döndürür.
+        has_secrets + get_secret_types çiftinin toplu karşılığıdır.
+        """
+        results = []
+        for content in contents:
+            if not content or len(content) > cls.MAX_CONTENT_LENGTH:
+                results.append([])
+            else:
+                results.append(cls.get_secret_types(content))
+        return results
+
+    @classmethod
+    def _hs_matches(cls, content: str, first_only: bool = False) -> set:
+        """Hyperscan ile eşleşen desenlerin kimlikleri (first_only: ilkinde dur)."""
+        # Scratch alanı aynı anda tek taramada kullanılabilir: iş parçacığı başına bir tane
+        scratch = getattr(cls._hs_local, 'scratch', None)
+        if scratch is None:
+            scratch = cls._hs_local.scratch = hyperscan.Scratch(cls._HS_DATABASE)
+        
+        matched = set()
+        
+        def on_match(pattern_id, start, end, flags, context):
+            matched.add(pattern_id)
+            return first_only  # True taramayı sonlandırır
+        
+        try:
+            cls._HS_DATABASE.scan(content.encode('ascii'), match_event_handler=on_match, scratch=scratch)
+        except hyperscan.ScanTerminated:
+            pass
+        return matched
+
+    @classmethod
+    def _candidates(cls, content: str) -> List[Tuple[str, re.Pattern]]:
+        """İçerikte tetikleyicisi geçen (eşleşme ihtimali olan) desenler, PATTERNS sırasıyla."""
+        lowered = None
+        candidates = []
+        for name, regex in cls.COMPILED_PATTERNS.items():
+            triggers = cls.TRIGGERS.get(name)
+            if triggers is not None:
+                if name in cls.CASE_INSENSITIVE_TRIGGERS:
+                    if lowered is None:
+                        lowered = content.casefold()
+                    haystack = lowered
+                else:
+                    haystack = content
+                if not any(trigger in haystack for trigger in triggers):
+                    continue
+            candidates.append((name, regex))
+        return candidates
 
     @classmethod
     def scan(cls, content: str) -> List[Dict]:
         """Detaylı tarama raporu döndürür."""
+        if not content:
+            return []
+        
+        # İçerik satırlara bölünmez: her desen tüm metinde bir kez aranır,
+        # satır numarası satır sonu konumlarında ikili aramayla bulunur
+        newlines = [m.start() for m in _NEWLINE.finditer(content)]
         findings = []
-        lines = content.split('\n')
         
-        for i, line in enumerate(lines):
-            for name, pattern in cls.PATTERNS.items():
-                matches = re.finditer(pattern, line)
-                for match in matches:
-                    findings.append({
-                        'type': name,
-                        'line': i + 1,
-                        'match_start': match.start(),
-                        'match_end': match.end(),
-                        # Güvenlik gereği tam değeri loglamıyoruz, sadece varlığını bildiriyoruz
-                        'snippet': line.strip()[:50] + "..." 
-                    })
-        return findings
\ No newline at end of file
+        for order, (name, regex) in enumerate(cls._candidates(content)):
+            for match in regex.finditer(content):
+                line_index = bisect_right(newlines, match.start())
+                line_start = newlines[line_index - 1] + 1 if line_index else 0
+                line_end = newlines[line_index] if line_index < len(newlines) else len(content)
+                findings.append((line_index, order, match.start(), {
+                    'type': name,
+                    'line': line_index + 1,
+                    'match_start': match.start() - line_start,
+                    'match_end': min(match.end(), line_end) - line_start,
+                    # Güvenlik gereği tam değeri loglamıyoruz, sadece varlığını bildiriyoruz
+                    'snippet': content[line_start:line_end].strip()[:50] + "..."
+                }))
+        
+        # Satır, desen, konum sırası (satır satır taramayla aynı)
+        findings.sort(key=lambda finding: finding[:3])
+        return [finding for *_, finding in findings]
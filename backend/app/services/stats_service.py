@@ -0,0 +1,434 @@
+"""
+Stats Service - Pre-aggregated analytics (ExtractionStats)
+Keeps the cumulative ExtractionStats row and the per-day rows up to date so
+the dashboard reads single rows instead of aggregating extracted_blocks on
+every request.
+
+A day's stats always cover the files uploaded that day and all of their
+blocks, whenever the blocks were extracted; incremental updates, the seed of
+today's row, and the live fallback all use that definition. Blocks of pasted
+text belong to no file and only count towards the cumulative row.
+"""
+import json
+from collections import Counter, defaultdict
+from datetime import datetime, date, time, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import event, func, delete, inspect, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models import FileMetadata, ExtractedBlock, ExtractionStats
+
+# Sentinel date of the cumulative (all-time) stats row
+GLOBAL_STATS_DATE = datetime(1970, 1, 1)
+
+# Read on every dashboard request; built once so only the cached compiled form is reused
+_GLOBAL_ROW_STMT = select(ExtractionStats).where(ExtractionStats.date == GLOBAL_STATS_DATE)
+
+_stats_table = ExtractionStats.__table__
+
+
+class StatsService:
+    """Reads and maintains pre-aggregated extraction statistics."""
+
+    # Bumped after each commit that changed stats rows; response caches key on it
+    epoch = 0
+
+    @staticmethod
+    def get_global_stats(db: Session) -> ExtractionStats:
+        """Return the cumulative stats row, rebuilding it if it is stale (missing)."""
+        stats = _load_global_row(db)
+        if stats is None:
+            stats = StatsService.rebuild_global_stats(db)
+        return stats
+
+    @staticmethod
+    def rebuild_global_stats(db: Session) -> ExtractionStats:
+        """Recompute the cumulative row from live aggregate queries."""
+        total_files, total_blocks, avg_conf, lang_json = _aggregate(db)
+
+        stats = _load_global_row(db)
+        if stats is None:
+            stats = ExtractionStats(date=GLOBAL_STATS_DATE)
+            db.add(stats)
+        stats.total_files = total_files
+        stats.total_blocks = total_blocks
+        stats.avg_confidence = avg_conf
+        stats.language_stats = json.dumps(lang_json)
+        try:
+            db.commit()
+        except IntegrityError:
+            # Another request rebuilt the row concurrently; use theirs
+            db.rollback()
+            stats = _load_global_row(db)
+        return stats
+
+    @staticmethod
+    def calculate_daily_stats(db: Session, day: date) -> ExtractionStats:
+        """Populate the ExtractionStats row for one day and refresh the cumulative row."""
+        total_files, total_blocks, avg_conf, lang_json = _aggregate(db, day)
+
+        day_start = datetime.combine(day, time.min)
+        stat_entry = db.query(ExtractionStats).filter(ExtractionStats.date == day_start).first()
+        if not stat_entry:
+            stat_entry = ExtractionStats(date=day_start)
+            db.add(stat_entry)
+
+        stat_entry.total_files = total_files
+        stat_entry.total_blocks = total_blocks
+        stat_entry.avg_confidence = avg_conf
+        stat_entry.language_stats = json.dumps(lang_json)  # Serialize to string for Text column
+        db.info["stats_changed"] = True
+        db.commit()
+
+        StatsService.rebuild_global_stats(db)
+        return stat_entry
+
+    @staticmethod
+    def record_blocks(db: Session, file_id: Optional[int], blocks: Iterable[Tuple[Optional[str], Optional[float]]]):
+        """
+        Fold (language, confidence) pairs of one file's blocks about to be
+        bulk inserted into the stats rows; they count towards the file's
+        upload day (file_id None: text input blocks, cumulative row only).
+        Bulk inserts bypass flush events, so callers run this in the same
+        transaction, before the insert.
+        """
+        day = None
+        if file_id is not None:
+            with db.no_autoflush:
+                upload_date = db.execute(
+                    select(FileMetadata.upload_date).where(FileMetadata.id == file_id)
+                ).scalar()
+            day = _day_of(upload_date) if upload_date else None
+        _apply_inserts(db, Counter(), {day: list(blocks)})
+
+    @staticmethod
+    def record_files(db: Session, count: int):
+        """Fold files about to be bulk inserted (uploaded now) into the stats rows (see record_blocks)."""
+        _apply_inserts(db, Counter({_today_start().date(): count}), {})
+
+    @staticmethod
+    def invalidate(db: Session, days: Iterable[Optional[date]] = (), every_day: bool = False):
+        """
+        Drop the cumulative row and the rows of the given upload days (all
+        per-day rows with every_day). The next read rebuilds the cumulative
+        row; missing days fall back to live queries.
+        """
+        db.info["stats_changed"] = True
+        stale = {GLOBAL_STATS_DATE} | {datetime.combine(day, time.min) for day in days if day is not None}
+        for obj in list(db.identity_map.values()):
+            if isinstance(obj, ExtractionStats):
+                # Expired rows have no loaded date; dropping them is always safe
+                row_date = inspect(obj).dict.get("date")
+                if every_day or row_date is None or row_date in stale:
+                    db.expunge(obj)
+        stmt = delete(_stats_table)
+        if not every_day:
+            stmt = stmt.where(_stats_table.c.date.in_(stale))
+        db.connection().execute(stmt)
+
+
+def _load_global_row(db: Session) -> Optional[ExtractionStats]:
+    with db.no_autoflush:
+        return db.execute(_GLOBAL_ROW_STMT).scalars().first()
+
+
+def _aggregate(db: Session, day: Optional[date] = None) -> Tuple[int, int, float, Dict[str, int]]:
+    """
+    Live totals: file count, block count, average confidence, per-language counts.
+    Without a day every block counts, text input blocks included; with a day,
+    only files uploaded that day (and their blocks) are counted.
+    """
+    lang_q = (
+        db.query(ExtractedBlock.language, func.count(ExtractedBlock.id))
+        .filter(ExtractedBlock.language.isnot(None))
+        .group_by(ExtractedBlock.language)
+    )
+    if day is None:
+        total_files = db.query(func.count(FileMetadata.id)).scalar()
+        total_blocks, avg_conf = db.query(
+            func.count(ExtractedBlock.id), func.avg(ExtractedBlock.confidence_score)
+        ).one()
+    else:
+        # Half-open range on the raw column so the upload_date index is usable
+        day_start = datetime.combine(day, time.min)
+        in_day = (
+            FileMetadata.upload_date >= day_start,
+            FileMetadata.upload_date < day_start + timedelta(days=1)
+        )
+        total_files, total_blocks, avg_conf = (
+            db.query(
+                func.count(func.distinct(FileMetadata.id)),
+                func.count(ExtractedBlock.id),
+                func.avg(ExtractedBlock.confidence_score)
+            )
+            .select_from(FileMetadata)
+            .outerjoin(ExtractedBlock)
+            .filter(*in_day)
+            .one()
+        )
+        lang_q = lang_q.join(FileMetadata).filter(*in_day)
+
+    lang_json = {lang: count for lang, count in lang_q.all()}
+    return total_files or 0, total_blocks or 0, avg_conf or 0.0, lang_json
+
+
+def _today_start() -> datetime:
+    return datetime.combine(datetime.utcnow().date(), time.min)
+
+
+def _day_of(upload_date: Optional[datetime]) -> date:
+    """Stats day of a file; files not yet flushed are uploaded now."""
+    return (upload_date or datetime.utcnow()).date()
+
+
+def _language_counts(blocks: List[Tuple[Optional[str], Optional[float]]]) -> Dict[str, int]:
+    return Counter(language for language, _ in blocks if language is not None)
+
+
+def _apply_inserts(db: Session, files_by_day: Dict[date, int],
+                   blocks_by_day: Dict[Optional[date], List[Tuple[Optional[str], Optional[float]]]]):
+    """
+    Add new files/blocks to the cumulative row and to the rows of their
+    upload days (None: blocks of no stored file, which only the cumulative
+    row counts). Each row gets one atomic UPDATE, so concurrent writers
+    can't lose counts.
+    """
+    all_blocks = [block for blocks in blocks_by_day.values() for block in blocks]
+    lang_counts = _language_counts(all_blocks)
+    if any('"' in language for language in lang_counts):
+        # Can't be addressed as a JSON path key
+        StatsService.invalidate(db, set(files_by_day) | set(blocks_by_day))
+        return
+
+    conn = db.connection()
+    db.info["stats_changed"] = True
+
+    # 1. Cumulative row (missing means stale; the next read rebuilds it)
+    conn.execute(
+        _increment_stmt(sum(files_by_day.values()), all_blocks, lang_counts)
+        .where(_stats_table.c.date == GLOBAL_STATS_DATE)
+    )
+
+    # 2. Per-day rows. A missing past day is left to the live fallback;
+    # today's row is seeded from stored data on the first insert of the day
+    today = _today_start().date()
+    for day in set(files_by_day) | (set(blocks_by_day) - {None}):
+        blocks = blocks_by_day.get(day, [])
+        stmt = _increment_stmt(files_by_day.get(day, 0), blocks, _language_counts(blocks))
+        day_start = datetime.combine(day, time.min)
+        if conn.execute(stmt.where(_stats_table.c.date == day_start)).rowcount or day != today:
+            continue
+        with db.no_autoflush:
+            total_files, total_blocks, avg_conf, lang_json = _aggregate(db, day)
+        conn.execute(
+            sqlite_insert(_stats_table)
+            .values(
+                date=day_start,
+                total_files=total_files,
+                total_blocks=total_blocks,
+                avg_confidence=avg_conf,
+                language_stats=json.dumps(lang_json)
+            )
+            .on_conflict_do_nothing(index_elements=["date"])
+        )
+        conn.execute(stmt.where(_stats_table.c.date == day_start))
+
+
+def _increment_stmt(new_files: int, blocks: List[Tuple[Optional[str], Optional[float]]],
+                    lang_counts: Dict[str, int]):
+    """UPDATE adding counts, re-weighting the average and bumping language_stats keys."""
+    old_blocks = func.coalesce(_stats_table.c.total_blocks, 0)
+    values = {"total_files": func.coalesce(_stats_table.c.total_files, 0) + new_files}
+
+    if blocks:
+        # Unset scores get the column default (0.0) on insert
+        conf_sum = sum(confidence or 0.0 for _, confidence in blocks)
+        values["total_blocks"] = old_blocks + len(blocks)
+        values["avg_confidence"] = (
+            (func.coalesce(_stats_table.c.avg_confidence, 0.0) * old_blocks + conf_sum)
+            / (old_blocks + len(blocks))
+        )
+
+    if lang_counts:
+        # json_set(doc, path1, value1, path2, value2, ...)
+        old_json = func.coalesce(_stats_table.c.language_stats, "{}")
+        args = []
+        for language, count in lang_counts.items():
+            path = f'$."{language}"'
+            args += [path, func.coalesce(func.json_extract(old_json, path), 0) + count]
+        values["language_stats"] = func.json_set(old_json, *args)
+
+    return update(_stats_table).values(values)
+
+
+def _apply_confidence_deltas(db: Session, deltas_by_day: Dict[Optional[date], float]):
+    """
+    Fold edited confidence scores in without recounting: the average moves
+    by (new - old) / total_blocks on the cumulative row and the rows of the
+    blocks' upload days, one atomic UPDATE each.
+    """
+    conn = db.connection()
+    db.info["stats_changed"] = True
+    targets = [(GLOBAL_STATS_DATE, sum(deltas_by_day.values()))]
+    targets += [(datetime.combine(day, time.min), delta) for day, delta in deltas_by_day.items() if day is not None]
+    for row_date, delta in targets:
+        conn.execute(
+            update(_stats_table)
+            .where(_stats_table.c.date == row_date, _stats_table.c.total_blocks > 0)
+            .values(avg_confidence=(
+                func.coalesce(_stats_table.c.avg_confidence, 0.0) + float(delta) / _stats_table.c.total_blocks
+            ))
+        )
+
+
+# ============================================================================
+# Incremental refresh hooks
+# ============================================================================
+
+@event.listens_for(Session, "before_flush")
+def _track_flush(session, flush_context, instances):
+    """Fold ORM inserts and score edits into the stats rows; drop the rows deletes/moves touch."""
+    file_days = {}
+    stale_days = set()
+    stale = every_day = False
+
+    # 1. Deletes, and edits moving a block to another language or file, can't
+    # be folded in cheaply: the rows of the affected upload days are dropped
+    for obj in session.deleted:
+        if isinstance(obj, FileMetadata):
+            stale = True
+            stale_days.add(_day_of(obj.upload_date))
+        elif isinstance(obj, ExtractedBlock):
+            stale = True
+            stale_days.add(_block_day(session, obj, file_days))
+
+    # 2. Confidence edits shift the averages by the score difference
+    conf_deltas = defaultdict(float)
+    for obj in session.dirty:
+        if not isinstance(obj, ExtractedBlock):
+            continue
+        attrs = inspect(obj).attrs
+        file_id, language, confidence = attrs.file_id.history, attrs.language.history, attrs.confidence_score.history
+        if file_id.has_changes():
+            stale = True
+            stale_days.add(_block_day(session, obj, file_days))
+            stale_days.update(_file_day(session, old_id, file_days) for old_id in file_id.deleted)
+            # Without the previous file its upload day is unknown
+            every_day = every_day or not file_id.deleted
+        elif language.has_changes() or (confidence.has_changes() and not confidence.deleted):
+            # A score set without loading the previous one has no known delta
+            stale = True
+            stale_days.add(_block_day(session, obj, file_days))
+        elif confidence.has_changes():
+            new, old = confidence.added[0] if confidence.added else None, confidence.deleted[0]
+            conf_deltas[_block_day(session, obj, file_days)] += (new or 0.0) - (old or 0.0)
+
+    # 3. Inserts: bump counters of the cumulative row and the upload days
+    files_by_day = Counter()
+    blocks_by_day = defaultdict(list)
+    for obj in session.new:
+        if isinstance(obj, FileMetadata):
+            files_by_day[_day_of(obj.upload_date)] += 1
+        elif isinstance(obj, ExtractedBlock):
+            blocks_by_day[_block_day(session, obj, file_days)].append((obj.language, obj.confidence_score))
+
+    if stale:
+        # Rows seeded or bumped now would miss this flush's deletes
+        StatsService.invalidate(
+            session, stale_days | set(files_by_day) | set(blocks_by_day) | set(conf_deltas), every_day
+        )
+        return
+    if files_by_day or blocks_by_day:
+        _apply_inserts(session, files_by_day, blocks_by_day)
+    if conf_deltas:
+        # After the inserts, so a row seeded from stored (pre-edit) scores is adjusted too
+        _apply_confidence_deltas(session, conf_deltas)
+
+
+def _block_day(session: Session, block: ExtractedBlock, file_days: Dict[int, Optional[date]]) -> Optional[date]:
+    """Upload day of a block's file."""
+    if block.file is not None:
+        return _day_of(block.file.upload_date)
+    return _file_day(session, block.file_id, file_days)
+
+
+def _file_day(session: Session, file_id: Optional[int], file_days: Dict[int, Optional[date]]) -> Optional[date]:
+    """Upload day of a stored file (memoized per flush in file_days)."""
+    if file_id is None:
+        return None
+    if file_id not in file_days:
+        with session.no_autoflush:
+            upload_date = session.execute(
+                select(FileMetadata.upload_date).where(FileMetadata.id == file_id)
+            ).scalar()
+        file_days[file_id] = _day_of(upload_date) if upload_date else None
+    return file_days[file_id]
+
+
+# Block columns the stats rows are aggregated from
+_COUNTED_BLOCK_COLUMNS = frozenset({"language", "confidence_score", "file_id"})
+
+
+def _updated_columns(orm_execute_state) -> set:
+    """Names of the columns a bulk UPDATE sets (values() or per-row parameters)."""
+    statement = orm_execute_state.statement
+    values = dict(statement._ordered_values or ()) or statement._values or {}
+    columns = {getattr(key, "key", key) for key in values}
+    params = orm_execute_state.parameters
+    for row in (params if isinstance(params, list) else [params or {}]):
+        columns.update(row)
+    return columns
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _track_bulk_statements(orm_execute_state):
+    """Drop the stats rows a bulk UPDATE/DELETE of counted rows touches."""
+    if not (orm_execute_state.is_delete or orm_execute_state.is_update):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is None:
+        return
+
+    session = orm_execute_state.session
+    whereclause = orm_execute_state.statement.whereclause
+    if mapper.class_ is ExtractedBlock:
+        if orm_execute_state.is_update:
+            columns = _updated_columns(orm_execute_state)
+            if not columns & _COUNTED_BLOCK_COLUMNS:
+                # e.g. status or session links
+                return
+            if "file_id" in columns:
+                # The new files' upload days aren't known up front
+                StatsService.invalidate(session, every_day=True)
+                return
+        days_q = (
+            select(func.date(FileMetadata.upload_date))
+            .select_from(ExtractedBlock)
+            .join(FileMetadata, FileMetadata.id == ExtractedBlock.file_id)
+        )
+    elif orm_execute_state.is_delete and mapper.class_ is FileMetadata:
+        days_q = select(func.date(FileMetadata.upload_date))
+    else:
+        return
+
+    if whereclause is None:
+        StatsService.invalidate(session, every_day=True)
+        return
+    # Upload days of the matched rows, read before the statement runs
+    with session.no_autoflush:
+        days = session.execute(days_q.where(whereclause).distinct()).scalars().all()
+    StatsService.invalidate(session, [date.fromisoformat(day) for day in days if day])
+
+
+@event.listens_for(Session, "after_commit")
+def _bump_epoch(session):
+    if session.info.pop("stats_changed", False):
+        StatsService.epoch += 1
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changes(session):
+    session.info.pop("stats_changed", None)
@@ -20,21 +20,19 @@ def upgrade():
     print("🔄 Starting database migration to v2.0...")
     
     with engine.connect() as conn:
-        # Create sessions table
-        print("  Creating 'sessions' table...")
-        conn.execute(text("""
+        # New tables and their indexes in one script (a single parse pass).
+        # executescript runs outside SQLAlchemy's statement handling, so
+        # nothing is compiled per statement.
+        print("  Creating 'sessions', 'session_files', 'extraction_stats' and 'text_inputs' tables...")
+        conn.connection.cursor().executescript("""
             CREATE TABLE IF NOT EXISTS sessions (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 name TEXT NOT NULL,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 updated_at TIMESTAMP,
                 session_metadata TEXT  -- JSON stored as TEXT in SQLite (renamed from 'metadata')
-            )
-        """))
-        
-        # Create session_files junction table
-        print("  Creating 'session_files' table...")
-        conn.execute(text("""
+            );
+            
             CREATE TABLE IF NOT EXISTS session_files (
                 session_id INTEGER NOT NULL,
                 file_id INTEGER NOT NULL,
@@ -42,12 +40,8 @@ def upgrade():
                 PRIMARY KEY (session_id, file_id),
                 FOREIGN KEY (session_id) REFERENCES sessions(id) ON DELETE CASCADE,
                 FOREIGN KEY (file_id) REFERENCES file_metadata(id) ON DELETE CASCADE
-            )
-        """))
-        
-        # Create extraction_stats table
-        print("  Creating 'extraction_stats' table...")
-        conn.execute(text("""
+            );
+            
             CREATE TABLE IF NOT EXISTS extraction_stats (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 date DATE NOT NULL UNIQUE,
@@ -55,81 +49,64 @@ def upgrade():
                 total_blocks INTEGER DEFAULT 0,
                 language_stats TEXT,  -- JSON as TEXT
                 avg_confidence REAL
-            )
-        """))
-        
-        # Create text_inputs table
-        print("  Creating 'text_inputs' table...")
-        conn.execute(text("""
+            );
+            
             CREATE TABLE IF NOT EXISTS text_inputs (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 content TEXT NOT NULL,
                 source_type TEXT DEFAULT 'paste',  -- 'paste' or 'markdown'
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 file_hash TEXT UNIQUE
-            )
-        """))
+            );
+            
+            CREATE INDEX IF NOT EXISTS idx_sessions_created 
+            ON sessions(created_at DESC);
+            
+            CREATE INDEX IF NOT EXISTS idx_stats_date 
+            ON extraction_stats(date DESC);
+        """)
+        
+        # Add new columns to existing tables (if they don't exist).
+        # One PRAGMA read per table; an empty result means no such table.
+        block_columns = {row[1] for row in conn.execute(text("PRAGMA table_info(extracted_blocks)"))}
+        file_columns = {row[1] for row in conn.execute(text("PRAGMA table_info(file_metadata)"))}
         
-        # Add new columns to existing tables (if they don't exist)
-        print("  Adding 'session_id' to 'extracted_blocks'...")
-        try:
+        if block_columns and 'session_id' not in block_columns:
+            print("  Adding 'session_id' to 'extracted_blocks'...")
             conn.execute(text("""
                 ALTER TABLE extracted_blocks 
                 ADD COLUMN session_id INTEGER REFERENCES sessions(id)
             """))
-        except Exception as e:
-            if "duplicate column name" not in str(e).lower():
-                print(f"    Warning: {e}")
         
-        print("  Adding 'batch_id' to 'file_metadata'...")
-        try:
+        if file_columns and 'batch_id' not in file_columns:
+            print("  Adding 'batch_id' to 'file_metadata'...")
             conn.execute(text("""
                 ALTER TABLE file_metadata 
                 ADD COLUMN batch_id TEXT
             """))
-        except Exception as e:
-            if "duplicate column name" not in str(e).lower():
-                print(f"    Warning: {e}")
         
-        print("  Adding 'processing_status' to 'file_metadata'...")
-        try:
+        if file_columns and 'processing_status' not in file_columns:
+            print("  Adding 'processing_status' to 'file_metadata'...")
             conn.execute(text("""
                 ALTER TABLE file_metadata 
                 ADD COLUMN processing_status TEXT DEFAULT 'pending'
             """))
-        except Exception as e:
-            if "duplicate column name" not in str(e).lower():
-                print(f"    Warning: {e}")
         
         # Create indexes for better performance (only if tables exist)
         print("  Creating indexes...")
         
-        # Check if tables exist before creating indexes
-        result = conn.execute(text("SELECT name FROM sqlite_master WHERE type='table'"))
-        existing_tables = {row[0] for row in result}
-        
-        if 'extracted_blocks' in existing_tables:
+        if block_columns:
             conn.execute(text("""
                 CREATE INDEX IF NOT EXISTS idx_blocks_session 
                 ON extracted_blocks(session_id)
             """))
         
-        if 'file_metadata' in existing_tables:
+        if file_columns:
             conn.execute(text("""
                 CREATE INDEX IF NOT EXISTS idx_files_batch 
                 ON file_metadata(batch_id)
             """))
         
-        conn.execute(text("""
-            CREATE INDEX IF NOT EXISTS idx_sessions_created 
-            ON sessions(created_at DESC)
-        """))
-        
-        conn.execute(text("""
-            CREATE INDEX IF NOT EXISTS idx_stats_date 
-            ON extraction_stats(date DESC)
-        """))
-        
         conn.commit()
         print("✅ Migration completed successfully!")
 
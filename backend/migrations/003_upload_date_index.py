@@ -0,0 +1,30 @@
+"""
+Migration: Index file_metadata.upload_date
+"""
+import sys
+import os
+from pathlib import Path
+
+# Add backend directory to sys.path to allow imports from app
+backend_dir = Path(__file__).resolve().parent.parent
+sys.path.append(str(backend_dir))
+
+from sqlalchemy import create_engine, text
+from app.database import DATABASE_URL
+
+def run_migration():
+    print(f"Running migration on {DATABASE_URL}...")
+    engine = create_engine(DATABASE_URL)
+    
+    with engine.connect() as conn:
+        # Used by the per-day analytics range queries
+        print("Creating ix_file_metadata_upload_date index...")
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_file_metadata_upload_date ON file_metadata (upload_date)"
+        ))
+        conn.commit()
+    
+    print("Migration completed successfully.")
+
+if __name__ == "__main__":
+    run_migration()
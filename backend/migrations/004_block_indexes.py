@@ -0,0 +1,36 @@
+"""
+Migration: Index extracted_blocks for analytics
+"""
+import sys
+import os
+from pathlib import Path
+
+# Add backend directory to sys.path to allow imports from app
+backend_dir = Path(__file__).resolve().parent.parent
+sys.path.append(str(backend_dir))
+
+from sqlalchemy import create_engine, text
+from app.database import DATABASE_URL
+
+def run_migration():
+    print(f"Running migration on {DATABASE_URL}...")
+    engine = create_engine(DATABASE_URL)
+    
+    with engine.connect() as conn:
+        # Joins from file_metadata (top files, per-day stats)
+        print("Creating ix_extracted_blocks_file_id index...")
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_extracted_blocks_file_id ON extracted_blocks (file_id)"
+        ))
+        
+        # Covering index for language counts and average confidence
+        print("Creating ix_eb_lang_conf index...")
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_eb_lang_conf ON extracted_blocks (language, confidence_score)"
+        ))
+        conn.commit()
+    
+    print("Migration completed successfully.")
+
+if __name__ == "__main__":
+    run_migration()
@@ -0,0 +1,31 @@
+"""
+Migration: Store block status / feedback action as plain value strings
+"""
+import sys
+import os
+from pathlib import Path
+
+# Add backend directory to sys.path to allow imports from app
+backend_dir = Path(__file__).resolve().parent.parent
+sys.path.append(str(backend_dir))
+
+from sqlalchemy import create_engine, text
+from app.database import DATABASE_URL
+
+def run_migration():
+    print(f"Running migration on {DATABASE_URL}...")
+    engine = create_engine(DATABASE_URL)
+    
+    with engine.connect() as conn:
+        # Enum columns stored member names ('ACCEPTED'); String columns store values ('accepted')
+        print("Converting extracted_blocks.status...")
+        conn.execute(text("UPDATE extracted_blocks SET status = lower(status) WHERE status IS NOT NULL"))
+        
+        print("Converting user_feedback.action...")
+        conn.execute(text("UPDATE user_feedback SET action = lower(action)"))
+        conn.commit()
+    
+    print("Migration completed successfully.")
+
+if __name__ == "__main__":
+    run_migration()
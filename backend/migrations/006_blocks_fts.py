@@ -0,0 +1,37 @@
+"""
+Migration: Add the blocks_fts full-text index and backfill it
+"""
+import sys
+import os
+from pathlib import Path
+
+# Add backend directory to sys.path to allow imports from app
+backend_dir = Path(__file__).resolve().parent.parent
+sys.path.append(str(backend_dir))
+
+from sqlalchemy import create_engine, text
+from app.database import DATABASE_URL
+from app.models import BLOCKS_FTS_DDL
+
+def run_migration():
+    print(f"Running migration on {DATABASE_URL}...")
+    engine = create_engine(DATABASE_URL)
+    
+    with engine.connect() as conn:
+        print("Creating blocks_fts and sync triggers...")
+        for statement in BLOCKS_FTS_DDL:
+            conn.execute(text(statement))
+        
+        print("Indexing existing blocks...")
+        conn.execute(text("DELETE FROM blocks_fts"))
+        conn.execute(text("""
+            INSERT INTO blocks_fts(rowid, content, filename)
+            SELECT b.id, b.content, f.filename
+            FROM extracted_blocks b LEFT JOIN file_metadata f ON f.id = b.file_id
+        """))
+        conn.commit()
+    
+    print("Migration completed successfully.")
+
+if __name__ == "__main__":
+    run_migration()
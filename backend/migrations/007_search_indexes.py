@@ -0,0 +1,36 @@
+"""
+Migration: Index extracted_blocks for confidence-ordered search
+"""
+import sys
+import os
+from pathlib import Path
+
+# Add backend directory to sys.path to allow imports from app
+backend_dir = Path(__file__).resolve().parent.parent
+sys.path.append(str(backend_dir))
+
+from sqlalchemy import create_engine, text
+from app.database import DATABASE_URL
+
+def run_migration():
+    print(f"Running migration on {DATABASE_URL}...")
+    engine = create_engine(DATABASE_URL)
+    
+    with engine.connect() as conn:
+        # ORDER BY confidence_score DESC, id DESC LIMIT n reads the first n
+        # index entries, and the (confidence_score, id) < cursor of a deep page
+        # seeks into the index, instead of sorting every match. Language
+        # filters use ix_eb_lang_conf. Replaces the earlier
+        # (confidence_score DESC, language) index, which left ties to a sort.
+        print("Dropping ix_eb_conf_lang index...")
+        conn.execute(text("DROP INDEX IF EXISTS ix_eb_conf_lang"))
+        print("Creating ix_eb_conf_id index...")
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_eb_conf_id ON extracted_blocks (confidence_score DESC, id DESC)"
+        ))
+        conn.commit()
+    
+    print("Migration completed successfully.")
+
+if __name__ == "__main__":
+    run_migration()
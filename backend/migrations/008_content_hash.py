@@ -0,0 +1,32 @@
+"""
+Migration: Record the content hash blocks were extracted from
+"""
+import sys
+import os
+from pathlib import Path
+
+# Add backend directory to sys.path to allow imports from app
+backend_dir = Path(__file__).resolve().parent.parent
+sys.path.append(str(backend_dir))
+
+from sqlalchemy import create_engine, text
+from app.database import DATABASE_URL
+
+def run_migration():
+    print(f"Running migration on {DATABASE_URL}...")
+    engine = create_engine(DATABASE_URL)
+    
+    with engine.connect() as conn:
+        # Existing rows stay NULL; extract_file fills them in on next use
+        try:
+            print("Adding content_hash column...")
+            conn.execute(text("ALTER TABLE file_metadata ADD COLUMN content_hash VARCHAR(64)"))
+        except Exception as e:
+            print(f"Column content_hash might already exist or error: {e}")
+            
+        conn.commit()
+    
+    print("Migration completed successfully.")
+
+if __name__ == "__main__":
+    run_migration()
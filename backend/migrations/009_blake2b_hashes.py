@@ -0,0 +1,64 @@
+"""
+Migration: Recompute dedup hashes with BLAKE2b (previously SHA-256)
+"""
+import sys
+import os
+from pathlib import Path
+
+# Add backend directory to sys.path to allow imports from app
+backend_dir = Path(__file__).resolve().parent.parent
+sys.path.append(str(backend_dir))
+
+from sqlalchemy import create_engine, text
+from app.database import DATABASE_URL
+from app.engine.normalizer import content_hasher
+
+UPLOAD_DIR = backend_dir.parent / "data" / "uploads"
+
+def _hash_file(path: Path) -> str:
+    hasher = content_hasher()
+    with open(path, 'rb') as f:
+        while chunk := f.read(1 << 20):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+def run_migration():
+    print(f"Running migration on {DATABASE_URL}...")
+    engine = create_engine(DATABASE_URL)
+
+    with engine.connect() as conn:
+        # 1. Text inputs: hash the stored content
+        print("Rehashing text inputs...")
+        rows = conn.execute(text("SELECT id, content FROM text_inputs")).all()
+        for row_id, content in rows:
+            hasher = content_hasher()
+            hasher.update(content.encode())
+            conn.execute(
+                text("UPDATE text_inputs SET file_hash = :h WHERE id = :id"),
+                {"h": hasher.hexdigest(), "id": row_id}
+            )
+
+        # 2. Uploads: rehash the stored copy (files gone from disk keep their old hash)
+        print("Rehashing uploaded files...")
+        rows = conn.execute(text(
+            "SELECT id, filename FROM file_metadata WHERE file_hash IS NOT NULL AND original_path IS NULL"
+        )).all()
+        for row_id, filename in rows:
+            path = UPLOAD_DIR / filename
+            if not path.is_file():
+                print(f"Skipping {filename}: not found")
+                continue
+            conn.execute(
+                text("UPDATE file_metadata SET file_hash = :h WHERE id = :id"),
+                {"h": _hash_file(path), "id": row_id}
+            )
+
+        # 3. Extraction fingerprints are backfilled by extract_file on next use
+        conn.execute(text("UPDATE file_metadata SET content_hash = NULL"))
+
+        conn.commit()
+
+    print("Migration completed successfully.")
+
+if __name__ == "__main__":
+    run_migration()
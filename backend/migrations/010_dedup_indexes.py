@@ -0,0 +1,41 @@
+"""
+Migration: Index dedup hashes and text input history
+"""
+import sys
+import os
+from pathlib import Path
+
+# Add backend directory to sys.path to allow imports from app
+backend_dir = Path(__file__).resolve().parent.parent
+sys.path.append(str(backend_dir))
+
+from sqlalchemy import create_engine, text
+from app.database import DATABASE_URL
+
+def run_migration():
+    print(f"Running migration on {DATABASE_URL}...")
+    engine = create_engine(DATABASE_URL)
+    
+    with engine.connect() as conn:
+        # Dedup lookups on every upload / text input (unique, so they fail
+        # if duplicate hashes were stored before the constraint existed)
+        for table in ("file_metadata", "text_inputs"):
+            try:
+                print(f"Creating ix_{table}_file_hash index...")
+                conn.execute(text(
+                    f"CREATE UNIQUE INDEX IF NOT EXISTS ix_{table}_file_hash ON {table} (file_hash)"
+                ))
+            except Exception as e:
+                print(f"Could not create ix_{table}_file_hash: {e}")
+        
+        # History is ORDER BY created_at DESC LIMIT n
+        print("Creating ix_text_inputs_created_at index...")
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_text_inputs_created_at ON text_inputs (created_at)"
+        ))
+        conn.commit()
+    
+    print("Migration completed successfully.")
+
+if __name__ == "__main__":
+    run_migration()
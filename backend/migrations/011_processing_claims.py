@@ -0,0 +1,34 @@
+"""
+Migration: Record which batch processor owns a file being processed
+"""
+import sys
+import os
+from pathlib import Path
+
+# Add backend directory to sys.path to allow imports from app
+backend_dir = Path(__file__).resolve().parent.parent
+sys.path.append(str(backend_dir))
+
+from sqlalchemy import create_engine, text
+from app.database import DATABASE_URL
+
+def run_migration():
+    print(f"Running migration on {DATABASE_URL}...")
+    engine = create_engine(DATABASE_URL)
+    
+    with engine.connect() as conn:
+        # Existing 'processing' rows keep a NULL heartbeat and count as stale,
+        # so the next startup resumes them
+        for column, column_type in (("processing_owner", "VARCHAR"), ("processing_heartbeat", "DATETIME")):
+            try:
+                print(f"Adding {column} column...")
+                conn.execute(text(f"ALTER TABLE file_metadata ADD COLUMN {column} {column_type}"))
+            except Exception as e:
+                print(f"Column {column} might already exist or error: {e}")
+            
+        conn.commit()
+    
+    print("Migration completed successfully.")
+
+if __name__ == "__main__":
+    run_migration()
@@ -0,0 +1,33 @@
+"""
+Migration: Record the file size and mtime the content hash was computed at
+"""
+import sys
+import os
+from pathlib import Path
+
+# Add backend directory to sys.path to allow imports from app
+backend_dir = Path(__file__).resolve().parent.parent
+sys.path.append(str(backend_dir))
+
+from sqlalchemy import create_engine, text
+from app.database import DATABASE_URL
+
+def run_migration():
+    print(f"Running migration on {DATABASE_URL}...")
+    engine = create_engine(DATABASE_URL)
+    
+    with engine.connect() as conn:
+        # Existing rows stay NULL; extract_file fills them in on next use
+        for column in ("content_size", "content_mtime_ns"):
+            try:
+                print(f"Adding {column} column...")
+                conn.execute(text(f"ALTER TABLE file_metadata ADD COLUMN {column} INTEGER"))
+            except Exception as e:
+                print(f"Column {column} might already exist or error: {e}")
+            
+        conn.commit()
+    
+    print("Migration completed successfully.")
+
+if __name__ == "__main__":
+    run_migration()
@@ -5,6 +5,7 @@ Automatically clones and builds grammar files for supported languages.
 """
 import os
 import subprocess
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
 
 GRAMMARS = {
@@ -27,20 +28,32 @@ GRAMMARS = {
 GRAMMAR_DIR = Path(__file__).parent.parent / "grammars"
 
 
-def build_grammar(name: str, repo_url: str):
-    """Clone and build a single grammar."""
-    print(f"Building grammar: {name}")
-    
+# Clones are network-bound; compiles use a process per core
+CLONE_WORKERS = 8
+
+
+def clone_grammar(name: str, repo_url: str) -> bool:
+    """Clone a single grammar (if not already present). Returns success."""
     grammar_path = GRAMMAR_DIR / name
     
     # Clone if not exists
     if not grammar_path.exists():
         print(f"  Cloning {repo_url}...")
-        subprocess.run(
-            ["git", "clone", "--depth", "1", repo_url, str(grammar_path)],
-            check=True,
-            capture_output=True
-        )
+        try:
+            subprocess.run(
+                ["git", "clone", "--depth", "1", repo_url, str(grammar_path)],
+                check=True,
+                capture_output=True
+            )
+        except Exception as e:
+            print(f"Error cloning {name}: {e}")
+            return False
+    return True
+
+
+def compile_grammar(name: str):
+    """Build a single cloned grammar."""
+    grammar_path = GRAMMAR_DIR / name
     
     # Build the grammar (Tree-sitter will compile .so/.dll files)
     print(f"  Building {name}...")
@@ -85,12 +98,14 @@ def main():
     
     GRAMMAR_DIR.mkdir(exist_ok=True)
     
-    for name, repo_url in GRAMMARS.items():
-        try:
-            build_grammar(name, repo_url)
-        except Exception as e:
-            print(f"Error building {name}: {e}")
-            continue
+    # 1. Clone all grammars concurrently
+    with ThreadPoolExecutor(max_workers=CLONE_WORKERS) as pool:
+        cloned = list(pool.map(clone_grammar, GRAMMARS.keys(), GRAMMARS.values()))
+    
+    # 2. Compile the cloned ones in parallel
+    names = [name for name, ok in zip(GRAMMARS, cloned) if ok]
+    with ProcessPoolExecutor() as pool:
+        list(pool.map(compile_grammar, names))
     
     print("\n" + "=" * 50)
     print("Grammar build complete!")
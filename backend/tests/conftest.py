@@ -1,7 +1,8 @@
 import pytest
 from httpx import AsyncClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
 from typing import Generator
 import os
 import sys
@@ -15,13 +16,29 @@ from app.main import app
 # Use in-memory SQLite for tests
 SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
 
+# One shared connection: every checkout (from any thread) sees the same
+# in-memory database and skips opening a new SQLite connection
 engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}, poolclass=StaticPool
 )
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Sessions join the per-test outer transaction through SAVEPOINTs, so code
+# under test may commit and roll back freely while the test is undone at the end
+TestingSessionLocal = sessionmaker(
+    autocommit=False, autoflush=False, bind=engine, join_transaction_mode="create_savepoint"
+)
+
+# pysqlite defers BEGIN (and so breaks SAVEPOINT nesting); emit it ourselves
+@event.listens_for(engine, "connect")
+def _disable_pysqlite_transactions(dbapi_connection, connection_record):
+    dbapi_connection.isolation_level = None
 
-@pytest.fixture(scope="module")
+@event.listens_for(engine, "begin")
+def _begin(conn):
+    conn.exec_driver_sql("BEGIN")
+
+@pytest.fixture(scope="session")
 def db_engine():
+    # Schema is built once per run; tests are isolated by rollback
     Base.metadata.create_all(bind=engine)
     yield engine
     Base.metadata.drop_all(bind=engine)
@@ -36,14 +53,21 @@ def db(db_engine):
     transaction.rollback()
     connection.close()
 
+@pytest.fixture(scope="session")
+def _client():
+    # Built once; per-test state lives in the dependency overrides
+    from fastapi.testclient import TestClient
+    return TestClient(app)
+
 @pytest.fixture(scope="function")
-def client(db):
+def client(_client, db):
+    from app.routes.analytics import clear_response_cache
+    clear_response_cache()
+    
+    # The db fixture owns the session's lifecycle
     def override_get_db():
-        try:
-            yield db
-        finally:
-            db.close()
+        yield db
     
     app.dependency_overrides[get_db] = override_get_db
-    from fastapi.testclient import TestClient
-    yield TestClient(app)
+    yield _client
+    app.dependency_overrides.clear()
@@ -1,5 +1,8 @@
 import pytest
+import io
 import json
+import zipfile
+import orjson
 import pandas as pd
 from pathlib import Path
 from unittest.mock import MagicMock, patch
@@ -8,22 +11,24 @@ from datetime import datetime
 from app.services.export_service import ExportService
 from app.models import FileMetadata, ExtractedBlock
 
-@pytest.fixture
-def mock_export_dir(tmp_path):
-    return tmp_path
+# Each format writes its own file name, so the module shares one directory
+@pytest.fixture(scope="module")
+def mock_export_dir(tmp_path_factory):
+    return tmp_path_factory.mktemp("export")
 
 @pytest.fixture
 def export_service(mock_export_dir):
     return ExportService(mock_export_dir)
 
-@pytest.fixture
+# Exports only read these objects, so one set serves the whole module
+@pytest.fixture(scope="module")
 def mock_data():
     file_meta = FileMetadata(
         id=1,
         filename="test.py",
         original_filename="test.py",
         file_hash="abc123hash",
-        upload_date=datetime.now()
+        upload_date=datetime(2024, 1, 1)
     )
     
     blocks = [
@@ -59,18 +64,19 @@ def test_generate_jsonl(export_service, mock_data):
     assert path.exists()
     assert path.suffix == ".jsonl"
     
-    with open(path, 'r') as f:
-        lines = f.readlines()
-        assert len(lines) == 2
+    with open(path, 'rb') as f:
+        lines = iter(f)
         
-        item1 = json.loads(lines[0])
+        item1 = orjson.loads(next(lines))
         assert item1['block_id'] == 101
         assert item1['language'] == 'python'
         assert item1['content'] == "def hello():\n    print('world')"
         
-        item2 = json.loads(lines[1])
+        item2 = orjson.loads(next(lines))
         assert item2['block_id'] == 102
         assert item2['block_type'] == 'config'
+        
+        assert next(lines, None) is None
 
 def test_generate_parquet(export_service, mock_data):
     file_meta, blocks = mock_data
@@ -92,4 +98,39 @@ def test_generate_zip(export_service, mock_data):
     assert path.exists()
     assert path.suffix == ".zip"
     
-    # Optional: could use zipfile module to verify contents if needed
+    with zipfile.ZipFile(path) as zipf:
+        assert zipf.testzip() is None
+        # Short entries are stored; deflate can't shrink them
+        info = zipf.getinfo("python_codes/block_001.py")
+        assert info.compress_type == zipfile.ZIP_STORED
+        assert zipf.read(info).decode() == blocks[0].content
+        assert zipf.getinfo("metadata.json").compress_type == zipfile.ZIP_DEFLATED
+
+def test_stream_zip(export_service, mock_data, mock_export_dir):
+    file_meta, blocks = mock_data
+    existing = set(mock_export_dir.iterdir())
+    data = b"".join(export_service.stream_zip(file_meta, blocks))
+    
+    with zipfile.ZipFile(io.BytesIO(data)) as zipf:
+        assert zipf.testzip() is None
+        assert zipf.read("python_codes/block_001.py").decode() == blocks[0].content
+        metadata = json.loads(zipf.read("metadata.json"))
+        assert metadata["total_blocks"] == 2
+    
+    # Nothing is written to the export directory
+    assert set(mock_export_dir.iterdir()) == existing
+
+def test_stream_zip_large_block(export_service, mock_data):
+    file_meta, _ = mock_data
+    content = "\n".join(f"line_{i} = {i}" for i in range(20000))
+    block = ExtractedBlock(
+        id=103, file_id=1, content=content, language="python", block_type="code",
+        confidence_score=0.9, start_line=1, end_line=20000
+    )
+    chunks = list(export_service.stream_zip(file_meta, [block]))
+    
+    # A big block is sent in several pieces, not buffered whole
+    assert len([chunk for chunk in chunks if chunk]) > 2
+    with zipfile.ZipFile(io.BytesIO(b"".join(chunks))) as zipf:
+        assert zipf.testzip() is None
+        assert zipf.read("python_codes/block_001.py").decode() == content
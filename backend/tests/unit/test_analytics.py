@@ -1,4 +1,4 @@
-from datetime import datetime
+from datetime import datetime, timedelta
 from app.models import FileMetadata, ExtractedBlock, Session, ExtractionStats
 
 def test_get_analytics_overview_empty(client):
@@ -57,3 +57,162 @@ def test_get_top_files(client, db):
     assert len(data) == 2
     assert data[0]["filename"] == "f1.py"
     assert data[0]["block_count"] == 2
+    assert data[0]["language"] == "python"
+    assert data[1]["language"] == "javascript"
+
+def test_overview_stats_row_updates(client, db):
+    # First read builds the cumulative stats row
+    assert client.get("/api/analytics/overview").json()["total_blocks"] == 0
+    
+    file = FileMetadata(filename="a.py", original_filename="a.py", file_type="py", file_size=10, file_hash="inc")
+    db.add(file)
+    db.commit()
+    block = ExtractedBlock(file_id=file.id, content="x = 1", language="python", confidence_score=0.5, block_type="code")
+    db.add(block)
+    db.add(ExtractedBlock(file_id=file.id, content="y = 2", language="python", confidence_score=1.0, block_type="code"))
+    db.commit()
+    
+    data = client.get("/api/analytics/overview").json()
+    assert data["total_files"] == 1
+    assert data["total_blocks"] == 2
+    assert data["avg_confidence"] == 0.75
+    assert data["language_distribution"][0]["count"] == 2
+    
+    # Deleting invalidates the row; the next read recomputes it
+    db.delete(block)
+    db.commit()
+    data = client.get("/api/analytics/overview").json()
+    assert data["total_blocks"] == 1
+    assert data["avg_confidence"] == 1.0
+
+def test_get_analytics_overview_exact(client, db):
+    client.get("/api/analytics/overview")
+    
+    # Bulk inserts bypass the stats hooks; exact=true recounts
+    db.bulk_insert_mappings(FileMetadata, [
+        dict(filename="b.py", original_filename="b.py", file_type="py", file_size=10, file_hash="bulk")
+    ])
+    db.commit()
+    assert client.get("/api/analytics/overview").json()["total_files"] == 0
+    assert client.get("/api/analytics/overview?exact=true").json()["total_files"] == 1
+
+def test_get_trends_live_totals(client, db):
+    # A past day with no ExtractionStats row is aggregated from the tables
+    day = datetime.utcnow() - timedelta(days=2)
+    file = FileMetadata(filename="old.py", original_filename="old.py", file_type="py", file_size=10, file_hash="old", upload_date=day)
+    db.add(file)
+    db.commit()
+    db.add(ExtractedBlock(file_id=file.id, content="a", language="python", confidence_score=0.4, block_type="code"))
+    db.add(ExtractedBlock(file_id=file.id, content="b", language="python", confidence_score=0.8, block_type="code"))
+    db.commit()
+    
+    response = client.get("/api/analytics/trends?days=3")
+    assert response.status_code == 200
+    first_day = response.json()["daily_stats"][0]
+    assert first_day["date"] == day.date().isoformat()
+    assert first_day["total_files"] == 1
+    assert first_day["total_blocks"] == 2
+    assert first_day["avg_confidence"] == 0.6
+
+def test_overview_etag_not_modified(client, db):
+    first = client.get("/api/analytics/overview")
+    etag = first.headers["etag"]
+    assert "max-age" in first.headers["cache-control"]
+    
+    response = client.get("/api/analytics/overview", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    
+    # New data changes the body, so the old tag no longer matches
+    db.add(FileMetadata(filename="e.py", original_filename="e.py", file_type="py", file_size=1, file_hash="etag"))
+    db.commit()
+    response = client.get("/api/analytics/overview", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["total_files"] == 1
+
+def test_daily_rows_count_blocks_by_upload_day(client, db):
+    # Today's row exists and stays incrementally maintained
+    today = FileMetadata(filename="t.py", original_filename="t.py", file_type="py", file_size=1, file_hash="today")
+    db.add(today)
+    db.commit()
+
+    # Blocks extracted now for a file uploaded two days ago belong to that day
+    day = datetime.utcnow() - timedelta(days=2)
+    old = FileMetadata(filename="o.py", original_filename="o.py", file_type="py", file_size=1, file_hash="older", upload_date=day)
+    db.add(old)
+    db.commit()
+    db.add(ExtractedBlock(file_id=old.id, content="a", language="python", confidence_score=0.5, block_type="code"))
+    db.add(ExtractedBlock(file_id=today.id, content="b", language="python", confidence_score=1.0, block_type="code"))
+    db.commit()
+
+    incremental = client.get("/api/analytics/trends?days=3").json()["daily_stats"]
+    client.post("/api/analytics/calculate-daily")
+    recomputed = client.get("/api/analytics/trends?days=3").json()["daily_stats"]
+    assert incremental == recomputed
+    assert (incremental[0]["total_files"], incremental[0]["total_blocks"]) == (1, 1)
+    assert (incremental[2]["total_files"], incremental[2]["total_blocks"]) == (1, 1)
+
+def _stats_dates(db):
+    return {row.date for row in db.query(ExtractionStats).all()}
+
+def test_edits_keep_unaffected_stats_rows(client, db):
+    day = datetime.utcnow() - timedelta(days=2)
+    old = FileMetadata(filename="p.py", original_filename="p.py", file_type="py", file_size=1, file_hash="past", upload_date=day)
+    new = FileMetadata(filename="n.py", original_filename="n.py", file_type="py", file_size=1, file_hash="now")
+    db.add_all([old, new])
+    db.commit()
+    db.add(ExtractedBlock(file_id=old.id, content="a", language="python", confidence_score=0.5, block_type="code"))
+    block = ExtractedBlock(file_id=new.id, content="b", language="python", confidence_score=0.5, block_type="code")
+    db.add(block)
+    db.commit()
+    # Rows for the cumulative totals, today and the past day
+    client.post("/api/analytics/calculate-daily")
+    past = datetime.combine(day.date(), datetime.min.time())
+    db.add(ExtractionStats(date=past, total_files=1, total_blocks=1, avg_confidence=0.5))
+    db.commit()
+    rows = _stats_dates(db)
+    assert len(rows) == 3
+
+    # Feedback folds the score change into the averages instead of dropping rows
+    assert client.post("/api/feedback", json={"block_id": block.id, "action": "reject"}).status_code == 200
+    db.expire_all()
+    assert _stats_dates(db) == rows
+    assert client.get("/api/analytics/overview").json()["avg_confidence"] == 0.45
+    assert client.get("/api/analytics/overview?exact=true").json()["avg_confidence"] == 0.45
+    assert client.get("/api/analytics/trends?days=1").json()["daily_stats"][0]["avg_confidence"] == 0.4
+
+    # Bulk updates of uncounted columns leave the rows alone
+    db.query(ExtractedBlock).update({ExtractedBlock.status: "accepted"}, synchronize_session=False)
+    db.commit()
+    assert _stats_dates(db) == rows
+
+    # Deleting today's block only drops the cumulative row and today's row
+    db.query(ExtractedBlock).filter(ExtractedBlock.id == block.id).delete(synchronize_session=False)
+    db.commit()
+    assert _stats_dates(db) == {past}
+
+TEXT_SOURCE = """def add(a, b):
+    total = a + b
+    return total
+
+
+def scale(values, factor):
+    return [value * factor for value in values]
+"""
+
+def test_text_input_blocks_count_only_towards_totals(client, db):
+    # A file sharing the text input's id must not be credited with its blocks
+    file = FileMetadata(filename="f.py", original_filename="f.py", file_type="py", file_size=1, file_hash="shared-id")
+    db.add(file)
+    db.commit()
+    client.get("/api/analytics/overview")
+
+    response = client.post("/api/input/text", json={"content": TEXT_SOURCE, "source_type": "paste"})
+    assert response.status_code == 200
+    blocks = len(response.json()["blocks"])
+    assert blocks and response.json()["text_input_id"] == file.id
+
+    incremental = client.get("/api/analytics/overview").json()
+    assert incremental["total_blocks"] == blocks
+    assert client.get("/api/analytics/overview?exact=true").json() == incremental
+    assert client.get("/api/analytics/trends?days=1").json()["daily_stats"][0]["total_blocks"] == 0
@@ -0,0 +1,94 @@
+import asyncio
+import os
+import pytest
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+from app.models import FileMetadata
+from app.routes import batch
+from app.engine import batch_processor
+from app.engine.batch_processor import (
+    BatchProcessor, PROCESSING_STALE_AFTER, run_in_cpu_pool, shutdown_cpu_pool
+)
+from app.engine.segmenter import CandidateBlock
+
+def _file(db, name, status, heartbeat=None, owner=None):
+    row = FileMetadata(
+        filename=name, original_filename=name, file_type="txt", file_size=1,
+        file_hash=name, batch_id="b1", processing_status=status,
+        processing_owner=owner, processing_heartbeat=heartbeat
+    )
+    db.add(row)
+    db.commit()
+    return row.id
+
+def test_resume_skips_files_owned_by_live_workers(db, monkeypatch):
+    stale = datetime.utcnow() - PROCESSING_STALE_AFTER - timedelta(minutes=1)
+    pending = _file(db, "pending.txt", "pending")
+    _file(db, "live.txt", "processing", datetime.utcnow(), "other")
+    dead = _file(db, "dead.txt", "processing", stale, "other")
+    legacy = _file(db, "legacy.txt", "processing")
+    _file(db, "done.txt", "complete")
+
+    started = []
+    monkeypatch.setattr(batch, "start_batch", lambda batch_id, file_ids, owner=None: started.append((batch_id, file_ids, owner)))
+    assert batch.resume_unfinished_batches(db) == 1
+
+    (batch_id, file_ids, owner), = started
+    assert batch_id == "b1"
+    assert file_ids == sorted([pending, dead, legacy])
+    # The resumed processor already owns the files it was handed
+    assert db.query(FileMetadata).filter(FileMetadata.processing_owner == owner).count() == 3
+    assert BatchProcessor(owner=owner)._claim(db, pending)
+
+def test_claim_is_exclusive(db):
+    file_id = _file(db, "claim.txt", "pending")
+    first, second = BatchProcessor(), BatchProcessor()
+    assert first._claim(db, file_id)
+    assert not second._claim(db, file_id)
+
+    # Once the owner stops reporting progress, the file can be taken over
+    db.query(FileMetadata).filter(FileMetadata.id == file_id).update(
+        {"processing_heartbeat": datetime.utcnow() - PROCESSING_STALE_AFTER - timedelta(minutes=1)}
+    )
+    db.commit()
+    assert second._claim(db, file_id)
+    assert not first._claim(db, file_id)
+
+def test_batch_finishes_when_session_cannot_open():
+    def broken_session():
+        raise RuntimeError("database unavailable")
+
+    status = asyncio.run(BatchProcessor(session_factory=broken_session).process_batch("b2", [1, 2]))
+    assert status["in_progress"] is False
+    assert status["failed_files"] == 2
+    assert status["file_statuses"][1]["error"] == "database unavailable"
+
+def test_cpu_pool_recovers_from_dead_worker():
+    async def run():
+        # Killing the worker breaks the pool (and its retry)...
+        with pytest.raises(BrokenProcessPool):
+            await run_in_cpu_pool(os._exit, 1)
+        # ...but later calls get a fresh one
+        return await run_in_cpu_pool(abs, -3)
+
+    try:
+        assert asyncio.run(run()) == 3
+    finally:
+        shutdown_cpu_pool()
+
+def test_validation_falls_back_in_process_when_pool_breaks(monkeypatch):
+    class BrokenPool:
+        def map(self, fn, blocks, chunksize=1):
+            yield fn(blocks[0])
+            raise BrokenProcessPool("worker died")
+
+        def shutdown(self, wait=True, cancel_futures=False):
+            pass
+
+    monkeypatch.setattr(batch_processor, "get_cpu_pool", lambda: BrokenPool())
+    blocks = [
+        CandidateBlock(content=f"x{i} = {i}", start_line=i, end_line=i, detection_method="test", confidence=0.5)
+        for i in range(batch_processor.PARALLEL_VALIDATION_MIN_BLOCKS)
+    ]
+    results = list(batch_processor.validate_blocks(blocks, "a.py", BatchProcessor.validator))
+    assert [r["start_line"] for r in results] == list(range(len(blocks)))
@@ -0,0 +1,69 @@
+import os
+import pytest
+from app.models import FileMetadata, ExtractedBlock, UserFeedback, BlockStatus
+from app.routes import extract
+
+SOURCE = '''def add(a, b):
+    total = a + b
+    return total
+
+
+def scale(values, factor):
+    return [value * factor for value in values]
+'''
+
+def _upload(db, path):
+    path.write_text(SOURCE)
+    file = FileMetadata(
+        filename=path.name, original_filename=path.name, file_type="py",
+        file_size=path.stat().st_size, file_hash="extract", original_path=str(path)
+    )
+    db.add(file)
+    db.commit()
+    return file.id
+
+def test_changed_file_is_flagged_not_reextracted(client, db, tmp_path, monkeypatch):
+    path = tmp_path / "sample.py"
+    file_id = _upload(db, path)
+    blocks = client.post(f"/api/extract/{file_id}").json()["blocks"]
+    assert blocks
+
+    # Unchanged: the stored blocks come back as they are, without rereading the file
+    with monkeypatch.context() as m:
+        m.setattr(extract, "_file_hash", lambda path: pytest.fail("file was rehashed"))
+        again = client.post(f"/api/extract/{file_id}").json()
+    assert [b["id"] for b in again["blocks"]] == [b["id"] for b in blocks]
+    assert again["content_changed"] is False
+
+    # Review one block, then change the file
+    reviewed = blocks[0]["id"]
+    db.query(ExtractedBlock).filter(ExtractedBlock.id == reviewed).update({"status": BlockStatus.ACCEPTED.value})
+    db.add(UserFeedback(block_id=reviewed, action="accept"))
+    db.commit()
+    path.write_text(SOURCE + "\n\ndef negate(x):\n    result = -x\n    return result\n")
+    os.utime(path, ns=(0, 0))
+
+    flagged = client.post(f"/api/extract/{file_id}").json()
+    assert flagged["content_changed"] is True
+    assert [b["id"] for b in flagged["blocks"]] == [b["id"] for b in blocks]
+
+    # Re-extraction keeps the reviewed block and its feedback
+    refreshed = client.post(f"/api/extract/{file_id}?reextract=true").json()
+    assert refreshed["content_changed"] is False
+    assert reviewed in [b["id"] for b in refreshed["blocks"]]
+    assert db.query(UserFeedback).filter(UserFeedback.block_id == reviewed).count() == 1
+    assert client.post(f"/api/extract/{file_id}").json()["content_changed"] is False
+
+def test_file_content_translates_newlines(client, db, tmp_path):
+    path = tmp_path / "crlf.txt"
+    # \r\n straddles a read chunk boundary
+    path.write_bytes(b"a" * (extract.CONTENT_CHUNK_SIZE - 1) + b"\r\nb\rc\n")
+    file = FileMetadata(
+        filename=path.name, original_filename=path.name, file_type="txt",
+        file_size=path.stat().st_size, file_hash="crlf", original_path=str(path)
+    )
+    db.add(file)
+    db.commit()
+
+    content = client.get(f"/api/files/{file.id}/content").json()["content"]
+    assert content == "a" * (extract.CONTENT_CHUNK_SIZE - 1) + "\nb\nc\n"
@@ -0,0 +1,6 @@
+from app.engine.normalizer import FileNormalizer
+
+def test_terminal_escapes_removed():
+    # ASCII log lines skip ftfy; colour codes must still go whole
+    text = FileNormalizer()._normalize_text("\x1b[31mERROR\x1b[0m failed\n\x1b[1;32mOK\x1b[K done")
+    assert text == "ERROR failed\nOK done"
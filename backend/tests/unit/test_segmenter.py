@@ -0,0 +1,13 @@
+from app.engine.segmenter import Segmenter
+
+def test_whole_file_fallback():
+    # No keyword/indent/fence/density block matches, but the text is technical
+    blocks = Segmenter().segment("x = 1\ny = 2\nz = x + y")
+    assert len(blocks) == 1
+    assert blocks[0].detection_method == "fallback_whole_file"
+    assert blocks[0].start_line == 1
+    assert blocks[0].end_line == 3
+
+def test_whole_file_fallback_skips_prose():
+    blocks = Segmenter().segment("just some words\nmore plain words\nand a few more")
+    assert blocks == []